@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
 
 from .models import Department, Employee
+from .passwords import INITIAL_PASSWORD
 
 
 class EmployeeInline(admin.StackedInline):
@@ -17,12 +20,22 @@ class DepartmentAdmin(admin.ModelAdmin):
     ]
 
     def save_formset(self, request, form, formset, change):
-        instances = formset.save(commit=False)
-        for instance in instances:
-            if isinstance(instance, Employee):
-                # 初期パスワードをセット
-                instance.set_password('pass12345')
-        super().save_formset(request, form, formset, change)
+        if formset.model is not Employee:
+            return super().save_formset(request, form, formset, change)
+
+        formset.save(commit=False)
+        with transaction.atomic():
+            for obj in formset.deleted_objects:
+                obj.delete()
+            for obj, changed_data in formset.changed_objects:
+                obj.save()
+            # 初期パスワードのハッシュ化は1回だけおこない、新規の従業員全員にセット
+            # （ソルトも同じになるが、初期パスワードは全員共通で変更を前提としている）
+            password = make_password(INITIAL_PASSWORD)
+            for obj in formset.new_objects:
+                obj.password = password
+            Employee.objects.bulk_create(formset.new_objects)
+            formset.save_m2m()
 
 
 admin.site.register(Department, DepartmentAdmin)
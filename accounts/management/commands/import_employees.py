@@ -0,0 +1,109 @@
+import csv
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from time import time
+
+from accounts.models import Department, Employee
+from accounts.passwords import INITIAL_PASSWORD, make_passwords
+
+
+class Command(BaseCommand):
+    """従業員データインポート
+
+    CSVファイルの各行は「部署名,ユーザー名,姓,名[,パスワード]」の形式で、
+    存在しない部署はまとめて作成する。
+    不正な行やユーザー名の重複がある場合は、1件もインポートしない。
+    """
+
+    help = "Bulk import for employees of whole departments from a CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', help="Path of the CSV file to import.")
+        parser.add_argument(
+            '--encoding', default='utf-8',
+            help="Encoding of the CSV file (default: utf-8).")
+        parser.add_argument(
+            '--unusable-password', action='store_true',
+            help="Skip password hashing and force users to reset their password.")
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help="Number of processes used for hashing per-user passwords.")
+
+    def handle(self, *args, **options):
+        _start = time()
+
+        with open(options['csv_path'], encoding=options['encoding']) as f:
+            rows = [(line, row) for line, row in enumerate(csv.reader(f), start=1) if row]
+
+        errors = self.validate_rows(rows)
+        if errors:
+            raise CommandError('\n'.join(f'line {line}: {message}' for line, message in errors))
+        rows = [row for line, row in rows]
+
+        with transaction.atomic():
+            departments = self.get_or_create_departments({row[0] for row in rows})
+            employees = [
+                Employee(
+                    department=departments[row[0]],
+                    username=row[1],
+                    last_name=row[2],
+                    first_name=row[3],
+                )
+                for row in rows
+            ]
+            if options['unusable_password']:
+                # ハッシュ化をおこなわず、パスワード再設定を必須にする
+                for employee in employees:
+                    employee.set_unusable_password()
+            else:
+                # パスワードの指定がなければ初期パスワードをセット
+                raw_passwords = [
+                    row[4] if len(row) > 4 and row[4] else INITIAL_PASSWORD
+                    for row in rows
+                ]
+                passwords = make_passwords(raw_passwords, options['workers'])
+                for employee, password in zip(employees, passwords):
+                    employee.password = password
+            Employee.objects.bulk_create(employees, batch_size=500)
+
+        print(f'{len(employees)} employee records created in {time() - _start:.1f} secs.')
+
+    def validate_rows(self, rows):
+        """(行番号, エラーメッセージ) のリストを返す"""
+        errors = []
+        fields = [Employee._meta.get_field(name)
+                  for name in ('username', 'last_name', 'first_name')]
+        usernames = {}
+        for line, row in rows:
+            if len(row) < 4 or not row[0]:
+                errors.append((line, "部署名・ユーザー名・姓・名を指定してください。"))
+                continue
+            for field, value in zip(fields, row[1:4]):
+                try:
+                    field.clean(value, None)
+                except ValidationError as e:
+                    errors.extend((line, f'{field.name}: {message}') for message in e.messages)
+            if row[1] in usernames:
+                errors.append((line, f'ユーザー名が {usernames[row[1]]} 行目と重複しています。'))
+            usernames.setdefault(row[1], line)
+        # 登録済みのユーザー名は SQLite の変数の上限に収まるように分けて調べる
+        names = list(usernames)
+        for i in range(0, len(names), 500):
+            existing = Employee.objects.filter(username__in=names[i:i + 500]) \
+                .values_list('username', flat=True)
+            errors.extend(
+                (usernames[username], "ユーザー名は既に登録されています。") for username in existing)
+        return sorted(errors)
+
+    def get_or_create_departments(self, names):
+        """部署名と部署のマッピングを返す（存在しない部署はまとめて作成する）"""
+        departments = {d.name: d for d in Department.objects.filter(name__in=names)}
+        missing_names = names - departments.keys()
+        if missing_names:
+            Department.objects.bulk_create(
+                [Department(name=name) for name in missing_names])
+            departments.update(
+                (d.name, d) for d in Department.objects.filter(name__in=missing_names))
+        return departments
@@ -0,0 +1,24 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+
+# 従業員の初期パスワード
+INITIAL_PASSWORD = 'pass12345'
+
+
+def make_passwords(raw_passwords, max_workers=None):
+    """パスワードのリストをまとめてハッシュ化する
+
+    同じパスワードは1回だけハッシュ化して結果を使い回し、
+    異なるパスワードが複数ある場合はプロセスプールで並列にハッシュ化する。
+    同じパスワードのユーザーはソルトも同じになる（ハッシュ値からパスワードが同じことは分かる）ため、
+    初期パスワードのように変更を前提としたパスワードに使う
+    """
+    unique_passwords = list(dict.fromkeys(raw_passwords))
+    if len(unique_passwords) <= 1 or max_workers == 1:
+        hashed_passwords = [make_password(password) for password in unique_passwords]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            hashed_passwords = list(executor.map(make_password, unique_passwords))
+    hashed = dict(zip(unique_passwords, hashed_passwords))
+    return [hashed[password] for password in raw_passwords]
@@ -1,3 +1,140 @@
+import io
+import os
+import tempfile
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.urls import reverse
+
+from .passwords import INITIAL_PASSWORD
+
+# accounts は INSTALLED_APPS に追加し、AUTH_USER_MODEL = 'accounts.Employee' とした場合のみテストする
+ACCOUNTS_INSTALLED = apps.is_installed('accounts')
+if ACCOUNTS_INSTALLED:
+    from .models import Department, Employee
+
+
+@skipUnless(ACCOUNTS_INSTALLED, "accounts is not in INSTALLED_APPS")
+class TestImportEmployees(TestCase):
+    """従業員データインポートのコマンドのユニットテスト"""
+
+    def write_csv(self, rows):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(''.join(row + '\n' for row in rows))
+        return path
+
+    def call_command(self, *args):
+        with patch('sys.stdout', new_callable=io.StringIO):
+            call_command('import_employees', *args)
+
+    def test_import(self):
+        """従業員がまとめて登録され、同じパスワードは1回だけハッシュ化されること"""
+
+        Department.objects.create(name='営業部')
+        path = self.write_csv([
+            '営業部,sato,佐藤,一郎',
+            '営業部,suzuki,鈴木,二郎,',
+            '開発部,tanaka,田中,三郎,secret123',
+        ])
+        with patch('accounts.passwords.make_password', wraps=make_password) as mock:
+            self.call_command(path, '--workers', '1')
+        # 初期パスワードと指定されたパスワードの2回だけハッシュ化される
+        self.assertEqual(mock.call_count, 2)
+
+        employees = {e.username: e for e in Employee.objects.select_related('department')}
+        self.assertEqual(sorted(employees), ['sato', 'suzuki', 'tanaka'])
+        self.assertEqual(employees['tanaka'].department.name, '開発部')
+        self.assertEqual(Department.objects.filter(name='営業部').count(), 1)
+        self.assertTrue(employees['sato'].check_password(INITIAL_PASSWORD))
+        self.assertTrue(employees['tanaka'].check_password('secret123'))
+        # 同じパスワードのユーザーはハッシュ値（ソルト）も同じになる
+        self.assertEqual(employees['sato'].password, employees['suzuki'].password)
+
+    def test_unusable_password(self):
+        """パスワードをハッシュ化せずに使用不可にできること"""
+
+        path = self.write_csv(['営業部,sato,佐藤,一郎'])
+        self.call_command(path, '--unusable-password')
+        self.assertFalse(Employee.objects.get(username='sato').has_usable_password())
+
+    def test_invalid_rows(self):
+        """不正な行やユーザー名の重複がある場合は、1件も登録されないこと"""
+
+        Employee.objects.create(username='sato')
+        path = self.write_csv([
+            '営業部,sato,佐藤,一郎',
+            '営業部,suzuki,鈴木,二郎',
+            '営業部,suzuki,鈴木,三郎',
+            '営業部,tanaka',
+            '営業部,a b,田中,四郎',
+        ])
+        with self.assertRaises(CommandError) as cm:
+            self.call_command(path)
+        messages = str(cm.exception).splitlines()
+        self.assertEqual(len(messages), 4)
+        self.assertTrue(messages[0].startswith('line 1: '))
+        self.assertEqual(messages[1], 'line 3: ユーザー名が 2 行目と重複しています。')
+        self.assertTrue(messages[2].startswith('line 4: '))
+        self.assertTrue(messages[3].startswith('line 5: username: '))
+        self.assertEqual(list(Employee.objects.values_list('username', flat=True)), ['sato'])
+        self.assertFalse(Department.objects.exists())
+
+
+@skipUnless(ACCOUNTS_INSTALLED, "accounts is not in INSTALLED_APPS")
+class TestAdminDepartment(TestCase):
+    """管理サイトの部署の変更画面のユニットテスト（システム管理者の場合）"""
+
+    PASSWORD = 'pass12345'
+
+    def setUp(self):
+        # テストユーザー（システム管理者）を作成
+        self.user = get_user_model().objects.create_superuser(
+            'admin', 'admin@example.com', self.PASSWORD)
+        self.client.login(username=self.user.username, password=self.PASSWORD)
+
+    def post_department(self, usernames):
+        data = {
+            'name': '営業部',
+            'employee_set-TOTAL_FORMS': len(usernames),
+            'employee_set-INITIAL_FORMS': 0,
+            'employee_set-MIN_NUM_FORMS': 0,
+            'employee_set-MAX_NUM_FORMS': 1000,
+        }
+        for i, username in enumerate(usernames):
+            data['employee_set-{}-username'.format(i)] = username
+            data['employee_set-{}-last_name'.format(i)] = '佐藤'
+            data['employee_set-{}-first_name'.format(i)] = '一郎'
+        return self.client.post(reverse('admin:accounts_department_add'), data)
+
+    def test_add_employees(self):
+        """新規の従業員がまとめて登録され、初期パスワードが設定されること"""
+
+        with patch('accounts.admin.make_password', wraps=make_password) as mock:
+            response = self.post_department(['sato', 'suzuki'])
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(mock.call_count, 1)
+        department = Department.objects.get()
+        employees = list(department.employee_set.order_by('username'))
+        self.assertEqual([e.username for e in employees], ['sato', 'suzuki'])
+        for employee in employees:
+            self.assertTrue(employee.check_password(INITIAL_PASSWORD))
+
+    def test_duplicate_usernames(self):
+        """ユーザー名が重複している場合は、エラーを表示して登録しないこと"""
 
-# Create your tests here.
+        # 1. フォームセット内での重複
+        response = self.post_department(['sato', 'sato'])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Department.objects.exists())
+        # 2. 登録済みのユーザー名との重複
+        response = self.post_department(['admin'])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Department.objects.exists())
+        self.assertEqual(Employee.objects.count(), 1)
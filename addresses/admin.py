@@ -1,6 +1,86 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ERROR_FLAG, IGNORED_PARAMS, PAGE_VAR, SEARCH_VAR
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseRedirect
+from django.core.paginator import Paginator
+from django.db.models import F, Q
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.functional import cached_property
 
-from .models import Address
+from . import search
+from . import snapshot
+from .models import Address, AddressVersion
+
+# 一覧画面のみで使う（都道府県別の集計では無視する）パラメータ
+CHANGELIST_ONLY_PARAMS = (*IGNORED_PARAMS, PAGE_VAR, ERROR_FLAG, '_changelist_filters')
+
+
+class AddressPaginator(Paginator):
+    """住所マスタの一覧画面用のページネータ
+
+    件数は見積もり（絞り込みがなければバージョンの件数、あれば MAX_COUNT 件で打ち切り）を使い、
+    ページの取得ではインデックスのみで OFFSET を読み飛ばしてから該当ページの住所を取得する。
+    打ち切った場合も、表示中のページの次のページまでは数えて先のページに進めるようにする。
+    """
+
+    # 絞り込み時に数える件数の上限
+    MAX_COUNT = 10000
+
+    def __init__(self, *args, estimated_count=None, page_number=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.estimated_count = estimated_count
+        self.page_number = page_number
+        # 件数を打ち切ったかどうか
+        self.truncated = False
+
+    @cached_property
+    def count(self):
+        if self.estimated_count is not None:
+            return self.estimated_count
+        limit = max(self.MAX_COUNT, (self.page_number + 1) * self.per_page)
+        count = self.object_list.order_by()[:limit + 1].count()
+        self.truncated = count > limit
+        return min(count, limit)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        pks = list(self.object_list.values_list('pk', flat=True)[bottom:top])
+        return self._get_page(self.object_list.filter(pk__in=pks), number, self)
+
+
+class SnapshotChoicesListFilter(admin.ChoicesFieldListFilter):
+    """選択肢ごとの件数をスナップショットから求めて表示するフィルタ
+
+    区分値の列以外の条件や検索キーワードが指定されている場合は件数を表示しない。
+    """
+
+    def choices(self, changelist):
+        counts = self.get_counts(changelist)
+        choices = super().choices(changelist)
+        # 「すべて」
+        yield next(choices)
+        for (value, title), choice in zip(self.field.flatchoices, choices):
+            if counts is not None:
+                choice['display'] = '{} ({})'.format(title, counts.get(value, 0))
+            yield choice
+
+    def get_counts(self, changelist):
+        if changelist.query:
+            return None
+        params = changelist.get_filters_params()
+        params.pop(self.lookup_kwarg, None)
+        filters = snapshot.get_flag_filters(params)
+        if filters is None:
+            return None
+        address_snapshot = snapshot.get_snapshot()
+        if address_snapshot is None:
+            return None
+        return address_snapshot.value_counts(self.field_path, filters)
 
 
 class AddressAdmin(admin.ModelAdmin):
@@ -14,10 +94,96 @@ class AddressAdmin(admin.ModelAdmin):
         'local_goverment_code', 'postal_code', 'prefecture', 'city', 'section',
     )
     ordering = ('postal_code', 'id',)
-    list_filter = (
-        'has_multiple_postal_codes', 'has_banchi', 'has_chome', 'has_multiple_sections',
-        'update_status', 'update_reason',
-    )
+    # 絞り込み時に全件の件数を求めない
+    show_full_result_count = False
+    list_filter = tuple((field, SnapshotChoicesListFilter) for field in snapshot.FLAG_FIELDS)
+
+    def get_queryset(self, request):
+        # 現在のバージョンの住所のみを対象とする
+        return super().get_queryset(request).current()
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        params = set(request.GET).difference(IGNORED_PARAMS, [PAGE_VAR])
+        estimated_count = None
+        if not params and not request.GET.get(SEARCH_VAR):
+            # 絞り込みがなければ、住所の件数はバージョンの件数と同じ
+            estimated_count = AddressVersion.objects.filter(is_current=True) \
+                .values_list('row_count', flat=True).first()
+        try:
+            page_number = max(int(request.GET.get(PAGE_VAR, 0)), 0) + 1
+        except ValueError:
+            page_number = 1
+        return AddressPaginator(queryset, per_page, orphans, allow_empty_first_page,
+                                estimated_count=estimated_count, page_number=page_number)
+
+    def save_model(self, request, obj, form, change):
+        if obj.version_id is None:
+            # 追加した住所は現在のバージョンに含める（一覧画面の件数も合わせて増やす）
+            obj.version = AddressVersion.objects.filter(is_current=True).first()
+            AddressVersion.objects.filter(pk=obj.version_id).update(row_count=F('row_count') + 1)
+        # 検索用テキストと bi-gram を作り直す
+        obj.search_text = search.get_search_text(obj)
+        super().save_model(request, obj, form, change)
+        addresses = Address.objects.filter(pk=obj.pk)
+        search.delete_search_index(addresses)
+        search.build_search_index(addresses)
+
+    def get_search_results(self, request, queryset, search_term):
+        """数字は郵便番号・全国地方公共団体コードで、それ以外は住所のあいまい検索で絞り込む"""
+        for term in search_term.split():
+            digits = term.replace('-', '')
+            if digits.isdigit():
+                condition = Q(postal_code__startswith=digits)
+                # 全国地方公共団体コードは5桁（検査数字付きは6桁）なので、それ以外の桁数では比較しない
+                if len(digits) in (5, 6):
+                    condition |= Q(local_goverment_code=int(digits))
+                queryset = queryset.filter(condition)
+            else:
+                queryset = search.search(queryset, term)
+        return queryset, False
+
+    def get_urls(self):
+        """URLパターンと対応するビューを定義"""
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            # 都道府県別の集計画面のURLパターン
+            path('breakdown/', self.admin_site.admin_view(self.breakdown_view),
+                 name='%s_%s_breakdown' % info),
+        ] + super().get_urls()
+
+    def breakdown_view(self, request):
+        """都道府県別の集計画面を表示するためのビュー"""
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        params = request.GET.dict()
+        search_term = params.get(SEARCH_VAR)
+        for name in CHANGELIST_ONLY_PARAMS:
+            params.pop(name, None)
+        filters = snapshot.get_flag_filters(params)
+        if filters is None:
+            # 集計できない条件を無視して全国の件数を表示しないようにする
+            self.message_user(
+                request, '区分値以外の絞り込み条件は都道府県別の集計に指定できません。',
+                messages.ERROR)
+            changelist_url = reverse('admin:%s_%s_changelist' % (
+                self.model._meta.app_label, self.model._meta.model_name))
+            return HttpResponseRedirect(changelist_url + '?' + request.GET.urlencode())
+        if search_term:
+            self.message_user(
+                request, '検索キーワードは都道府県別の集計には反映されません。', messages.WARNING)
+        fields = [self.model._meta.get_field(field) for field in snapshot.APPLICABLE_FIELDS]
+        rows = snapshot.prefecture_breakdown(filters)
+        context = {
+            'title': '都道府県別の集計',
+            'opts': self.model._meta,
+            'fields': fields,
+            'rows': [
+                (row['prefecture'], row['total'], [row[field.name] for field in fields])
+                for row in rows
+            ],
+            **self.admin_site.each_context(request),
+        }
+        return TemplateResponse(request, 'admin/addresses/address/breakdown.html', context)
 
 
 admin.site.register(Address, AddressAdmin)
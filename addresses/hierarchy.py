@@ -0,0 +1,39 @@
+from django.db.models import Count, Min
+
+from .models import Address, City, Prefecture
+
+
+def build_hierarchy(version):
+    """指定したバージョンの住所から都道府県・市区町村のテーブルを作り直す
+
+    市区町村は全国地方公共団体コードで、都道府県はその上2桁でまとめる。
+    """
+    rows = (
+        Address.objects.filter(version=version)
+        .values('local_goverment_code')
+        .annotate(
+            prefecture=Min('prefecture'),
+            prefecture_kana=Min('prefecture_kana'),
+            city=Min('city'),
+            city_kana=Min('city_kana'),
+            section_count=Count('id'),
+        )
+        .order_by('local_goverment_code')
+    )
+    prefectures, cities = {}, []
+    for row in rows:
+        code = row['local_goverment_code'] // 1000
+        prefecture = prefectures.get(code)
+        if prefecture is None:
+            prefecture = prefectures[code] = Prefecture(
+                code=code, name=row['prefecture'], name_kana=row['prefecture_kana'])
+        prefecture.city_count += 1
+        cities.append(City(
+            code=row['local_goverment_code'], prefecture=prefecture,
+            name=row['city'], name_kana=row['city_kana'],
+            section_count=row['section_count'],
+        ))
+    City.objects.all().delete()
+    Prefecture.objects.all().delete()
+    Prefecture.objects.bulk_create(prefectures.values())
+    City.objects.bulk_create(cities)
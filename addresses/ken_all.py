@@ -0,0 +1,130 @@
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# KEN_ALL.CSV の各列に対応する Address モデルのフィールド名
+FIELD_NAMES = (
+    'local_goverment_code', 'postal_code_old', 'postal_code',
+    'prefecture_kana', 'city_kana', 'section_kana',
+    'prefecture', 'city', 'section',
+    'has_multiple_postal_codes', 'has_banchi', 'has_chome', 'has_multiple_sections',
+    'update_status', 'update_reason',
+)
+# 整数値の列
+INTEGER_COLUMNS = (0, 9, 10, 11, 12, 13, 14)
+SECTION_KANA, SECTION = 5, 8
+
+# 町域名を空にする表記（町域名カナも空にする）
+BLANK_SECTIONS = ('以下に掲載がない場合',)
+BLANK_SECTION_SUFFIXES = ('の次に番地がくる場合', '一円')
+# 町域名から取り除く表記
+REMOVED_MARKERS = (
+    ('（次のビルを除く）', '(ﾂｷﾞﾉﾋﾞﾙｦﾉｿﾞｸ)'),
+    ('（地階・階層不明）', '(ﾁｶｲ･ｶｲｿｳﾌﾒｲ)'),
+)
+
+
+def normalize_row(row):
+    """特殊な表記を正規化して、整数値の列を変換する"""
+    row = list(row)
+    section = row[SECTION]
+    if section in BLANK_SECTIONS or (
+            section.endswith(BLANK_SECTION_SUFFIXES) and section != '一円'):
+        # 「一円」という町域名は実在するのでそのまま残す
+        row[SECTION] = row[SECTION_KANA] = ''
+    for marker, marker_kana in REMOVED_MARKERS:
+        row[SECTION] = row[SECTION].replace(marker, '')
+        row[SECTION_KANA] = row[SECTION_KANA].replace(marker_kana, '')
+    for i in INTEGER_COLUMNS:
+        row[i] = int(row[i])
+    return tuple(row)
+
+
+def _is_open(section):
+    return section.count('（') > section.count('）')
+
+
+def merge_rows(rows):
+    """複数行に分割された町域名のレコードを1行にまとめる
+
+    町域名の括弧が閉じていない行は、括弧が閉じるまで後続の行の
+    町域名（カナ）を連結して1件のレコードとして扱う。
+    """
+    merged = None
+    for row in rows:
+        if merged is not None:
+            merged[SECTION] += row[SECTION]
+            merged[SECTION_KANA] += row[SECTION_KANA]
+            if not _is_open(merged[SECTION]):
+                yield normalize_row(merged)
+                merged = None
+        elif _is_open(row[SECTION]):
+            merged = list(row)
+        else:
+            yield normalize_row(row)
+    if merged is not None:
+        yield normalize_row(merged)
+
+
+def _postal_code(line):
+    return line.split(b',', 3)[2]
+
+
+def _record_boundary(f, offset, size):
+    """offset 以降で最初のレコードの区切り位置を求める
+
+    分割されたレコードは全て同じ郵便番号を持つので、
+    郵便番号が変わる行の先頭をレコードの区切りとする。
+    """
+    f.seek(offset)
+    if offset:
+        # 途中から始まる行は読み飛ばす
+        f.readline()
+    previous = None
+    while True:
+        position = f.tell()
+        line = f.readline()
+        if not line:
+            return size
+        postal_code = _postal_code(line)
+        if previous is not None and postal_code != previous:
+            return position
+        previous = postal_code
+
+
+def split_ranges(path, count):
+    """ファイルをレコードの区切りで count 個のバイト範囲に分割する"""
+    size = os.path.getsize(path)
+    boundaries = [0]
+    with open(path, 'rb') as f:
+        for i in range(1, count):
+            boundary = _record_boundary(f, size * i // count, size)
+            if boundaries[-1] < boundary < size:
+                boundaries.append(boundary)
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def parse_range(path, start, end, encoding='shift_jis'):
+    """ファイルの指定したバイト範囲を解析してレコードのリストを返す"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        content = f.read(end - start).decode(encoding)
+    return list(merge_rows(csv.reader(io.StringIO(content))))
+
+
+def parse(path, encoding='shift_jis', workers=None):
+    """KEN_ALL.CSV をプロセスプールで並列に解析してレコードを順に返す"""
+    workers = workers or os.cpu_count() or 1
+    ranges = split_ranges(path, workers)
+    if len(ranges) == 1:
+        yield from parse_range(path, 0, ranges[0][1], encoding)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(parse_range, path, start, end, encoding)
+            for start, end in ranges
+        ]
+        for future in futures:
+            yield from future.result()
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from time import time
+
+from addresses.hierarchy import build_hierarchy
+from addresses.models import AddressVersion
+
+
+class Command(BaseCommand):
+    """都道府県・市区町村のテーブルの再作成
+
+    import_ken_all や rollback_address_version では自動で作成されるので、
+    それ以前に登録された住所マスタに対してのみ実行すればよい。
+    """
+
+    help = "Rebuild the prefecture and city tables from the current address master."
+
+    def handle(self, *args, **options):
+        _start = time()
+
+        version = AddressVersion.objects.filter(is_current=True).first()
+        if version is None:
+            raise CommandError('No current version of the address master.')
+        build_hierarchy(version)
+
+        print(f'Address hierarchy rebuilt in {time() - _start:.1f} secs.')
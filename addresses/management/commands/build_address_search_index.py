@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from time import time
+
+from addresses.models import Address
+from addresses.search import build_search_index, delete_search_index
+
+
+class Command(BaseCommand):
+    """住所の検索用インデックスの再作成
+
+    import_ken_all で登録した住所はインデックス作成済みなので、
+    それ以前に登録された住所に対してのみ実行すればよい。
+    """
+
+    help = "Rebuild the normalized search index of the current address master."
+
+    def handle(self, *args, **options):
+        _start = time()
+
+        addresses = Address.objects.current()
+        delete_search_index(addresses)
+        addresses.update(search_text=None)
+        build_search_index(addresses)
+
+        print(f'Search index rebuilt in {time() - _start:.1f} secs.')
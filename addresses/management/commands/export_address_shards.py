@@ -0,0 +1,89 @@
+import gzip
+import hashlib
+import json
+import os
+from itertools import groupby
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from time import time
+
+from addresses.models import Address, AddressVersion
+from addresses.shards import MANIFEST_POINTER_NAME, read_manifest_pointer
+
+
+class Command(BaseCommand):
+    """郵便番号データの静的JSONファイル出力
+
+    郵便番号の上3桁ごとに住所を JSON ファイル（シャード）に分割して、
+    内容のハッシュ値を含むファイル名で ADDRESS_SHARDS_ROOT に出力する。
+    上3桁とシャードのURLの対応表もハッシュ値を含むファイル名（manifest.<ハッシュ値>.json）で出力し、
+    そのファイル名を出力元のバージョンの ID とあわせて manifest.txt に記録する
+    （バージョンが切り替わった後は、再出力されるまで対応表を使わない）。
+    いずれのファイルも内容が変わればURLが変わるので、長期間キャッシュさせてよい。
+    現在と1つ前の対応表から参照されないファイルは削除する。
+    """
+
+    help = "Export the address master as static, content-hashed JSON shards."
+
+    def handle(self, *args, **options):
+        _start = time()
+
+        os.makedirs(settings.ADDRESS_SHARDS_ROOT, exist_ok=True)
+        previous_name = read_manifest_pointer()[1]
+        version = AddressVersion.objects.get(is_current=True)
+        addresses = Address.objects.filter(version=version).order_by('postal_code', 'id') \
+            .values_list('postal_code', 'prefecture', 'city', 'section').iterator()
+        manifest = {}
+        for prefix, rows in groupby(addresses, key=lambda row: row[0][:3]):
+            shard = {}
+            for postal_code, prefecture, city, section in rows:
+                shard.setdefault(postal_code, []).append({
+                    'prefecture': prefecture,
+                    'city': city,
+                    'section': section or '',
+                })
+            manifest[prefix] = settings.ADDRESS_SHARDS_URL + self.write_shard(prefix, shard)
+        manifest_name = self.write_shard('manifest', manifest)
+        self.write_file(MANIFEST_POINTER_NAME, f'{version.pk} {manifest_name}'.encode())
+        # 出力前に表示された画面から参照されている可能性があるので、1つ前の対応表のファイルは残す
+        removed = self.prune([manifest_name, previous_name])
+
+        print(f'{len(manifest)} address shards exported ({removed} old files removed) '
+              f'in {time() - _start:.1f} secs.')
+
+    def write_shard(self, prefix, shard):
+        """シャード（または対応表）を出力してファイル名を返す（同じ内容のファイルは出力済みであればスキップ）"""
+        content = json.dumps(shard, ensure_ascii=False, separators=(',', ':'),
+                             sort_keys=True).encode()
+        filename = f'{prefix}.{hashlib.md5(content).hexdigest()[:12]}.json'
+        if not os.path.exists(os.path.join(settings.ADDRESS_SHARDS_ROOT, filename)):
+            self.write_file(filename + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+            self.write_file(filename, content)
+        return filename
+
+    def prune(self, manifest_names):
+        """対応表から参照されないシャード・対応表のファイルを削除して、削除した件数を返す"""
+        keep = {MANIFEST_POINTER_NAME}
+        for name in filter(None, manifest_names):
+            keep.add(name)
+            try:
+                with open(os.path.join(settings.ADDRESS_SHARDS_ROOT, name), encoding='utf-8') as f:
+                    urls = json.load(f).values()
+            except FileNotFoundError:
+                continue
+            keep.update(url.rsplit('/', 1)[-1] for url in urls)
+        keep.update([name + '.gz' for name in keep])
+        removed = 0
+        for filename in os.listdir(settings.ADDRESS_SHARDS_ROOT):
+            if filename not in keep and filename.endswith(('.json', '.json.gz')):
+                os.remove(os.path.join(settings.ADDRESS_SHARDS_ROOT, filename))
+                removed += 1
+        return removed
+
+    def write_file(self, filename, content):
+        # 配信中のファイルが途中まで書き込まれた状態にならないように置き換える
+        path = os.path.join(settings.ADDRESS_SHARDS_ROOT, filename)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(content)
+        os.replace(path + '.tmp', path)
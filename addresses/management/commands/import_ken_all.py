@@ -1,10 +1,11 @@
-import csv
 import os
 
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from time import time
 
-from addresses.models import Address
+from addresses import ken_all
+from addresses.versions import load_version
 
 # 郵便番号データ（全国一括データ（加工済バージョン））
 # http://zipcloud.ibsnet.co.jp/
@@ -13,35 +14,40 @@ ADDRESSES_CSV_PATH = os.path.join(INPUTS_DIR, 'x-ken-all.csv')
 
 
 class Command(BaseCommand):
-    """郵便番号データインポート"""
+    """郵便番号データインポート
+
+    日本郵便の KEN_ALL.CSV（加工前）も読み込めるように、
+    複数行に分割されたレコードは1行にまとめてから登録する。
+    住所は新しいバージョンとして登録し、登録が完了してから切り替える。
+    """
 
     help = "Bulk import for all address records."
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=ADDRESSES_CSV_PATH,
+            help="Path of the KEN_ALL CSV file (default: inputs/x-ken-all.csv).")
+        parser.add_argument(
+            '--encoding', default='shift_jis',
+            help="Encoding of the CSV file (default: shift_jis).")
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help="Number of processes used for parsing (default: number of CPUs).")
+        parser.add_argument(
+            '--keep', type=int, default=1,
+            help="Number of previous versions kept for rollback (default: 1).")
+        parser.add_argument(
+            '--export-shards', action='store_true',
+            help="Export the static JSON shards after importing.")
+
     def handle(self, *args, **options):
         _start = time()
 
-        with open(ADDRESSES_CSV_PATH, encoding='shift_jis') as f:
-            reader = csv.reader(f)
-            addresses = [
-                Address(
-                    local_goverment_code=row[0],
-                    postal_code_old=row[1],
-                    postal_code=row[2],
-                    prefecture_kana=row[3],
-                    city_kana=row[4],
-                    section_kana=row[5],
-                    prefecture=row[6],
-                    city=row[7],
-                    section=row[8],
-                    has_multiple_postal_codes=row[9],
-                    has_banchi=row[10],
-                    has_chome=row[11],
-                    has_multiple_sections=row[12],
-                    update_status=row[13],
-                    update_reason=row[14],
-                )
-                for row in reader
-            ]
-        Address.objects.bulk_create(addresses)
-
-        print(f'{len(addresses)} address records created in {time() - _start:.1f} secs.')
+        rows = ken_all.parse(options['path'], options['encoding'], options['workers'])
+        version = load_version(rows, keep=options['keep'])
+
+        print(f'{version.row_count} address records created as version {version.pk} '
+              f'in {time() - _start:.1f} secs.')
+
+        if options['export_shards']:
+            call_command('export_address_shards')
@@ -0,0 +1,25 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from addresses.versions import rollback_version
+
+
+class Command(BaseCommand):
+    """住所マスタのロールバック"""
+
+    help = "Switch the address master back to the previous version."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--export-shards', action='store_true',
+            help="Export the static JSON shards after rolling back.")
+
+    def handle(self, *args, **options):
+        version = rollback_version()
+        if version is None:
+            raise CommandError('No previous version to roll back to.')
+        print(f'Address master rolled back to version {version.pk} '
+              f'({version.row_count} records).')
+
+        if options['export_shards']:
+            call_command('export_address_shards')
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.28 on 2026-10-19 17:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def create_initial_version(apps, schema_editor):
+    """登録済みの住所を最初のバージョンとする"""
+    Address = apps.get_model('addresses', 'Address')
+    AddressVersion = apps.get_model('addresses', 'AddressVersion')
+    row_count = Address.objects.count()
+    if row_count:
+        version = AddressVersion.objects.create(
+            is_current=True, row_count=row_count, loaded_at=timezone.now())
+        Address.objects.update(version=version)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('addresses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AddressVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_current', models.BooleanField(db_index=True, default=False, verbose_name='現在のバージョン')),
+                ('row_count', models.IntegerField(default=0, verbose_name='件数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='作成日時')),
+                ('loaded_at', models.DateTimeField(blank=True, null=True, verbose_name='登録完了日時')),
+            ],
+            options={
+                'verbose_name': '住所マスタのバージョン',
+                'verbose_name_plural': '住所マスタのバージョン',
+                'db_table': 'address_version',
+            },
+        ),
+        migrations.AddField(
+            model_name='address',
+            name='version',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='addresses.AddressVersion', verbose_name='バージョン'),
+        ),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['version', 'postal_code'], name='address_version_postal_idx'),
+        ),
+        migrations.RunPython(create_initial_version, migrations.RunPython.noop),
+    ]
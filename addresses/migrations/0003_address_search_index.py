@@ -0,0 +1,36 @@
+# Generated by Django 2.2.28 on 2026-10-19 17:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('addresses', '0002_address_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='search_text',
+            field=models.TextField(blank=True, editable=False, null=True, verbose_name='検索用テキスト'),
+        ),
+        migrations.CreateModel(
+            name='AddressSearchGram',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.CharField(max_length=2)),
+                ('address', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, to='addresses.Address')),
+            ],
+            options={
+                'verbose_name': '住所検索インデックス',
+                'verbose_name_plural': '住所検索インデックス',
+                'db_table': 'address_search_gram',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='addresssearchgram',
+            index=models.Index(fields=['gram', 'address'], name='address_search_gram_idx'),
+        ),
+    ]
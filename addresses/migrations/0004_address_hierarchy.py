@@ -0,0 +1,53 @@
+# Generated by Django 2.2.28 on 2026-10-19 17:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('addresses', '0003_address_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='City',
+            fields=[
+                ('code', models.IntegerField(primary_key=True, serialize=False, verbose_name='全国地方公共団体コード')),
+                ('name', models.CharField(max_length=255, verbose_name='市区町村名')),
+                ('name_kana', models.CharField(max_length=255, verbose_name='市区町村名カナ')),
+                ('section_count', models.IntegerField(default=0, verbose_name='町域数')),
+            ],
+            options={
+                'verbose_name': '市区町村',
+                'verbose_name_plural': '市区町村',
+                'db_table': 'address_city',
+                'ordering': ('code',),
+            },
+        ),
+        migrations.CreateModel(
+            name='Prefecture',
+            fields=[
+                ('code', models.PositiveSmallIntegerField(primary_key=True, serialize=False, verbose_name='都道府県コード')),
+                ('name', models.CharField(max_length=255, verbose_name='都道府県名')),
+                ('name_kana', models.CharField(max_length=255, verbose_name='都道府県名カナ')),
+                ('city_count', models.IntegerField(default=0, verbose_name='市区町村数')),
+            ],
+            options={
+                'verbose_name': '都道府県',
+                'verbose_name_plural': '都道府県',
+                'db_table': 'address_prefecture',
+                'ordering': ('code',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['version', 'local_goverment_code'], name='address_version_city_idx'),
+        ),
+        migrations.AddField(
+            model_name='city',
+            name='prefecture',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='addresses.Prefecture', verbose_name='都道府県'),
+        ),
+    ]
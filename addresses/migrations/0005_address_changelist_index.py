@@ -0,0 +1,21 @@
+# Generated by Django 2.2.28 on 2026-10-19 17:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('addresses', '0004_address_hierarchy'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='address',
+            name='address_version_postal_idx',
+        ),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['version', 'postal_code', 'id'], name='address_version_postal_idx'),
+        ),
+    ]
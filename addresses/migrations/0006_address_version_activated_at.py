@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-19 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('addresses', '0005_address_changelist_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='addressversion',
+            name='activated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='切り替え日時'),
+        ),
+    ]
@@ -1,4 +1,45 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Subquery
+
+
+class AddressVersion(models.Model):
+    """住所マスタのバージョンモデル
+
+    インポートのたびに新しいバージョンを作成して住所を登録し、
+    登録が完了してから現在のバージョンを切り替える。
+    """
+
+    class Meta:
+        db_table = 'address_version'
+        verbose_name = verbose_name_plural = '住所マスタのバージョン'
+
+    is_current = models.BooleanField('現在のバージョン', default=False, db_index=True)
+    row_count = models.IntegerField('件数', default=0)
+    created_at = models.DateTimeField('作成日時', auto_now_add=True)
+    loaded_at = models.DateTimeField('登録完了日時', null=True, blank=True)
+    activated_at = models.DateTimeField('切り替え日時', null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.pk} ({self.row_count})'
+
+
+class AddressQuerySet(models.QuerySet):
+    def current(self):
+        """現在のバージョンの住所のみに絞り込む
+
+        インデックスの先頭列の等価条件になるように、バージョンはサブクエリで1件に絞る。
+        """
+        return self.filter(version=Subquery(
+            AddressVersion.objects.filter(is_current=True).values('pk')[:1]))
+
+    def delete(self):
+        """住所を bi-gram とともに削除する"""
+        with transaction.atomic(using=self.db):
+            AddressSearchGram.objects.using(self.db).filter(address__in=self).delete()
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
 
 
 class Address(models.Model):
@@ -7,6 +48,15 @@ class Address(models.Model):
     class Meta:
         db_table = 'address'
         verbose_name = verbose_name_plural = '住所マスタ'
+        indexes = [
+            # 管理サイトの一覧画面の並び順（郵便番号・ID）に合わせたインデックス
+            models.Index(fields=['version', 'postal_code', 'id'],
+                         name='address_version_postal_idx'),
+            models.Index(fields=['version', 'local_goverment_code'],
+                         name='address_version_city_idx'),
+        ]
+
+    objects = AddressQuerySet.as_manager()
 
     APPLICABLE_CHOICES = (
         (1, '該当'),
@@ -48,6 +98,69 @@ class Address(models.Model):
                                                      choices=APPLICABLE_CHOICES)
     update_status = models.SmallIntegerField('更新の表示', choices=UPDATE_STATUS_CHOICES)
     update_reason = models.SmallIntegerField('変更理由', choices=UPDATE_REASON_CHOICES)
+    version = models.ForeignKey(AddressVersion, verbose_name='バージョン',
+                                on_delete=models.CASCADE, null=True, blank=True,
+                                editable=False)
+    search_text = models.TextField('検索用テキスト', null=True, blank=True, editable=False)
 
     def __str__(self):
         return f'{self.postal_code}/{self.prefecture}/{self.city}/{self.section}'
+
+    def delete(self, using=None, keep_parents=False):
+        """住所を bi-gram とともに削除する"""
+        using = using or self._state.db
+        with transaction.atomic(using=using):
+            AddressSearchGram.objects.using(using).filter(address=self).delete()
+            return super().delete(using, keep_parents)
+
+
+class AddressSearchGram(models.Model):
+    """住所の検索用の bi-gram モデル"""
+
+    class Meta:
+        db_table = 'address_search_gram'
+        verbose_name = verbose_name_plural = '住所検索インデックス'
+        indexes = [
+            models.Index(fields=['gram', 'address'], name='address_search_gram_idx'),
+        ]
+
+    # 住所の一括削除を1回の DELETE でおこなえるように CASCADE にはせず、
+    # Address.delete() と AddressQuerySet.delete() で住所の削除前に削除する
+    address = models.ForeignKey(Address, on_delete=models.DO_NOTHING, db_index=False)
+    gram = models.CharField(max_length=2)
+
+
+class Prefecture(models.Model):
+    """都道府県モデル（現在のバージョンの住所マスタから作成する）"""
+
+    class Meta:
+        db_table = 'address_prefecture'
+        verbose_name = verbose_name_plural = '都道府県'
+        ordering = ('code',)
+
+    code = models.PositiveSmallIntegerField('都道府県コード', primary_key=True)
+    name = models.CharField('都道府県名', max_length=255)
+    name_kana = models.CharField('都道府県名カナ', max_length=255)
+    city_count = models.IntegerField('市区町村数', default=0)
+
+    def __str__(self):
+        return self.name
+
+
+class City(models.Model):
+    """市区町村モデル（現在のバージョンの住所マスタから作成する）"""
+
+    class Meta:
+        db_table = 'address_city'
+        verbose_name = verbose_name_plural = '市区町村'
+        ordering = ('code',)
+
+    code = models.IntegerField('全国地方公共団体コード', primary_key=True)
+    prefecture = models.ForeignKey(Prefecture, verbose_name='都道府県',
+                                   on_delete=models.CASCADE)
+    name = models.CharField('市区町村名', max_length=255)
+    name_kana = models.CharField('市区町村名カナ', max_length=255)
+    section_count = models.IntegerField('町域数', default=0)
+
+    def __str__(self):
+        return self.name
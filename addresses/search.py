@@ -0,0 +1,78 @@
+import unicodedata
+
+from django.db.models import Count
+
+from .models import Address, AddressSearchGram
+
+# カタカナをひらがなに変換し、小書きの「ヶ」「ヵ」などを「け」「か」に揃える
+KANA_TABLE = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+KANA_TABLE.update({
+    ord('ゖ'): 'け',
+    ord('ゕ'): 'か',
+    ord('ヶ'): 'け',
+    ord('ヵ'): 'か',
+    ord('ー'): None,
+    ord('・'): None,
+    ord(' '): None,
+})
+
+
+def normalize(text):
+    """検索用にテキストを正規化する（NFKC + カナの揃え + 小文字化）"""
+    return unicodedata.normalize('NFKC', text or '').translate(KANA_TABLE).lower()
+
+
+def get_search_text(address):
+    """住所の検索用テキストを求める（漢字表記とカナ表記を連結する）"""
+    return '{}{}{}\n{}{}{}'.format(
+        normalize(address.prefecture), normalize(address.city),
+        normalize(address.section), normalize(address.prefecture_kana),
+        normalize(address.city_kana), normalize(address.section_kana))
+
+
+def get_grams(text):
+    """テキストの bi-gram の集合を求める"""
+    return {text[i:i + 2] for i in range(len(text) - 1) if '\n' not in text[i:i + 2]}
+
+
+def build_search_index(queryset, batch_size=5000):
+    """住所の bi-gram を登録する（検索用テキストが未設定の住所は設定する）"""
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        missing = [address for address in batch if address.search_text is None]
+        for address in missing:
+            address.search_text = get_search_text(address)
+        Address.objects.bulk_update(missing, ['search_text'])
+        AddressSearchGram.objects.bulk_create([
+            AddressSearchGram(address=address, gram=gram)
+            for address in batch
+            for gram in get_grams(address.search_text)
+        ])
+
+
+def delete_search_index(addresses):
+    """住所の bi-gram を削除する"""
+    AddressSearchGram.objects.filter(address__in=addresses).delete()
+
+
+def search(queryset, term):
+    """住所を町域名などのあいまい検索で絞り込む
+
+    bi-gram の全てを含む住所に候補を絞り込んでから、検索用テキストで確認する。
+    """
+    text = normalize(term)
+    grams = get_grams(text)
+    if not grams:
+        return queryset.filter(search_text__contains=text)
+    candidates = (
+        AddressSearchGram.objects.filter(gram__in=grams)
+        .values('address')
+        .annotate(gram_count=Count('gram', distinct=True))
+        .filter(gram_count=len(grams))
+        .values('address')
+    )
+    return queryset.filter(pk__in=candidates, search_text__contains=text)
@@ -0,0 +1,42 @@
+import os
+
+from django.conf import settings
+
+from .models import AddressVersion
+
+# 現在のシャードの対応表（manifest.<ハッシュ値>.json）のファイル名を、
+# 出力元のバージョンの ID とあわせて「<バージョンの ID> <ファイル名>」の形式で記録するファイル
+MANIFEST_POINTER_NAME = 'manifest.txt'
+
+
+def read_manifest_pointer():
+    """manifest.txt に記録されたバージョンの ID と対応表のファイル名を返す（未出力の場合は None）"""
+    try:
+        with open(os.path.join(settings.ADDRESS_SHARDS_ROOT, MANIFEST_POINTER_NAME),
+                  encoding='utf-8') as f:
+            values = f.read().split()
+    except FileNotFoundError:
+        return None, None
+    if len(values) != 2 or not values[0].isdigit():
+        # バージョンの ID が記録されていない（古い形式の）場合
+        return None, values[-1] if values else None
+    return int(values[0]), values[1]
+
+
+def get_manifest_name():
+    """現在のシャードの対応表のファイル名を返す
+
+    未出力の場合や、現在のバージョンから出力されていない（出力後にバージョンが切り替わった）場合は None。
+    """
+    version_id, name = read_manifest_pointer()
+    if name is None or version_id is None:
+        return None
+    if not AddressVersion.objects.filter(pk=version_id, is_current=True).exists():
+        return None
+    return name
+
+
+def get_manifest_url():
+    """現在のシャードの対応表のURLを返す（未出力の場合は None）"""
+    name = get_manifest_name()
+    return settings.ADDRESS_SHARDS_URL + name if name else None
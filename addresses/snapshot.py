@@ -0,0 +1,143 @@
+import threading
+
+from django.db.models import Count, Min, Q
+
+from .models import Address, AddressVersion
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# スナップショットに保持する区分値の列
+FLAG_FIELDS = (
+    'has_multiple_postal_codes', 'has_banchi', 'has_chome', 'has_multiple_sections',
+    'update_status', 'update_reason',
+)
+# 都道府県別の集計で「該当」の件数を求める列
+APPLICABLE_FIELDS = FLAG_FIELDS[:4]
+
+
+def get_flag_filters(params):
+    """絞り込みのパラメータを {列名: 値} の条件に変換する
+
+    区分値の列の完全一致以外の条件が含まれる場合は None を返す。
+    """
+    filters = {}
+    for key, value in params.items():
+        field, _, lookup = key.partition('__')
+        if field not in FLAG_FIELDS or lookup != 'exact' or not value.isdigit():
+            return None
+        filters[field] = int(value)
+    return filters
+
+
+class AddressSnapshot:
+    """住所マスタの列指向のスナップショット
+
+    区分値の列を NumPy の小さな整数型の配列で保持し、
+    絞り込みや件数の集計をブール値のマスクでおこなう。
+    都道府県・市区町村は全国地方公共団体コードを整数のまま保持する。
+    """
+
+    def __init__(self, version_key, columns, local_goverment_codes, prefectures):
+        self.version_key = version_key
+        self.columns = columns
+        self.local_goverment_codes = local_goverment_codes
+        # 都道府県コード（全国地方公共団体コードの上2桁）
+        self.prefecture_codes = (local_goverment_codes // 1000).astype(np.int8)
+        # 都道府県コードと都道府県名の対応表
+        self.prefectures = prefectures
+
+    @classmethod
+    def load(cls, version_key):
+        rows = Address.objects.filter(version_id=version_key[0]) \
+            .order_by().values_list('local_goverment_code', 'prefecture', *FLAG_FIELDS)
+        codes, prefectures, columns = [], {}, [[] for _ in FLAG_FIELDS]
+        for code, prefecture, *flags in rows.iterator():
+            codes.append(code)
+            prefectures.setdefault(code // 1000, prefecture)
+            for column, flag in zip(columns, flags):
+                column.append(flag)
+        return cls(
+            version_key,
+            {field: np.array(column, dtype=np.int8) for field, column in zip(FLAG_FIELDS, columns)},
+            np.array(codes, dtype=np.int32),
+            prefectures,
+        )
+
+    def __len__(self):
+        return len(self.local_goverment_codes)
+
+    def mask(self, filters):
+        """{列名: 値} の条件に一致する行のマスクを求める"""
+        mask = np.ones(len(self), dtype=bool)
+        for field, value in filters.items():
+            mask &= self.columns[field] == int(value)
+        return mask
+
+    def value_counts(self, field, filters):
+        """条件に一致する行の、列の値ごとの件数を求める"""
+        counts = np.bincount(self.columns[field][self.mask(filters)])
+        return {value: int(count) for value, count in enumerate(counts) if count}
+
+    def prefecture_breakdown(self, filters):
+        """条件に一致する行の、都道府県ごとの件数と「該当」の件数を求める"""
+        mask = self.mask(filters)
+        codes = self.prefecture_codes[mask]
+        totals = np.bincount(codes, minlength=48)
+        applicable = {
+            field: np.bincount(codes, weights=self.columns[field][mask] == 1, minlength=48)
+            for field in APPLICABLE_FIELDS
+        }
+        return [
+            {
+                'prefecture': self.prefectures[code],
+                'total': int(totals[code]),
+                **{field: int(applicable[field][code]) for field in APPLICABLE_FIELDS},
+            }
+            for code in sorted(self.prefectures) if totals[code]
+        ]
+
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def get_snapshot():
+    """現在のバージョンのスナップショットを返す
+
+    スナップショットはプロセスごとに1回だけ読み込み、
+    住所マスタのバージョンが切り替わった場合は読み込み直す。
+    NumPy がインストールされていない場合は None を返す。
+    """
+    global _snapshot
+    if np is None:
+        return None
+    # ID が再利用された場合に備えて作成日時も合わせて比較する
+    version_key = AddressVersion.objects.filter(is_current=True) \
+        .values_list('pk', 'created_at').first()
+    if version_key is None:
+        return None
+    with _lock:
+        if _snapshot is None or _snapshot.version_key != version_key:
+            _snapshot = AddressSnapshot.load(version_key)
+        return _snapshot
+
+
+def prefecture_breakdown(filters):
+    """都道府県ごとの件数を求める（スナップショットが使えない場合はDBで集計する）"""
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.prefecture_breakdown(filters)
+    return list(
+        Address.objects.current().filter(**filters)
+        .values('prefecture')
+        .annotate(
+            code=Min('local_goverment_code'),
+            total=Count('id'),
+            **{field: Count('id', filter=Q(**{field: 1})) for field in APPLICABLE_FIELDS}
+        )
+        .order_by('code')
+        .values('prefecture', 'total', *APPLICABLE_FIELDS)
+    )
@@ -1,3 +1,587 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import ken_all
+from .admin import AddressAdmin, AddressPaginator
+from . import search
+from . import shards
+from . import snapshot
+from .models import Address, AddressSearchGram, AddressVersion, City, Prefecture
+from .versions import activate_version, load_version, rollback_version
+
+
+def create_address(postal_code, section, **kwargs):
+    """Addressモデルのテストレコードを作成する"""
+    fields = dict(
+        local_goverment_code=13101,
+        postal_code_old='100',
+        postal_code=postal_code,
+        prefecture_kana='トウキョウト',
+        city_kana='チヨダク',
+        section_kana='',
+        prefecture='東京都',
+        city='千代田区',
+        section=section,
+        has_multiple_postal_codes=0,
+        has_banchi=0,
+        has_chome=0,
+        has_multiple_sections=0,
+        update_status=0,
+        update_reason=0,
+        version=AddressVersion.objects.get_or_create(is_current=True)[0],
+    )
+    fields.update(kwargs)
+    return Address.objects.create(**fields)
+
+
+class TestExportAddressShards(TestCase):
+    """郵便番号データの静的JSONファイル出力のユニットテスト"""
+
+    def setUp(self):
+        # 出力先を一時ディレクトリにする
+        self.shards_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.shards_root)
+        settings_override = override_settings(
+            ADDRESS_SHARDS_ROOT=self.shards_root,
+            ADDRESS_SHARDS_URL='/address_shards/',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        create_address('1000001', '千代田')
+        create_address('1000002', '皇居外苑')
+        create_address('1010021', '外神田')
+        create_address('1010021', None)
+
+    def read_json(self, filename):
+        with open(os.path.join(self.shards_root, filename), encoding='utf-8') as f:
+            return json.load(f)
+
+    def read_manifest(self):
+        return self.read_json(shards.get_manifest_name())
+
+    def export(self):
+        with mock.patch('sys.stdout', new_callable=io.StringIO):
+            call_command('export_address_shards')
+
+    def test_export(self):
+        """上3桁ごとのシャードと対応表が出力されること"""
+
+        self.export()
+        # 対応表もハッシュ値を含むファイル名で出力される
+        self.assertRegex(shards.get_manifest_name(), r'^manifest\.[0-9a-f]{12}\.json$')
+        self.assertEqual(shards.get_manifest_url(),
+                         '/address_shards/' + shards.get_manifest_name())
+        manifest = self.read_manifest()
+        self.assertEqual(sorted(manifest), ['100', '101'])
+        self.assertTrue(manifest['100'].startswith('/address_shards/100.'))
+        # シャードの内容を検証
+        shard = self.read_json(os.path.basename(manifest['101']))
+        self.assertEqual(shard, {
+            '1010021': [
+                {'prefecture': '東京都', 'city': '千代田区', 'section': '外神田'},
+                {'prefecture': '東京都', 'city': '千代田区', 'section': ''},
+            ],
+        })
+        # 圧縮済みのファイルも出力されていることを確認
+        path = os.path.join(self.shards_root, os.path.basename(manifest['101']))
+        with gzip.open(path + '.gz') as f:
+            self.assertEqual(json.load(f), shard)
+
+    def test_export_is_content_hashed(self):
+        """内容が変わったシャードのみファイル名が変わること"""
+
+        self.export()
+        manifest_name = shards.get_manifest_name()
+        manifest = self.read_manifest()
+        create_address('1010022', '神田')
+        self.export()
+        new_manifest = self.read_manifest()
+        self.assertNotEqual(shards.get_manifest_name(), manifest_name)
+        self.assertEqual(new_manifest['100'], manifest['100'])
+        self.assertNotEqual(new_manifest['101'], manifest['101'])
+
+    def test_export_is_tied_to_version(self):
+        """バージョンが切り替わった後は、再出力するまで対応表を使わないこと"""
+
+        self.export()
+        version = AddressVersion.objects.get(is_current=True)
+        with open(os.path.join(self.shards_root, shards.MANIFEST_POINTER_NAME)) as f:
+            self.assertEqual(f.read(), '{} {}'.format(version.pk, shards.get_manifest_name()))
+        # 1. 別のバージョンに切り替えると、対応表は使われない
+        activate_version(AddressVersion.objects.create())
+        self.assertIsNone(shards.get_manifest_name())
+        self.assertIsNone(shards.get_manifest_url())
+        # 2. 元のバージョンに戻すと、再び使われる
+        activate_version(version)
+        self.assertIsNotNone(shards.get_manifest_url())
+
+    def test_export_prunes_old_files(self):
+        """現在と1つ前の対応表から参照されないファイルが削除されること"""
+
+        self.export()
+        first_files = set(os.listdir(self.shards_root))
+        create_address('1010022', '神田')
+        self.export()
+        # 1つ前の対応表とシャードは残る
+        self.assertTrue(first_files <= set(os.listdir(self.shards_root)))
+        create_address('1010023', '神田2')
+        self.export()
+        files = set(os.listdir(self.shards_root))
+        removed = first_files - files
+        # 1回目のみで参照されていた対応表と「101」のシャード（圧縮済みのファイルを含む）が削除される
+        self.assertEqual(len(removed), 4)
+        self.assertTrue(all(name.startswith(('manifest.', '101.')) for name in removed))
+        for url in self.read_manifest().values():
+            self.assertIn(os.path.basename(url), files)
+
+
+class TestKenAllParser(TestCase):
+    """KEN_ALL.CSV の解析処理のユニットテスト"""
+
+    ROWS = [
+        # 分割されていないレコード
+        '13101,"100  ","1000000","ﾄｳｷｮｳﾄ","ﾁﾖﾀﾞｸ","ｲｶﾆｹｲｻｲｶﾞﾅｲﾊﾞｱｲ","東京都","千代田区","以下に掲載がない場合",0,0,0,0,0,0',
+        # 3行に分割されたレコード
+        '01101,"064  ","0640941","ﾎｯｶｲﾄﾞｳ","ｻｯﾎﾟﾛｼﾁｭｳｵｳｸ","ｱｻﾋｶﾞｵｶ(1ﾁｮｳﾒ","北海道","札幌市中央区","旭ケ丘（１丁目",0,0,1,0,0,0',
+        '01101,"064  ","0640941","ﾎｯｶｲﾄﾞｳ","ｻｯﾎﾟﾛｼﾁｭｳｵｳｸ","､2ﾁｮｳﾒ","北海道","札幌市中央区","、２丁目",0,0,1,0,0,0',
+        '01101,"064  ","0640941","ﾎｯｶｲﾄﾞｳ","ｻｯﾎﾟﾛｼﾁｭｳｵｳｸ","､3ﾁｮｳﾒ)","北海道","札幌市中央区","、３丁目）",0,0,1,0,0,0',
+        # 特殊な表記を含むレコード
+        '13103,"105  ","1056090","ﾄｳｷｮｳﾄ","ﾐﾅﾄｸ","ﾄﾗﾉﾓﾝﾋﾙｽﾞﾓﾘﾀﾜｰ(ﾁｶｲ･ｶｲｿｳﾌﾒｲ)","東京都","港区","虎ノ門ヒルズ森タワー（地階・階層不明）",0,0,0,0,0,0',
+        '13103,"105  ","1056090","ﾄｳｷｮｳﾄ","ﾐﾅﾄｸ","ﾄﾗﾉﾓﾝ(ﾂｷﾞﾉﾋﾞﾙｦﾉｿﾞｸ)","東京都","港区","虎ノ門（次のビルを除く）",0,0,1,0,0,0',
+        '25443,"52203","5220341","ｼｶﾞｹﾝ","ｲﾇｶﾐｸﾞﾝﾀｶﾞﾁｮｳ","ｲﾁｴﾝ","滋賀県","犬上郡多賀町","一円",0,0,0,0,0,0',
+        '37403,"76601","7660001","ｶｶﾞﾜｹﾝ","ﾅｶﾀﾄﾞｸﾞﾝｺﾄﾋﾗﾁｮｳ","ｺﾄﾋﾗﾁｮｳｲﾁｴﾝ","香川県","仲多度郡琴平町","琴平町一円",0,0,0,0,0,0',
+    ]
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.csv')
+        self.addCleanup(os.remove, self.path)
+        with os.fdopen(fd, 'w', encoding='shift_jis', newline='') as f:
+            f.write(''.join(row + '\r\n' for row in self.ROWS))
+
+    def test_parse(self):
+        """分割されたレコードがまとめられ、特殊な表記が正規化されること"""
+
+        rows = list(ken_all.parse(self.path, workers=1))
+        self.assertEqual(
+            [(row[2], row[5], row[8]) for row in rows],
+            [('1000000', '', ''),
+             ('0640941', 'ｱｻﾋｶﾞｵｶ(1ﾁｮｳﾒ､2ﾁｮｳﾒ､3ﾁｮｳﾒ)', '旭ケ丘（１丁目、２丁目、３丁目）'),
+             ('1056090', 'ﾄﾗﾉﾓﾝﾋﾙｽﾞﾓﾘﾀﾜｰ', '虎ノ門ヒルズ森タワー'),
+             ('1056090', 'ﾄﾗﾉﾓﾝ', '虎ノ門'),
+             ('5220341', 'ｲﾁｴﾝ', '一円'),
+             ('7660001', '', '')]
+        )
+        self.assertEqual(rows[0][0], 13101)
+
+    def test_parse_in_parallel(self):
+        """並列に解析しても結果が変わらないこと"""
+
+        for count in range(2, 9):
+            ranges = ken_all.split_ranges(self.path, count)
+            rows = [
+                row for start, end in ranges
+                for row in ken_all.parse_range(self.path, start, end)
+            ]
+            self.assertEqual(rows, list(ken_all.parse(self.path, workers=1)))
+        self.assertEqual(
+            list(ken_all.parse(self.path, workers=3)),
+            list(ken_all.parse(self.path, workers=1))
+        )
+
+
+class TestAddressVersions(TestCase):
+    """住所マスタのバージョン管理のユニットテスト"""
+
+    def make_rows(self, *sections):
+        return [
+            (13101, '100', '1000001', 'トウキョウト', 'チヨダク', '', '東京都',
+             '千代田区', section, 0, 0, 0, 0, 0, 0)
+            for section in sections
+        ]
+
+    def current_sections(self):
+        return list(
+            Address.objects.current().order_by('id').values_list('section', flat=True))
+
+    def test_load_and_rollback(self):
+        """新しいバージョンへの切り替えとロールバック"""
+
+        load_version(self.make_rows('千代田'))
+        load_version(self.make_rows('千代田', '皇居外苑'), batch_size=1)
+        # 2回インポートしても住所が重複しないことを確認
+        self.assertEqual(self.current_sections(), ['千代田', '皇居外苑'])
+        self.assertEqual(AddressVersion.objects.get(is_current=True).row_count, 2)
+
+        # 1つ前のバージョンに戻せることを確認
+        rollback_version()
+        self.assertEqual(self.current_sections(), ['千代田'])
+
+    def test_prune(self):
+        """古いバージョンが削除されること"""
+
+        for i in range(4):
+            load_version(self.make_rows('町域{}'.format(i)), keep=1)
+        self.assertEqual(AddressVersion.objects.count(), 2)
+        self.assertEqual(Address.objects.count(), 2)
+        self.assertEqual(self.current_sections(), ['町域3'])
+        # 削除された住所の bi-gram も削除されていることを確認
+        self.assertFalse(
+            AddressSearchGram.objects.exclude(address__in=Address.objects.all()).exists())
+
+    def test_prune_after_rollback(self):
+        """ロールバックで戻したバージョンは、次のインポートで削除されないこと"""
+
+        load_version(self.make_rows('町域1'))
+        load_version(self.make_rows('町域2'))
+        rollback_version()
+        load_version(self.make_rows('町域3'), keep=1)
+        self.assertEqual(self.current_sections(), ['町域3'])
+        # 直前まで使っていたバージョンに戻せることを確認
+        rollback_version()
+        self.assertEqual(self.current_sections(), ['町域1'])
+        self.assertEqual(AddressVersion.objects.count(), 2)
+
+    def test_failed_load(self):
+        """登録に失敗した場合は現在のバージョンが変わらないこと"""
+
+        load_version(self.make_rows('千代田'))
+        with self.assertRaises(TypeError):
+            load_version(self.make_rows('皇居外苑') + [None])
+        self.assertEqual(self.current_sections(), ['千代田'])
+        self.assertEqual(AddressVersion.objects.count(), 1)
+
+
+class TestAddressSearch(TestCase):
+    """住所のあいまい検索のユニットテスト"""
+
+    def setUp(self):
+        load_version([
+            (1101, '064', '0640941', 'ﾎｯｶｲﾄﾞｳ', 'ｻｯﾎﾟﾛｼﾁｭｳｵｳｸ', 'ｱｻﾋｶﾞｵｶ', '北海道',
+             '札幌市中央区', '旭ケ丘', 0, 0, 1, 0, 0, 0),
+            (13101, '100', '1000001', 'ﾄｳｷｮｳﾄ', 'ﾁﾖﾀﾞｸ', 'ﾁﾖﾀﾞ', '東京都',
+             '千代田区', '千代田', 0, 0, 0, 0, 0, 0),
+        ])
+
+    def search_sections(self, term):
+        return list(search.search(Address.objects.current(), term)
+                    .values_list('section', flat=True))
+
+    def test_normalize(self):
+        """半角カナ・ひらがな・「ヶ/ケ」の表記ゆれが吸収されること"""
+
+        self.assertEqual(self.search_sections('旭ヶ丘'), ['旭ケ丘'])
+        self.assertEqual(self.search_sections('あさひがおか'), ['旭ケ丘'])
+        self.assertEqual(self.search_sections('ｱｻﾋｶﾞｵｶ'), ['旭ケ丘'])
+        self.assertEqual(self.search_sections('チヨダ'), ['千代田'])
+        self.assertEqual(self.search_sections('旭'), ['旭ケ丘'])
+        self.assertEqual(self.search_sections('旭ヶ丘千代田'), [])
+
+    def test_delete(self):
+        """住所の削除時に bi-gram も削除されること"""
+
+        # 1. 1件ずつ削除
+        Address.objects.get(section='旭ケ丘').delete()
+        self.assertEqual(self.search_sections('旭'), [])
+        self.assertEqual(
+            set(AddressSearchGram.objects.values_list('address__section', flat=True)),
+            {'千代田'})
+        # 2. まとめて削除
+        Address.objects.current().delete()
+        self.assertFalse(AddressSearchGram.objects.exists())
+
+    def test_search_view(self):
+        """住所検索APIで町域名であいまい検索"""
+
+        response = self.client.get('/address_search/', {'q': 'ちよだ'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'postal_code': '1000001', 'prefecture': '東京都', 'city': '千代田区',
+             'section': '千代田'},
+        ])
+        # 郵便番号での検索結果は変わらないことを確認
+        response = self.client.get('/address_search/', {'postalCode': '0640941'})
+        self.assertEqual(response.json(), [
+            {'prefecture': '北海道', 'city': '札幌市中央区', 'section': '旭ケ丘'},
+        ])
+
+
+class TestAddressSnapshot(TestCase):
+    """住所マスタのスナップショットによる集計のユニットテスト"""
+
+    PASSWORD = 'pass12345'
+
+    def setUp(self):
+        load_version([
+            (1101, '064', '0640941', 'ﾎｯｶｲﾄﾞｳ', 'ｻｯﾎﾟﾛｼﾁｭｳｵｳｸ', 'ｱｻﾋｶﾞｵｶ', '北海道',
+             '札幌市中央区', '旭ケ丘', 0, 0, 1, 0, 0, 0),
+            (13101, '100', '1000001', 'ﾄｳｷｮｳﾄ', 'ﾁﾖﾀﾞｸ', 'ﾁﾖﾀﾞ', '東京都',
+             '千代田区', '千代田', 0, 0, 0, 0, 0, 0),
+            (13103, '105', '1050001', 'ﾄｳｷｮｳﾄ', 'ﾐﾅﾄｸ', 'ﾄﾗﾉﾓﾝ', '東京都',
+             '港区', '虎ノ門', 0, 0, 1, 0, 1, 0),
+        ])
+        self.user = get_user_model().objects.create_superuser(
+            'admin', 'admin@example.com', self.PASSWORD)
+
+    def test_get_flag_filters(self):
+        """区分値の列の完全一致の条件のみが変換されること"""
+
+        self.assertEqual(snapshot.get_flag_filters({'has_chome__exact': '1'}),
+                         {'has_chome': 1})
+        self.assertIsNone(snapshot.get_flag_filters({'has_chome__gt': '1'}))
+        self.assertIsNone(snapshot.get_flag_filters({'city__exact': '港区'}))
+
+    @skipUnless(snapshot.np, 'NumPy がインストールされていません')
+    def test_value_counts(self):
+        """条件に一致する住所の件数が値ごとに求められること"""
+
+        address_snapshot = snapshot.get_snapshot()
+        self.assertEqual(len(address_snapshot), 3)
+        self.assertEqual(address_snapshot.value_counts('has_chome', {}), {0: 1, 1: 2})
+        self.assertEqual(
+            address_snapshot.value_counts('has_chome', {'update_status': 1}), {1: 1})
+
+        # バージョンが切り替わると読み込み直されることを確認
+        load_version([(13101, '100', '1000001', 'ﾄｳｷｮｳﾄ', 'ﾁﾖﾀﾞｸ', 'ﾁﾖﾀﾞ', '東京都',
+                       '千代田区', '千代田', 0, 0, 0, 0, 0, 0)])
+        self.assertEqual(len(snapshot.get_snapshot()), 1)
+
+    def test_prefecture_breakdown(self):
+        """スナップショットとDBのどちらで集計しても結果が同じであること"""
+
+        expected = [
+            {'prefecture': '北海道', 'total': 1, 'has_multiple_postal_codes': 0,
+             'has_banchi': 0, 'has_chome': 1, 'has_multiple_sections': 0},
+            {'prefecture': '東京都', 'total': 2, 'has_multiple_postal_codes': 0,
+             'has_banchi': 0, 'has_chome': 1, 'has_multiple_sections': 0},
+        ]
+        self.assertEqual(snapshot.prefecture_breakdown({}), expected)
+        with mock.patch.object(snapshot, 'get_snapshot', return_value=None):
+            self.assertEqual(snapshot.prefecture_breakdown({}), expected)
+        self.assertEqual(
+            [row['prefecture'] for row in snapshot.prefecture_breakdown({'update_status': 1})],
+            ['東京都']
+        )
+
+    @skipUnless(snapshot.np, 'NumPy がインストールされていません')
+    def test_change_list_filter_counts(self):
+        """モデル一覧画面のフィルタに件数が表示されること"""
+
+        self.client.login(username=self.user.username, password=self.PASSWORD)
+        response = self.client.get(reverse('admin:addresses_address_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '該当 (2)')
+        # 区分値以外の条件が指定されている場合は件数を表示しないことを確認
+        response = self.client.get(reverse('admin:addresses_address_changelist'),
+                                   {'q': '千代田'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, '該当 (')
+
+    def test_breakdown_view(self):
+        """都道府県別の集計画面"""
+
+        self.client.login(username=self.user.username, password=self.PASSWORD)
+        response = self.client.get(reverse('admin:addresses_address_breakdown'),
+                                   {'has_chome__exact': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row[:2] for row in response.context_data['rows']],
+            [('北海道', 1), ('東京都', 1)]
+        )
+        # 一覧画面の並び替え・ページ・検索キーワードがあっても絞り込み条件は反映されること
+        response = self.client.get(reverse('admin:addresses_address_breakdown'),
+                                   {'has_chome__exact': '1', 'update_status__exact': '1',
+                                    'o': '1', 'p': '2', 'q': '港'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row[:2] for row in response.context_data['rows']], [('東京都', 1)])
+        self.assertContains(response, '検索キーワードは都道府県別の集計には反映されません。')
+        # 集計できない条件は全国の件数で表示せずに一覧画面に戻すことを確認
+        response = self.client.get(reverse('admin:addresses_address_breakdown'),
+                                   {'city__exact': '港区'}, follow=True)
+        self.assertEqual(response.redirect_chain[0][0].partition('?')[0],
+                         reverse('admin:addresses_address_changelist'))
+        self.assertContains(response, '区分値以外の絞り込み条件は都道府県別の集計に指定できません。')
+
+
+class TestAddressHierarchy(TestCase):
+    """都道府県・市区町村のテーブルのユニットテスト"""
+
+    def make_rows(self, *cities):
+        return [
+            (code, '100', '1000001', 'ﾄｳｷｮｳﾄ', 'ｸ', '', '東京都', city, section,
+             0, 0, 0, 0, 0, 0)
+            for code, city, sections in cities for section in sections
+        ]
+
+    def test_build(self):
+        """住所マスタの切り替えに合わせて作り直されること"""
+
+        load_version(self.make_rows((13101, '千代田区', ['千代田', '皇居外苑'])))
+        load_version(self.make_rows((13101, '千代田区', ['千代田']), (13103, '港区', ['虎ノ門'])))
+        self.assertEqual(
+            list(City.objects.values_list('code', 'prefecture', 'name', 'section_count')),
+            [(13101, 13, '千代田区', 1), (13103, 13, '港区', 1)]
+        )
+        self.assertEqual(
+            list(Prefecture.objects.values_list('name', 'city_count')), [('東京都', 2)])
+
+        # ロールバックした場合も作り直されることを確認
+        rollback_version()
+        self.assertEqual(
+            list(City.objects.values_list('name', 'section_count')), [('千代田区', 2)])
+
+    def test_city_list_view(self):
+        """都道府県に対応する市区町村の一覧を返すAPI"""
+
+        load_version(self.make_rows((13101, '千代田区', ['千代田']), (13103, '港区', ['虎ノ門'])))
+        response = self.client.get('/address_search/cities/', {'prefecture': '東京都'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'code': 13101, 'name': '千代田区'},
+            {'code': 13103, 'name': '港区'},
+        ])
+        response = self.client.get('/address_search/cities/', {'prefecture': '北海道'})
+        self.assertEqual(response.json(), [])
+
+
+class TestAddressChangeList(TestCase):
+    """管理サイトの住所マスタ一覧画面のユニットテスト"""
+
+    PASSWORD = 'pass12345'
+
+    def setUp(self):
+        load_version([
+            (13101, '100', '10000{:02}'.format(i), 'ﾄｳｷｮｳﾄ', 'ﾁﾖﾀﾞｸ', '', '東京都',
+             '千代田区', '町域{}'.format(i), 0, 0, i % 2, 0, 0, 0)
+            for i in reversed(range(30))
+        ])
+        self.user = get_user_model().objects.create_superuser(
+            'admin', 'admin@example.com', self.PASSWORD)
+
+    def test_paginator(self):
+        """見積もりの件数とページの内容"""
+
+        queryset = Address.objects.current().order_by('postal_code', 'id')
+        paginator = AddressPaginator(queryset, 20, estimated_count=30)
+        self.assertEqual(paginator.num_pages, 2)
+        self.assertEqual(
+            [address.section for address in paginator.page(2)],
+            ['町域{}'.format(i) for i in range(20, 30)]
+        )
+        # 件数は上限で打ち切られることを確認
+        with mock.patch.object(AddressPaginator, 'MAX_COUNT', 5):
+            paginator = AddressPaginator(queryset, 2)
+            self.assertEqual(paginator.count, 5)
+            self.assertTrue(paginator.truncated)
+            # 上限を超えるページでは、次のページまで数える
+            paginator = AddressPaginator(queryset, 2, page_number=4)
+            self.assertEqual(paginator.count, 10)
+            self.assertTrue(paginator.truncated)
+            self.assertEqual(
+                [address.section for address in paginator.page(4)],
+                ['町域6', '町域7']
+            )
+            # 最後まで数えた場合は打ち切らない
+            paginator = AddressPaginator(queryset, 2, page_number=15)
+            self.assertEqual(paginator.count, 30)
+            self.assertFalse(paginator.truncated)
+
+    def test_change_list(self):
+        """絞り込みがなければバージョンの件数を表示すること"""
+
+        self.client.login(username=self.user.username, password=self.PASSWORD)
+        url = reverse('admin:addresses_address_changelist')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        cl = response.context_data['cl']
+        self.assertEqual(cl.result_count, 30)
+        self.assertEqual([address.section for address in cl.result_list],
+                         ['町域{}'.format(i) for i in range(30)])
+
+        response = self.client.get(url, {'has_chome__exact': '1'})
+        cl = response.context_data['cl']
+        self.assertEqual(cl.result_count, 15)
+        self.assertIsNone(cl.full_result_count)
+
+    def test_change_list_search_digits(self):
+        """数字での検索は郵便番号の前方一致と、5〜6桁なら全国地方公共団体コードで絞り込むこと"""
+
+        self.client.login(username=self.user.username, password=self.PASSWORD)
+        url = reverse('admin:addresses_address_changelist')
+        # 1. 全国地方公共団体コード
+        response = self.client.get(url, {'q': '13101'})
+        self.assertEqual(response.context_data['cl'].result_count, 30)
+        # 2. 郵便番号の前方一致
+        response = self.client.get(url, {'q': '100-001'})
+        self.assertEqual(response.context_data['cl'].result_count, 10)
+        # 3. 桁数の多い数字でもエラーにならないこと
+        response = self.client.get(url, {'q': '9' * 20})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context_data['cl'].result_count, 0)
+
+    def test_change_rebuilds_search_index(self):
+        """変更画面で住所を変更すると、あいまい検索の bi-gram も作り直されること"""
+
+        address = Address.objects.get(section='町域0')
+        data = {
+            field.name: getattr(address, field.attname)
+            for field in Address._meta.fields if field.editable and field.name != 'id'
+        }
+        data['section'] = '旭ケ丘'
+        data['section_kana'] = 'ｱｻﾋｶﾞｵｶ'
+        self.client.login(username=self.user.username, password=self.PASSWORD)
+        response = self.client.post(
+            reverse('admin:addresses_address_change', args=(address.pk,)), data)
+        self.assertEqual(response.status_code, 302)
+        current = Address.objects.current()
+        self.assertEqual(list(search.search(current, 'あさひがおか').values_list('pk', flat=True)),
+                         [address.pk])
+        self.assertFalse(search.search(current, '町域0').filter(pk=address.pk).exists())
+
+    def test_add(self):
+        """追加画面で登録した住所は現在のバージョンに含まれること"""
+
+        data = {
+            field.name: getattr(Address.objects.first(), field.attname)
+            for field in Address._meta.fields if field.editable and field.name != 'id'
+        }
+        data.update(postal_code='1000100', section='皇居外苑', section_kana='ｺｳｷｮｶﾞｲｴﾝ')
+        self.client.login(username=self.user.username, password=self.PASSWORD)
+        response = self.client.post(reverse('admin:addresses_address_add'), data)
+        self.assertEqual(response.status_code, 302)
+        address = Address.objects.current().get(section='皇居外苑')
+        self.assertTrue(search.search(Address.objects.current(), 'こうきょ')
+                        .filter(pk=address.pk).exists())
+        # 一覧画面の件数にも含まれることを確認
+        response = self.client.get(reverse('admin:addresses_address_changelist'))
+        self.assertEqual(response.context_data['cl'].result_count, 31)
+
+    def test_change_list_over_max_count(self):
+        """件数を打ち切った場合は「+」を付けて表示し、先のページにも進めること"""
+
+        self.client.login(username=self.user.username, password=self.PASSWORD)
+        url = reverse('admin:addresses_address_changelist')
+        with mock.patch.object(AddressPaginator, 'MAX_COUNT', 5), \
+                mock.patch.object(AddressAdmin, 'list_per_page', 5):
+            # 1. 1ページ目は次のページまで数える
+            response = self.client.get(url, {'has_chome__exact': '1'})
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, '全 10+ 件')
+            # 2. 最後のページでは全件を数える
+            response = self.client.get(url, {'has_chome__exact': '1', 'p': '2'})
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, '全 15 件')
+            self.assertEqual(
+                [address.section for address in response.context_data['cl'].result_list],
+                ['町域21', '町域23', '町域25', '町域27', '町域29']
+            )
@@ -0,0 +1,87 @@
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .hierarchy import build_hierarchy
+from .ken_all import FIELD_NAMES
+from .models import Address, AddressVersion
+from .search import build_search_index, get_search_text
+
+
+def load_version(rows, keep=1, batch_size=5000):
+    """住所を新しいバージョンとして登録してから、現在のバージョンを切り替える
+
+    登録中も検索は切り替え前のバージョンに対しておこなわれる。
+    切り替え前のバージョンはロールバック用に keep 世代まで残す。
+    """
+    version = AddressVersion.objects.create()
+    try:
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            addresses = [
+                Address(version=version, **dict(zip(FIELD_NAMES, row)))
+                for row in batch
+            ]
+            for address in addresses:
+                address.search_text = get_search_text(address)
+            Address.objects.bulk_create(addresses)
+            version.row_count += len(batch)
+        # 切り替え前に検索用のインデックスを作成しておく
+        build_search_index(Address.objects.filter(version=version), batch_size)
+    except BaseException:
+        delete_versions([version])
+        raise
+    version.loaded_at = timezone.now()
+    version.save()
+    activate_version(version)
+    prune_versions(keep)
+    return version
+
+
+def activate_version(version):
+    """指定したバージョンを現在のバージョンにする（都道府県・市区町村も合わせて切り替える）"""
+    with transaction.atomic():
+        AddressVersion.objects.filter(is_current=True).update(is_current=False)
+        activated_at = timezone.now()
+        AddressVersion.objects.filter(pk=version.pk).update(
+            is_current=True, activated_at=activated_at)
+        build_hierarchy(version)
+    version.is_current = True
+    version.activated_at = activated_at
+
+
+def rollback_version():
+    """1つ前のバージョンに戻す（戻せるバージョンがない場合は None を返す）"""
+    current = AddressVersion.objects.filter(is_current=True).first()
+    previous = AddressVersion.objects.filter(loaded_at__isnull=False, is_current=False)
+    if current is not None:
+        previous = previous.filter(pk__lt=current.pk)
+    previous = previous.order_by('-pk').first()
+    if previous is not None:
+        activate_version(previous)
+    return previous
+
+
+def prune_versions(keep):
+    """現在のバージョンと、その直前まで使っていたバージョンを keep 世代だけ残して削除する
+
+    ロールバックで戻したバージョンを残すため、作成順ではなく切り替えた日時の新しい順に残す。
+    """
+    current = AddressVersion.objects.get(is_current=True)
+    loaded = AddressVersion.objects.filter(loaded_at__isnull=False, is_current=False) \
+        .order_by(F('activated_at').desc(nulls_last=True), '-pk')
+    # 登録中のバージョンは削除しない
+    unloaded = AddressVersion.objects.filter(loaded_at__isnull=True, pk__lt=current.pk)
+    delete_versions(list(loaded[keep:]) + list(unloaded))
+
+
+def delete_versions(versions):
+    """バージョンとその住所を削除する"""
+    # bi-gram も AddressQuerySet.delete() で削除される
+    Address.objects.filter(version__in=versions).delete()
+    AddressVersion.objects.filter(pk__in=[version.pk for version in versions]).delete()
@@ -2,15 +2,32 @@ from django.forms.models import model_to_dict
 from django.http.response import JsonResponse
 from django.views import View
 
-from .models import Address
+from . import search
+from .models import Address, City
+
+# 住所のあいまい検索の最大件数
+MAX_SEARCH_RESULTS = 20
 
 
 class AddressSearchAjaxView(View):
     def get(self, request, *args, **kwargs):
         postal_code = request.GET.get('postalCode')
-        addresses = Address.objects.filter(postal_code=postal_code)
-        data = [
-            model_to_dict(address, ['prefecture', 'city', 'section'])
-            for address in addresses
-        ]
+        query = request.GET.get('q')
+        fields = ['prefecture', 'city', 'section']
+        if postal_code is None and query:
+            # 郵便番号の指定がなければ町域名などであいまい検索する
+            addresses = search.search(Address.objects.current(), query) \
+                .order_by('postal_code', 'id')[:MAX_SEARCH_RESULTS]
+            fields = ['postal_code'] + fields
+        else:
+            addresses = Address.objects.current().filter(postal_code=postal_code)
+        data = [model_to_dict(address, fields) for address in addresses]
         return JsonResponse(data, safe=False)
+
+
+class CityListAjaxView(View):
+    def get(self, request, *args, **kwargs):
+        # 都道府県名に対応する市区町村を返す
+        cities = City.objects.filter(prefecture__name=request.GET.get('prefecture')) \
+            .values('code', 'name')
+        return JsonResponse(list(cities), safe=False)
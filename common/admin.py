@@ -1,9 +1,12 @@
+from django.conf import settings
 from django.contrib.admin import AdminSite
+from django.http import Http404
 from django.template.response import TemplateResponse
 from django.urls import path
 from django.utils import timezone
 
 from shop.models import Book
+from .profiling import ProfileStore
 
 APP_MODEL_ORDER = (
     ('auth', ('User', 'Group')),
@@ -24,6 +27,10 @@ class CustomAdminSite(AdminSite):
         return [
             # お知らせ画面のURLパターン
             path('info/', self.admin_view(self.info_view)),
+            # プロファイルの一覧・詳細画面のURLパターン
+            path('profiles/', self.admin_view(self.profile_list_view), name='profile_list'),
+            path('profiles/<str:profile_id>/', self.admin_view(self.profile_detail_view),
+                 name='profile_detail'),
         ] + super().get_urls()
 
     def info_view(self, request):
@@ -39,6 +46,28 @@ class CustomAdminSite(AdminSite):
         }
         return TemplateResponse(request, 'admin/info.html', context)
 
+    def profile_list_view(self, request):
+        """プロファイルの一覧画面を表示するためのビュー"""
+        context = {
+            'profiles': ProfileStore().list(),
+            'profiling_enabled': settings.ADMIN_PROFILING_ENABLED,
+            'title': 'プロファイル',
+            **self.each_context(request),
+        }
+        return TemplateResponse(request, 'admin/profile_list.html', context)
+
+    def profile_detail_view(self, request, profile_id):
+        """プロファイルの詳細画面を表示するためのビュー"""
+        profile = ProfileStore().load(profile_id)
+        if profile is None:
+            raise Http404
+        context = {
+            'profile': profile,
+            'title': 'プロファイル {}'.format(profile['path']),
+            **self.each_context(request),
+        }
+        return TemplateResponse(request, 'admin/profile_detail.html', context)
+
     def index(self, request, extra_context=None):
         """ホーム画面を表示するためのビュー"""
         response = super().index(request, extra_context)
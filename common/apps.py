@@ -1,5 +1,11 @@
 from django.contrib.admin.apps import AdminConfig
+from django.db.backends.signals import connection_created
 
 
 class CustomAdminConfig(AdminConfig):
     default_site = 'common.admin.CustomAdminSite'
+
+    def ready(self):
+        super().ready()
+        from .db import configure_sqlite
+        connection_created.connect(configure_sqlite)
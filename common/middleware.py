@@ -0,0 +1,73 @@
+import random
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import reverse
+
+from .profiling import RequestProfiler
+from .routers import set_use_replica
+
+# レプリカから読み込むビューのURL名（管理サイトのモデル一覧画面とオートコンプリートはすべて対象）
+READ_ONLY_URL_NAMES = ('address_search', 'address_city_list')
+READ_ONLY_URL_NAME_SUFFIXES = ('_changelist', '_autocomplete')
+
+
+class ReadReplicaMiddleware:
+    """管理サイトの一覧画面や住所検索などの GET リクエストをレプリカで処理するミドルウェア
+
+    テンプレートの描画時に評価されるクエリも対象にするため、レスポンスを返すまで切り替えておく。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            set_use_replica(False)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return
+        url_name = request.resolver_match.url_name or ''
+        if url_name.endswith(READ_ONLY_URL_NAME_SUFFIXES) or url_name in READ_ONLY_URL_NAMES:
+            set_use_replica(True)
+
+
+class ProfilingMiddleware:
+    """管理サイトのリクエストをプロファイルするミドルウェア
+
+    ADMIN_PROFILING_ENABLED が False の場合はミドルウェア自体を読み込まない。
+    スタッフユーザーが ?_profile=1 を指定したリクエストと、
+    ADMIN_PROFILING_SAMPLE_RATE の割合でランダムに選んだリクエストをプロファイルする。
+    """
+
+    PARAM = '_profile'
+
+    def __init__(self, get_response):
+        if not settings.ADMIN_PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.ADMIN_PROFILING_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        if self.PARAM in request.GET:
+            # 管理サイトの一覧画面で絞り込み条件と見なされないように取り除く
+            request.GET = request.GET.copy()
+            del request.GET[self.PARAM]
+            request.META['QUERY_STRING'] = request.GET.urlencode()
+        return RequestProfiler(request).run(self.get_response)
+
+    def should_profile(self, request):
+        if request.GET.get(self.PARAM) != '1' and random.random() >= self.sample_rate:
+            return False
+        if not request.path.startswith(reverse('admin:index')):
+            return False
+        # プロファイルの一覧・詳細画面自体は対象外にする
+        if request.path.startswith(reverse('admin:profile_list')):
+            return False
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_staff
@@ -0,0 +1,152 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import uuid
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+# 保存するプロファイルの関数の件数
+STATS_LIMIT = 60
+# 保存する SQL の件数と長さの上限
+SQL_LIMIT = 500
+SQL_MAX_LENGTH = 2000
+
+PROFILE_ID_PATTERN = re.compile(r'^[0-9]{8}T[0-9]{12}-[0-9a-f]{8}$')
+
+# cProfile は同時に1つしか有効にできないので、プロファイル中の他のリクエストは対象外にする
+_lock = threading.Lock()
+
+
+class QueryRecorder:
+    """実行された SQL と実行時間を記録する（connection.execute_wrapper() 用）"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.queries) < SQL_LIMIT:
+                self.queries.append({
+                    'alias': context['connection'].alias,
+                    'sql': sql[:SQL_MAX_LENGTH],
+                    'time': perf_counter() - start,
+                })
+
+
+class RequestProfiler:
+    """リクエストの処理を cProfile でプロファイルして、実行された SQL とともに記録する"""
+
+    def __init__(self, request):
+        self.request = request
+        self.profile = cProfile.Profile()
+        self.recorder = QueryRecorder()
+
+    def run(self, get_response):
+        """プロファイルしながら get_response を実行する（他のリクエストのプロファイル中は実行のみ）"""
+        if not _lock.acquire(blocking=False):
+            return get_response(self.request)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(self.recorder))
+                started_at = timezone.now()
+                start = perf_counter()
+                self.profile.enable()
+                try:
+                    response = get_response(self.request)
+                finally:
+                    self.profile.disable()
+                duration = perf_counter() - start
+        finally:
+            _lock.release()
+        ProfileStore().save(self.to_dict(response, started_at, duration))
+        return response
+
+    def get_stats_text(self):
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(STATS_LIMIT)
+        return stream.getvalue()
+
+    def to_dict(self, response, started_at, duration):
+        return {
+            'method': self.request.method,
+            'path': self.request.get_full_path(),
+            'user': self.request.user.get_username(),
+            'status': response.status_code,
+            'started_at': started_at.isoformat(),
+            'duration': duration,
+            'sql_time': sum(query['time'] for query in self.recorder.queries),
+            'queries': self.recorder.queries,
+            'stats': self.get_stats_text(),
+        }
+
+
+class ProfileStore:
+    """プロファイルを保存するディレクトリ（件数が上限を超えた場合は古いものから削除する）"""
+
+    def __init__(self, root=None, max_files=None):
+        self.root = root or settings.ADMIN_PROFILING_ROOT
+        self.max_files = max_files or settings.ADMIN_PROFILING_MAX_FILES
+
+    def _path(self, profile_id):
+        return os.path.join(self.root, profile_id + '.json')
+
+    def ids(self):
+        """保存されているプロファイルのIDを新しい順に返す"""
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return sorted((name[:-5] for name in names
+                       if name.endswith('.json') and PROFILE_ID_PATTERN.match(name[:-5])),
+                      reverse=True)
+
+    def save(self, data):
+        os.makedirs(self.root, exist_ok=True)
+        profile_id = '{}-{}'.format(
+            timezone.now().strftime('%Y%m%dT%H%M%S%f'), uuid.uuid4().hex[:8])
+        data = {'id': profile_id, **data}
+        # 書き込み途中のファイルが一覧に表示されないように、別名で書き込んでから置き換える
+        temp_path = self._path(profile_id) + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, self._path(profile_id))
+        for old_id in self.ids()[self.max_files:]:
+            try:
+                os.remove(self._path(old_id))
+            except FileNotFoundError:
+                pass
+        return profile_id
+
+    def load(self, profile_id):
+        """プロファイルを読み込む（存在しない場合は None）"""
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        try:
+            with open(self._path(profile_id), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def list(self):
+        """保存されているプロファイルを新しい順に返す（SQL と関数ごとの結果は除く）"""
+        profiles = []
+        for profile_id in self.ids():
+            data = self.load(profile_id)
+            if data is not None:
+                data['query_count'] = len(data.pop('queries'))
+                data.pop('stats')
+                profiles.append(data)
+        return profiles
@@ -0,0 +1,50 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import connections
+
+# レプリカ（DATABASES['replica']）から読み込むアプリケーション
+REPLICA_APP_LABELS = ('shop', 'addresses')
+
+_state = threading.local()
+
+
+def set_use_replica(enabled):
+    """読み込みをレプリカに振り分けるかどうかを設定して、変更前の設定を返す"""
+    previous = getattr(_state, 'use_replica', False)
+    _state.use_replica = enabled
+    return previous
+
+
+@contextmanager
+def use_replica():
+    """ブロック内の読み込みをレプリカに振り分ける"""
+    previous = set_use_replica(True)
+    try:
+        yield
+    finally:
+        set_use_replica(previous)
+
+
+class ReplicaRouter:
+    """読み込み専用のリクエストの読み込みをレプリカに振り分けるルーター
+
+    レプリカが設定されていない場合や、use_replica() の外では常にプライマリを使う。
+    セッションや認証などの読み込みは、書き込み直後の内容を参照するためプライマリを使う。
+    """
+
+    def db_for_read(self, model, **hints):
+        if getattr(_state, 'use_replica', False) and 'replica' in connections.databases \
+                and model._meta.app_label in REPLICA_APP_LABELS:
+            return 'replica'
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # レプリカにはプライマリから複製する
+        return db == 'default'
@@ -0,0 +1,44 @@
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 事前圧縮の対象にする拡張子
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.svg', '.txt', '.html')
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ハッシュ付きのファイル名に加えて、圧縮済みのファイルも出力するストレージ
+
+    collectstatic の後処理で、ハッシュ付きのファイルごとに gzip 版（.gz）と、
+    brotli がインストールされていれば brotli 版（.br）を出力する。
+    Web サーバーからはこれらを直接配信する（nginx の gzip_static など）。
+    """
+
+    def post_process(self, *args, **kwargs):
+        hashed_names = []
+        for name, hashed_name, processed in super().post_process(*args, **kwargs):
+            if hashed_name and hashed_name.endswith(COMPRESSIBLE_EXTENSIONS):
+                hashed_names.append(hashed_name)
+            yield name, hashed_name, processed
+        if not kwargs.get('dry_run'):
+            for hashed_name in hashed_names:
+                self.compress(hashed_name)
+
+    def compress(self, name):
+        """ファイルを圧縮して保存する（圧縮しても小さくならない場合は保存しない）"""
+        with self.open(name) as f:
+            content = f.read()
+        compressed_files = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            compressed_files.append(('.br', brotli.compress(content)))
+        for suffix, compressed in compressed_files:
+            if len(compressed) < len(content):
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
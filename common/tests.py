@@ -0,0 +1,202 @@
+import gzip
+import os
+import shutil
+import tempfile
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import connections
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from addresses.models import Address
+from shop.models import Book
+from .middleware import ReadReplicaMiddleware
+from .profiling import ProfileStore
+from .storage import CompressedManifestStaticFilesStorage, brotli
+from .routers import ReplicaRouter, use_replica
+
+User = get_user_model()
+
+
+class TestReplicaRouter(SimpleTestCase):
+    """レプリカへの振り分けのユニットテスト"""
+
+    def setUp(self):
+        # レプリカが設定されている状態にする
+        databases = {**connections.databases, 'replica': connections.databases['default']}
+        patcher = mock.patch.dict(connections.databases, databases)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.router = ReplicaRouter()
+
+    def test_db_for_read(self):
+        """use_replica() の中の対象アプリケーションの読み込みのみレプリカに振り分けること"""
+
+        self.assertEqual(self.router.db_for_read(Book), 'default')
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Book), 'replica')
+            self.assertEqual(self.router.db_for_read(Address), 'replica')
+            # セッションや認証はプライマリから読み込むことを確認
+            self.assertEqual(self.router.db_for_read(Session), 'default')
+            self.assertEqual(self.router.db_for_write(Book), 'default')
+        self.assertEqual(self.router.db_for_read(Book), 'default')
+
+    def test_middleware(self):
+        """一覧画面の GET リクエストの処理中のみレプリカに振り分けること"""
+
+        def get_response(request):
+            middleware.process_view(request, None, (), {})
+            return self.router.db_for_read(Book)
+
+        middleware = ReadReplicaMiddleware(get_response)
+        request = mock.Mock(method='GET')
+        request.resolver_match.url_name = 'shop_book_changelist'
+        self.assertEqual(middleware(request), 'replica')
+        self.assertEqual(self.router.db_for_read(Book), 'default')
+
+        request.resolver_match.url_name = 'shop_book_change'
+        self.assertEqual(middleware(request), 'default')
+        request.method = 'POST'
+        request.resolver_match.url_name = 'shop_book_changelist'
+        self.assertEqual(middleware(request), 'default')
+
+
+class TestProfiling(TestCase):
+    """管理サイトのリクエストのプロファイルのユニットテスト（システム管理者の場合）"""
+
+    PASSWORD = 'pass12345'
+
+    def setUp(self):
+        # プロファイルの保存先を一時ディレクトリにして、プロファイルを有効にする
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings = self.settings(
+            ADMIN_PROFILING_ENABLED=True, ADMIN_PROFILING_ROOT=self.root,
+            ADMIN_PROFILING_MAX_FILES=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # テストユーザー（システム管理者）を作成
+        self.user = User.objects.create_superuser(
+            'admin', 'admin@example.com', self.PASSWORD)
+        self.client.login(username=self.user.username, password=self.PASSWORD)
+
+    def test_profile_request(self):
+        """?_profile=1 を指定したリクエストのプロファイルと SQL が保存されること"""
+
+        Book.objects.create(title='Django Book')
+        # 1. プロファイルを指定しないリクエスト
+        response = self.client.get(reverse('admin:shop_book_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ProfileStore().ids(), [])
+
+        # 2. プロファイルを指定したリクエスト（一覧画面の絞り込み条件としては扱われない）
+        response = self.client.get(reverse('admin:shop_book_changelist') + '?_profile=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Django Book')
+        [profile_id] = ProfileStore().ids()
+        profile = ProfileStore().load(profile_id)
+        self.assertEqual(profile['path'], reverse('admin:shop_book_changelist'))
+        self.assertEqual(profile['user'], 'admin')
+        self.assertTrue(any('FROM "book"' in query['sql'] for query in profile['queries']))
+        self.assertIn('changelist_view', profile['stats'])
+
+        # 3. 一覧画面・詳細画面
+        response = self.client.get(reverse('admin:profile_list'))
+        self.assertContains(response, reverse('admin:profile_detail', args=[profile_id]))
+        response = self.client.get(reverse('admin:profile_detail', args=[profile_id]))
+        self.assertContains(response, 'FROM &quot;book&quot;')
+        response = self.client.get(reverse('admin:profile_detail', args=['unknown']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_ring_buffer(self):
+        """保存する件数の上限を超えた場合は古いものから削除されること"""
+
+        for _ in range(3):
+            self.client.get(reverse('admin:index') + '?_profile=1')
+        self.assertEqual(len(os.listdir(self.root)), 2)
+
+    def test_sample_rate(self):
+        """ADMIN_PROFILING_SAMPLE_RATE の割合でプロファイルされること"""
+
+        with self.settings(ADMIN_PROFILING_SAMPLE_RATE=1.0):
+            self.client.get(reverse('admin:index'))
+        self.assertEqual(len(ProfileStore().ids()), 1)
+
+    def test_disabled(self):
+        """無効の場合はプロファイルされないこと"""
+
+        with self.settings(ADMIN_PROFILING_ENABLED=False):
+            self.client.get(reverse('admin:index') + '?_profile=1')
+        self.assertEqual(ProfileStore().ids(), [])
+
+
+class TestCompressedManifestStaticFilesStorage(SimpleTestCase):
+    """圧縮済みのファイルも出力するストレージのユニットテスト"""
+
+    CSS = 'body { color: #333; }\n' * 100
+
+    def setUp(self):
+        # 収集元と出力先を一時ディレクトリにする
+        self.source = FileSystemStorage(location=tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.source.location)
+        self.storage = CompressedManifestStaticFilesStorage(
+            location=tempfile.mkdtemp(), base_url='/static/')
+        self.addCleanup(shutil.rmtree, self.storage.location)
+        for name, content in (('css/app.css', self.CSS), ('css/tiny.css', 'a{}')):
+            self.source.save(name, ContentFile(content.encode()))
+
+    def collect(self):
+        # collectstatic と同様に、ファイルをコピーしてから後処理をおこなう
+        paths = {}
+        for name in ('css/app.css', 'css/tiny.css'):
+            with self.source.open(name) as f:
+                self.storage.save(name, f)
+            paths[name] = (self.source, name)
+        processed = list(self.storage.post_process(paths, dry_run=False))
+        self.storage.save_manifest()
+        return processed
+
+    def test_gzip(self):
+        """ハッシュ付きのファイルの gzip 版が出力され、小さくならないファイルは圧縮されないこと"""
+
+        self.collect()
+        hashed_name = self.storage.stored_name('css/app.css')
+        self.assertRegex(hashed_name, r'^css/app\.[0-9a-f]{12}\.css$')
+        with self.storage.open(hashed_name + '.gz') as f:
+            self.assertEqual(gzip.decompress(f.read()).decode(), self.CSS)
+        # 元のファイル名のファイルは圧縮しない
+        self.assertFalse(self.storage.exists('css/app.css.gz'))
+        # 圧縮しても小さくならないファイル
+        self.assertFalse(self.storage.exists(self.storage.stored_name('css/tiny.css') + '.gz'))
+
+    @skipUnless(brotli, "brotli is not installed")
+    def test_brotli(self):
+        """brotli がインストールされていれば brotli 版も出力されること"""
+
+        self.collect()
+        hashed_name = self.storage.stored_name('css/app.css')
+        with self.storage.open(hashed_name + '.br') as f:
+            self.assertEqual(brotli.decompress(f.read()).decode(), self.CSS)
+
+    def test_brotli_output(self):
+        """brotli 版が圧縮結果の内容で出力されること（brotli の圧縮処理は差し替える）"""
+
+        fake_brotli = mock.Mock(compress=lambda content: b'br:' + content[:10])
+        with mock.patch('common.storage.brotli', fake_brotli):
+            self.collect()
+        hashed_name = self.storage.stored_name('css/app.css')
+        with self.storage.open(hashed_name + '.br') as f:
+            self.assertEqual(f.read(), b'br:' + self.CSS.encode()[:10])
+
+    def test_brotli_not_installed(self):
+        """brotli がインストールされていなければ gzip 版のみ出力されること"""
+
+        with mock.patch('common.storage.brotli', None):
+            self.collect()
+        hashed_name = self.storage.stored_name('css/app.css')
+        self.assertTrue(self.storage.exists(hashed_name + '.gz'))
+        self.assertFalse(self.storage.exists(hashed_name + '.br'))
@@ -24,9 +24,10 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = 'ld^o*s33esb4jw_0aa630dudn#669fxaxxgl2w--by-^!!cul@'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# 本番環境では環境変数 DJANGO_DEBUG=0 で無効にする
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', '').split()
 
 
 # Application definition
@@ -60,6 +61,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'common.middleware.ReadReplicaMiddleware',
+    'common.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -93,8 +96,30 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # 接続を使い回す秒数（リクエストの前後でエラーが発生した接続は使い回さない）
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+        'OPTIONS': {
+            # ロック待ちのタイムアウト秒数（SQLite の busy_timeout）
+            'timeout': 20,
+        },
     }
 }
+# 読み込み専用のレプリカ（環境変数でファイルを指定した場合のみ利用する）
+if os.environ.get('DATABASE_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['DATABASE_REPLICA_NAME'],
+        # テスト時はプライマリと同じデータベースを参照する
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['common.routers.ReplicaRouter']
+
+# SQLite の接続時に実行する PRAGMA（同時実行性を上げるため WAL モードにする）
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+}
 
 
 # AUTH_USER_MODEL = 'accounts.Employee'
@@ -148,10 +173,27 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 STATIC_ROOT = os.path.join(BASE_DIR, 'static_root')
+# 本番環境（DEBUG = False）では collectstatic でハッシュ付きのファイル名と圧縮済みのファイルを出力する
+# （Web サーバーの配信設定は config/nginx/static.conf を参照）
+if not DEBUG:
+    STATICFILES_STORAGE = 'common.storage.CompressedManifestStaticFilesStorage'
+
+# 郵便番号データの静的JSONファイルの出力先（export_address_shards コマンドで出力）
+# （collectstatic --clear で削除されないように STATIC_ROOT の外に出力する）
+ADDRESS_SHARDS_ROOT = os.path.join(BASE_DIR, 'address_shards')
+ADDRESS_SHARDS_URL = '/address_shards/'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media_root')
 
+# 管理サイトのリクエストのプロファイル（無効の場合はミドルウェアを読み込まない）
+ADMIN_PROFILING_ENABLED = os.environ.get('ADMIN_PROFILING_ENABLED') == '1'
+# ランダムにプロファイルするリクエストの割合（0 の場合は ?_profile=1 を指定したリクエストのみ）
+ADMIN_PROFILING_SAMPLE_RATE = float(os.environ.get('ADMIN_PROFILING_SAMPLE_RATE', 0))
+# プロファイルの保存先と保存する件数（超えた場合は古いものから削除する）
+ADMIN_PROFILING_ROOT = os.path.join(BASE_DIR, 'profiles')
+ADMIN_PROFILING_MAX_FILES = 100
+
 
 # Email
 
@@ -41,7 +41,10 @@ handler500 = 'common.handlers.handler500'
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('tinymce/', include('tinymce.urls')),
-    path('address_search/', addresses_views.AddressSearchAjaxView.as_view()),
+    path('address_search/', addresses_views.AddressSearchAjaxView.as_view(),
+         name='address_search'),
+    path('address_search/cities/', addresses_views.CityListAjaxView.as_view(),
+         name='address_city_list'),
     # パスワード再設定用のURLパターンを登録
     path('admin/password_reset/', auth_views.PasswordResetView.as_view(),
          name='admin_password_reset'),
@@ -52,8 +55,9 @@ urlpatterns = [
     path('reset/done/', auth_views.PasswordResetCompleteView.as_view(),
          name='password_reset_complete'),
 ]
-# DEBUG が True の場合に runserver でメディアファイルを配信するための設定
+# DEBUG が True の場合に runserver でメディアファイル・郵便番号データを配信するための設定
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+urlpatterns += static(settings.ADDRESS_SHARDS_URL, document_root=settings.ADDRESS_SHARDS_ROOT)
 
 if settings.DEBUG:
     import debug_toolbar
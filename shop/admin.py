@@ -1,18 +1,226 @@
 import csv
-
-from django.contrib import admin
-from django.contrib.admin.options import IncorrectLookupParameters
-from django.db.models import Q
+import hashlib
+import json
+import sys
+from collections import defaultdict
+
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.models import CHANGE, DELETION, LogEntry
+from django.contrib.admin.options import (
+    IncorrectLookupParameters, get_content_type_for_model,
+)
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import Q, QuerySet
 from django.http.response import HttpResponse
+from django.template.response import TemplateResponse
+from django.urls import path
 # from django.urls import reverse
 from django.utils import timezone
 from django.utils.html import format_html
 # from import_export import resources
 # from import_export.admin import ExportActionMixin
 
-from .forms import BookAdminForm, PublisherAdminForm
-from .models import Author, Book, PublishedBook, Publisher, UnpublishedBook
-# from .models import BookStock
+from . import counters, stock
+from .archive import restore_books
+from .bulk import bulk_set_authors
+from .date_hierarchy import invalidate_date_counts
+from .deletion import delete_in_chunks, summarize_deletion
+from .forms import (
+    BookAdminForm, BookAuthorsForm, BookImportForm, BookStockForm, BookStockInlineFormSet,
+    ChangedFormsOnlyModelFormSet, PaginatedInlineFormSet, PublisherAdminForm,
+)
+from .importers import BookImporter
+from .models import (
+    ArchivedBook, Author, Book, BookStock, PublishedBook, Publisher, UnpublishedBook,
+)
+from .search import search_books
+from .thumbnails import IMAGE_ERRORS, generate_thumbnails, get_thumbnail_url
+
+
+def get_prefix_upper_bound(prefix):
+    """前方一致の範囲検索の上限（prefix で始まる文字列より大きい最小の文字列）を返す
+
+    末尾の文字のコードポイントを1つ進める（上限がない場合は None）。
+    """
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    code = ord(prefix[-1]) + 1
+    # サロゲートはエンコードできないので飛ばす
+    if 0xD800 <= code <= 0xDFFF:
+        code = 0xE000
+    return prefix[:-1] + chr(code)
+
+
+class PrefixAutocompleteMixin:
+    """オートコンプリートを名前の前方一致検索とキャッシュで高速化する Mixin
+
+    前方一致は名前のインデックスを使えるように範囲の条件で検索する。
+    検索結果は autocomplete_cache_timeout 秒だけキャッシュし、管理サイトで
+    追加・変更・削除した場合は世代を上げてキャッシュを無効にする。
+    """
+
+    autocomplete_field = 'name'
+    autocomplete_cache_timeout = 60
+
+    def get_search_results(self, request, queryset, search_term):
+        if request.resolver_match is None or \
+                not request.resolver_match.url_name.endswith('_autocomplete'):
+            return super().get_search_results(request, queryset, search_term)
+        field = self.autocomplete_field
+        queryset = queryset.filter(**{field + '__gte': search_term})
+        upper_bound = get_prefix_upper_bound(search_term)
+        if upper_bound is not None:
+            queryset = queryset.filter(**{field + '__lt': upper_bound})
+        return queryset.order_by(field, 'pk'), False
+
+    def autocomplete_view(self, request):
+        if not self.has_view_permission(request):
+            return super().autocomplete_view(request)
+        key = self._autocomplete_cache_key(
+            request.GET.get('term', ''), request.GET.get('page', '1'))
+        content = cache.get(key)
+        if content is None:
+            response = super().autocomplete_view(request)
+            if response.status_code != 200:
+                return response
+            content = response.content
+            cache.set(key, content, self.autocomplete_cache_timeout)
+        return HttpResponse(content, content_type='application/json')
+
+    def _autocomplete_cache_key(self, term, page):
+        prefix = 'autocomplete:{}'.format(self.model._meta.label_lower)
+        generation = cache.get_or_set(prefix, 0, None)
+        # 検索キーワードは memcached のキーに使えない文字を含みうるのでハッシュ値にする
+        digest = hashlib.md5('{}:{}'.format(page, term).encode()).hexdigest()
+        return '{}:{}:{}'.format(prefix, generation, digest)
+
+    def _clear_autocomplete_cache(self):
+        prefix = 'autocomplete:{}'.format(self.model._meta.label_lower)
+        try:
+            cache.incr(prefix)
+        except ValueError:
+            pass
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self._clear_autocomplete_cache()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self._clear_autocomplete_cache()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        self._clear_autocomplete_cache()
+
+
+class SummarizedDeleteMixin:
+    """大量のレコードの削除を高速化する Mixin
+
+    削除確認画面では関連するレコードを1件ずつ取得せずに件数のみを表示し、
+    削除は一定件数ずつおこなう。「選択された〜の削除」アクションの変更履歴は
+    1件ずつ登録せずに、削除と同じトランザクションでチャンクごとにまとめて登録する。
+    """
+
+    def get_deleted_objects(self, objs, request):
+        if isinstance(objs, QuerySet):
+            # 「選択された〜の削除」アクションの場合は変更履歴をまとめて登録する
+            request._deletion_log_entries = []
+            queryset = objs
+        else:
+            queryset = self.model._base_manager.filter(pk__in=[obj.pk for obj in objs])
+        return summarize_deletion(queryset, self.admin_site, request)
+
+    def log_deletion(self, request, object, object_repr):
+        entries = getattr(request, '_deletion_log_entries', None)
+        if entries is None:
+            return super().log_deletion(request, object, object_repr)
+        entries.append(LogEntry(
+            user_id=request.user.pk,
+            content_type_id=get_content_type_for_model(object).pk,
+            object_id=str(object.pk),
+            object_repr=object_repr[:200],
+            action_flag=DELETION,
+        ))
+
+    def delete_queryset(self, request, queryset):
+        entries = {entry.object_id: entry
+                   for entry in getattr(request, '_deletion_log_entries', None) or []}
+
+        def log_chunk(pks):
+            # 途中で失敗しても削除済みのレコードと変更履歴が一致するように、チャンクごとに登録する
+            LogEntry.objects.bulk_create(
+                [entries[str(pk)] for pk in pks if str(pk) in entries])
+
+        delete_in_chunks(queryset, on_chunk=log_chunk)
+        request._deletion_log_entries = None
+
+
+class BulkListEditableMixin:
+    """モデル一覧画面の一括編集（list_editable）の保存を高速化する Mixin
+
+    変更のあった行のみを検証し、レコードは変更されたフィールドの組み合わせごとに
+    bulk_update で、変更履歴は bulk_create でまとめて保存する。
+    """
+
+    def get_changelist_formset(self, request, **kwargs):
+        kwargs.setdefault('formset', ChangedFormsOnlyModelFormSet)
+        return super().get_changelist_formset(request, **kwargs)
+
+    def changelist_view(self, request, extra_context=None):
+        if not (request.method == 'POST' and '_save' in request.POST):
+            return super().changelist_view(request, extra_context)
+        # 一括編集の保存時は save_model() と log_change() で保存内容を溜めておく
+        request._bulk_edit_objects = []
+        request._bulk_edit_log_entries = []
+        with transaction.atomic():
+            response = super().changelist_view(request, extra_context)
+            self._save_bulk_edit(request)
+        return response
+
+    def save_model(self, request, obj, form, change):
+        objects = getattr(request, '_bulk_edit_objects', None)
+        if objects is None:
+            return super().save_model(request, obj, form, change)
+        objects.append((obj, form.changed_data))
+
+    def log_change(self, request, object, message):
+        entries = getattr(request, '_bulk_edit_log_entries', None)
+        if entries is None:
+            return super().log_change(request, object, message)
+        entries.append(LogEntry(
+            user_id=request.user.pk,
+            content_type_id=get_content_type_for_model(object).pk,
+            object_id=str(object.pk),
+            object_repr=str(object)[:200],
+            action_flag=CHANGE,
+            change_message=json.dumps(message) if isinstance(message, list) else message,
+        ))
+
+    def _save_bulk_edit(self, request):
+        # フォームにモデル以外のフィールドがあっても bulk_update できるようにする
+        field_names = {field.name for field in self.model._meta.concrete_fields
+                       if not field.primary_key}
+        groups = defaultdict(list)
+        for obj, fields in request._bulk_edit_objects:
+            fields = tuple(sorted(field_names.intersection(fields)))
+            if fields:
+                groups[fields].append(obj)
+        book_ids = [obj.pk for obj, fields in request._bulk_edit_objects
+                    if obj._meta.concrete_model is Book]
+        with counters.batch_refresh():
+            # 変更前後の出版社・著者の本の件数と最新の出版日を更新する
+            counters.track_books(book_ids)
+            for fields, objs in groups.items():
+                self.model._base_manager.bulk_update(objs, fields)
+            counters.track_books(book_ids)
+        LogEntry.objects.bulk_create(request._bulk_edit_log_entries)
+        invalidate_date_counts()
+        request._bulk_edit_objects = request._bulk_edit_log_entries = None
 
 
 class BookInline(admin.TabularInline):
@@ -20,11 +228,28 @@ class BookInline(admin.TabularInline):
     model = Book
     fields = ('title', 'price')
     extra = 1
-
-
-# class BookStockInline(admin.TabularInline):
-#     # OneToOneField を持っているモデルもインラインOK
-#     model = BookStock
+    # 大量の本を持つ出版社でも1ページ分のフォームのみを表示・送信する
+    formset = PaginatedInlineFormSet
+    template = 'admin/edit_inline/tabular_paginated.html'
+    per_page = 20
+    page_param = 'book_page'
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.per_page = self.per_page
+        formset.page_param = self.page_param
+        formset.page_number = request.GET.get(self.page_param)
+        formset.query = request.GET
+        return formset
+
+
+class BookStockInline(admin.TabularInline):
+    # OneToOneField を持っているモデルもインラインOK
+    model = BookStock
+    # 在庫数は表示時からの差分として保存する（同時の注文による増減を上書きしない）
+    form = BookStockForm
+    formset = BookStockInlineFormSet
+    can_delete = False
 
 
 # class BookResource(resources.ModelResource):
@@ -38,7 +263,7 @@ class BookInline(admin.TabularInline):
 
 
 # class BookAdmin(ExportActionMixin, admin.ModelAdmin):
-class BookAdmin(admin.ModelAdmin):
+class BookAdmin(BulkListEditableMixin, SummarizedDeleteMixin, admin.ModelAdmin):
     class Media:
         css = {
             'all': (
@@ -50,8 +275,10 @@ class BookAdmin(admin.ModelAdmin):
     # モデル一覧画面のカスタマイズ
     ###############################
     # 画面表示フィールド
-    list_display = ('id', 'title', 'format_price', 'size', 'publish_date')
+    list_display = ('id', 'title', 'format_price', 'size', 'publish_date', 'format_stock')
     list_display_links = ('id', 'title')
+    # 在庫数は1件ずつ取得せずに JOIN して取得する
+    list_select_related = ('bookstock',)
     # list_editable = ('publish_date',)
     # empty_value_display = '(なし)'
 
@@ -84,10 +311,22 @@ class BookAdmin(admin.ModelAdmin):
     format_publish_date.short_description = '出版日'
     format_publish_date.admin_order_field = 'publish_date'
 
+    def format_stock(self, obj):
+        """在庫数を表示する（在庫のレコードがない場合は空）"""
+        try:
+            return obj.bookstock.quantity
+        except BookStock.DoesNotExist:
+            return None
+
+    format_stock.short_description = '在庫数'
+    format_stock.admin_order_field = 'bookstock__quantity'
+
     def format_image(self, obj):
         """画像をHTMLで修飾する"""
         if obj.image:
-            return format_html('<img src="{}" width="100" />', obj.image.url)
+            # サムネイルが未作成の場合は元画像になるので、幅を指定しておく
+            return format_html('<img src="{}" width="100" />',
+                               get_thumbnail_url(obj.image, obj.image_digest))
 
     format_image.short_description = '画像'
     format_image.empty_value_display = 'No image'
@@ -112,6 +351,10 @@ class BookAdmin(admin.ModelAdmin):
     # search_fields = ('title', 'price', 'publish_date')
     search_fields = ('title', 'price', 'publisher__name', 'authors__name')
 
+    def get_search_results(self, request, queryset, search_term):
+        """検索キーワードの種類に応じて対象の列を選んで絞り込む（shop.search を参照）"""
+        return search_books(queryset, search_term), False
+
     class PriceListFilter(admin.SimpleListFilter):
         """価格で絞り込むためのフィルタクラス"""
 
@@ -144,8 +387,43 @@ class BookAdmin(admin.ModelAdmin):
                 queryset = queryset.filter(price__lt=price_max)
             return queryset
 
+    class StockLevelListFilter(admin.SimpleListFilter):
+        """在庫状況で絞り込むためのフィルタクラス"""
+
+        title = '在庫状況'
+        parameter_name = 'stock_level'
+
+        def lookups(self, request, model_admin):
+            return (
+                (stock.STOCK_IN, '在庫あり'),
+                (stock.STOCK_LOW, '在庫僅少（{}冊未満）'.format(stock.LOW_STOCK_THRESHOLD)),
+                (stock.STOCK_OUT, '在庫切れ'),
+            )
+
+        def queryset(self, request, queryset):
+            if self.value() is None:
+                return queryset
+            if self.value() not in stock.STOCK_LEVELS:
+                raise IncorrectLookupParameters
+            return stock.filter_stock_level(queryset, self.value())
+
+        def choices(self, changelist):
+            # 他の絞り込み条件や検索キーワードがない場合は在庫状況ごとの件数を表示する
+            params = changelist.get_filters_params()
+            params.pop(self.parameter_name, None)
+            counts = None
+            if not changelist.query and not params:
+                counts = stock.get_stock_level_counts(changelist.root_queryset)
+            choices = super().choices(changelist)
+            # 「すべて」
+            yield next(choices)
+            for (value, title), choice in zip(self.lookup_choices, choices):
+                if counts is not None:
+                    choice['display'] = '{} ({})'.format(title, counts[value])
+                yield choice
+
     # 絞り込み（フィルタ）
-    list_filter = ('size', PriceListFilter)
+    list_filter = ('size', PriceListFilter, StockLevelListFilter)
     # list_filter = ('size', PriceListFilter, 'publish_date')
     # list_filter = ('size', 'price', 'publish_date', 'publisher', 'authors')
 
@@ -153,13 +431,13 @@ class BookAdmin(admin.ModelAdmin):
     list_per_page = 10
     list_max_show_all = 1000
 
-    # 日付ドリルダウンナビゲーション
-    # date_hierarchy = 'publish_date'
+    # 日付ドリルダウンナビゲーション（日付ごとの件数のキャッシュから表示する）
+    date_hierarchy = 'publish_date'
 
     # アクション一覧
     # resource_class = BookResource
     # actions = ['export_admin_action']
-    actions = ['download_as_csv', 'publish_today']
+    actions = ['download_as_csv', 'publish_today', 'set_authors']
 
     def download_as_csv(self, request, queryset):
         """選択されたレコードのCSVダウンロードをおこなう"""
@@ -167,7 +445,8 @@ class BookAdmin(admin.ModelAdmin):
         response = HttpResponse(content_type='text/csv')
         response['Content-Disposition'] = 'attachment; filename={}.csv'.format(meta)
         writer = csv.writer(response)
-        field_names = [field.name for field in meta.fields]
+        # サムネイル用の画像のハッシュ値は出力しない
+        field_names = [field.name for field in meta.fields if field.name != 'image_digest']
         writer.writerow(field_names)
         for obj in queryset:
             writer.writerow([getattr(obj, field) for field in field_names])
@@ -177,11 +456,40 @@ class BookAdmin(admin.ModelAdmin):
 
     def publish_today(self, request, queryset):
         """選択されたレコードの出版日を今日に更新する"""
-        queryset.update(publish_date=timezone.localdate())
+        # 本（未発売）の一覧画面では更新後に絞り込み条件から外れるので、先に ID を求めておく
+        pks = list(queryset.values_list('pk', flat=True))
+        with counters.batch_refresh():
+            Book.objects.filter(pk__in=pks).update(publish_date=timezone.localdate())
+            counters.track_books(pks)
+        invalidate_date_counts()
 
     publish_today.short_description = '出版日を今日に更新'
     publish_today.allowed_permissions = ('change',)
 
+    def set_authors(self, request, queryset):
+        """選択されたレコードの著者を一括設定する"""
+        form = BookAuthorsForm(request.POST if request.POST.get('post') else None,
+                               admin_site=self.admin_site)
+        if form.is_valid():
+            book_ids = bulk_set_authors(queryset, form.cleaned_data['authors'])
+            self.message_user(
+                request, '{} 件の著者を設定しました。'.format(len(book_ids)),
+                messages.SUCCESS)
+            return None
+        context = {
+            'title': '著者を一括設定',
+            'opts': self.model._meta,
+            'form': form,
+            'queryset': queryset,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+            'select_across': request.POST.get('select_across', '0'),
+            **self.admin_site.each_context(request),
+        }
+        return TemplateResponse(request, 'admin/shop/book/set_authors.html', context)
+
+    set_authors.short_description = '著者を一括設定'
+    set_authors.allowed_permissions = ('change',)
+
     ###############################
     # モデル追加・変更画面のカスタマイズ
     ###############################
@@ -191,7 +499,8 @@ class BookAdmin(admin.ModelAdmin):
     # )
     # exclude = ('publisher',)
     # readonly_fields = ('id', 'created_by', 'created_at')
-    # autocomplete_fields = ('publisher',)
+    # 出版社・著者は検索して選択する（選択済みの値のみをHTMLに出力する）
+    autocomplete_fields = ('publisher', 'authors')
     # radio_fields = {'size': admin.HORIZONTAL}
     # prepopulated_fields = {'description': ('title', 'publish_date', )}
     # formfield_overrides = {
@@ -205,18 +514,78 @@ class BookAdmin(admin.ModelAdmin):
     form = BookAdminForm
 
     # インライン表示
-    # inlines = [
-    #     BookStockInline,
-    # ]
+    inlines = [
+        BookStockInline,
+    ]
 
     ###############################
     # その他のカスタマイズ
     ###############################
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        # 本と著者の保存後に、出版社・著者の本の件数と最新の出版日をまとめて更新する
+        with counters.batch_refresh():
+            return super().changeform_view(request, object_id, form_url, extra_context)
+
     def save_model(self, request, obj, form, change):
         """モデル保存前に処理を追加する"""
         if not change:
             obj.created_by = request.user
+        if 'image' in form.changed_data:
+            obj.image_digest = ''
         super().save_model(request, obj, form, change)
+        # 画像がアップロードされた場合はサムネイルを作成しておく（一覧画面では作成しない）
+        if obj.image and 'image' in form.changed_data:
+            try:
+                obj.image_digest = generate_thumbnails(obj.image.name, obj.image.storage)
+            except IMAGE_ERRORS:
+                return
+            self.model._base_manager.filter(pk=obj.pk).update(image_digest=obj.image_digest)
+
+    def get_urls(self):
+        """URLパターンと対応するビューを定義"""
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            # インポート画面のURLパターン
+            path('import/', self.admin_site.admin_view(self.import_view),
+                 name='%s_%s_import' % info),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        """インポート画面を表示するためのビュー"""
+        if not (self.has_add_permission(request) and
+                self.has_change_permission(request)):
+            raise PermissionDenied
+        form = BookImportForm(request.POST or None, request.FILES or None)
+        errors = []
+        if request.method == 'POST' and form.is_valid():
+            uploaded_file = form.cleaned_data['file']
+            file_format = uploaded_file.name.rpartition('.')[2].lower()
+            importer = BookImporter()
+            try:
+                importer.import_file(uploaded_file.file, file_format)
+            except (UnicodeDecodeError, csv.Error) as e:
+                # 読み込めなかった箇所より前のチャンクは登録済み
+                form.add_error('file', 'ファイルを読み込めません（{}）。'.format(e))
+            self.message_user(
+                request,
+                '{} 件を登録、{} 件を更新しました。'.format(importer.created, importer.updated),
+                messages.SUCCESS,
+            )
+            if importer.errors:
+                self.message_user(
+                    request,
+                    '{} 件のエラーがありました。'.format(len(importer.errors)),
+                    messages.WARNING,
+                )
+            errors = importer.errors[:100]
+        context = {
+            'title': 'インポート',
+            'opts': self.model._meta,
+            'form': form,
+            'errors': errors,
+            **self.admin_site.each_context(request),
+        }
+        return TemplateResponse(request, 'admin/shop/book/import.html', context)
 
     # def has_add_permission(self, request):
     #     # ログインユーザーのメールアドレスのドメインが「example.com」の場合に True
@@ -244,21 +613,24 @@ class BookAdmin(admin.ModelAdmin):
     #     return queryset.filter(created_by=request.user)
 
 
-class PublisherAdmin(admin.ModelAdmin):
+class AuthorAdmin(PrefixAutocompleteMixin, admin.ModelAdmin):
+    ###############################
+    # モデル一覧画面のカスタマイズ
+    ###############################
+    list_display = ('name', 'book_count', 'latest_publish_date')
+    search_fields = ('name',)
+
+
+class PublisherAdmin(PrefixAutocompleteMixin, SummarizedDeleteMixin, admin.ModelAdmin):
     class Media:
-        css = {
-            'all': (
-                '//code.jquery.com/ui/1.12.0/themes/smoothness/jquery-ui.css',
-            )
-        }
         js = (
-            '//code.jquery.com/ui/1.12.1/jquery-ui.min.js',
             'admin/js/postal_code.js',
         )
 
     ###############################
     # モデル一覧画面のカスタマイズ
     ###############################
+    list_display = ('name', 'book_count', 'latest_publish_date')
     search_fields = ('name',)
 
     ###############################
@@ -288,9 +660,55 @@ class UnpublishedBookAdmin(BookAdmin):
         )
 
 
+class ArchivedBookAdmin(admin.ModelAdmin):
+    """アーカイブ済みの本の参照用（変更不可、本への復元のみ可能）"""
+
+    ###############################
+    # モデル一覧画面のカスタマイズ
+    ###############################
+    list_display = ('id', 'title', 'publisher', 'publish_date', 'archived_at')
+    list_display_links = ('id', 'title')
+    list_select_related = ('publisher',)
+    ordering = ('id',)
+    search_fields = ('title',)
+    date_hierarchy = 'publish_date'
+    actions = ['restore']
+
+    def restore(self, request, queryset):
+        """選択されたレコードを本に戻す"""
+        count, conflicts = restore_books(queryset)
+        self.message_user(request, '{} 件を本に戻しました。'.format(count), messages.SUCCESS)
+        if conflicts:
+            self.message_user(
+                request,
+                '同じIDの本が存在するため {} 件を戻せませんでした。（ID: {}）'.format(
+                    len(conflicts), ', '.join(map(str, conflicts))),
+                messages.WARNING,
+            )
+
+    restore.short_description = '本に戻す'
+    restore.allowed_permissions = ('restore',)
+
+    def has_restore_permission(self, request):
+        return request.user.has_perm('shop.add_book')
+
+    ###############################
+    # その他のカスタマイズ
+    ###############################
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 admin.site.register(Book, BookAdmin)
 admin.site.register(PublishedBook, PublishedBookAdmin)
 admin.site.register(UnpublishedBook, UnpublishedBookAdmin)
-admin.site.register(Author)
+admin.site.register(Author, AuthorAdmin)
 # admin.site.register(BookStock)
 admin.site.register(Publisher, PublisherAdmin)
+admin.site.register(ArchivedBook, ArchivedBookAdmin)
@@ -0,0 +1,104 @@
+from django.db import transaction
+
+from . import counters
+from .date_hierarchy import invalidate_date_counts
+from .models import ArchivedBook, Book, BookStock
+from .stock import invalidate_stock_level_counts
+
+# 一度に移動する件数（SQLite の変数の上限に収まるようにする）
+ARCHIVE_CHUNK_SIZE = 500
+# 本とアーカイブで共通のフィールド
+ARCHIVE_FIELDS = (
+    'title', 'image', 'image_digest', 'publisher_id', 'price', 'size', 'description',
+    'publish_date', 'created_by_id', 'created_at',
+)
+
+
+def _chunks(queryset, chunk_size):
+    pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+    for i in range(0, len(pks), chunk_size):
+        yield pks[i:i + chunk_size]
+
+
+def archive_books(queryset, chunk_size=None):
+    """本を著者・在庫数とともにアーカイブに移動して、移動した件数を返す
+
+    chunk_size 件ずつ、アーカイブへのコピーと本の削除を1つのトランザクションでおこなう。
+    """
+    chunk_size = chunk_size or ARCHIVE_CHUNK_SIZE
+    through = Book.authors.through
+    archived_through = ArchivedBook.authors.through
+    count = 0
+    for chunk in _chunks(queryset, chunk_size):
+        with transaction.atomic(), counters.batch_refresh():
+            # 出版社・著者の本の件数と最新の出版日は1件ずつではなくまとめて更新する
+            counters.track_books(chunk)
+            books = Book._base_manager.filter(pk__in=chunk).select_related('bookstock')
+            archived_books = []
+            for book in books:
+                archived_book = ArchivedBook(
+                    id=book.pk, **{field: getattr(book, field) for field in ARCHIVE_FIELDS})
+                try:
+                    archived_book.quantity = book.bookstock.quantity
+                except BookStock.DoesNotExist:
+                    pass
+                archived_books.append(archived_book)
+            ArchivedBook.objects.bulk_create(archived_books)
+            archived_through.objects.bulk_create([
+                archived_through(archivedbook_id=book_id, author_id=author_id)
+                for book_id, author_id in through.objects.filter(book_id__in=chunk)
+                .values_list('book_id', 'author_id')
+            ])
+            Book._base_manager.filter(pk__in=chunk).delete()
+        count += len(archived_books)
+    return count
+
+
+def archive_published_before(cutoff, chunk_size=None):
+    """出版日が cutoff より前の本をアーカイブに移動する"""
+    return archive_books(Book.objects.filter(publish_date__lt=cutoff), chunk_size)
+
+
+def restore_books(queryset, chunk_size=None):
+    """アーカイブの本を同じIDで本に戻して、(戻した件数, 戻せなかった本のIDのリスト) を返す
+
+    同じIDの本が既に存在する場合は、その本はアーカイブに残したままにする。
+    """
+    chunk_size = chunk_size or ARCHIVE_CHUNK_SIZE
+    through = Book.authors.through
+    archived_through = ArchivedBook.authors.through
+    count, conflicts = 0, []
+    for chunk in _chunks(queryset, chunk_size):
+        with transaction.atomic(), counters.batch_refresh():
+            existing_ids = set(
+                Book._base_manager.filter(pk__in=chunk).values_list('pk', flat=True))
+            conflicts.extend(sorted(existing_ids))
+            chunk = [pk for pk in chunk if pk not in existing_ids]
+            archived_books = list(ArchivedBook.objects.filter(pk__in=chunk))
+            books = [
+                Book(id=archived_book.pk,
+                     **{field: getattr(archived_book, field) for field in ARCHIVE_FIELDS})
+                for archived_book in archived_books
+            ]
+            Book.objects.bulk_create(books)
+            # 登録日時は bulk_create() で現在日時になるので元に戻す
+            for book, archived_book in zip(books, archived_books):
+                book.created_at = archived_book.created_at
+            Book.objects.bulk_update(books, ['created_at'])
+            through.objects.bulk_create([
+                through(book_id=book_id, author_id=author_id)
+                for book_id, author_id in archived_through.objects
+                .filter(archivedbook_id__in=chunk)
+                .values_list('archivedbook_id', 'author_id')
+            ])
+            BookStock.objects.bulk_create([
+                BookStock(book_id=archived_book.pk, quantity=archived_book.quantity)
+                for archived_book in archived_books if archived_book.quantity is not None
+            ])
+            ArchivedBook.objects.filter(pk__in=chunk).delete()
+            counters.track_books(chunk)
+        count += len(archived_books)
+    # bulk_create() ではシグナルが送られないのでキャッシュを無効にする
+    invalidate_date_counts()
+    invalidate_stock_level_counts()
+    return count, conflicts
@@ -0,0 +1,35 @@
+from django.db import router
+
+from . import counters
+from .models import Book
+
+
+def bulk_set_authors(queryset, authors):
+    """本の著者をまとめて設定する
+
+    現在の著者との差分を取り、中間テーブルへの一括 DELETE と一括 INSERT のみで
+    queryset の全ての本の著者を authors に置き換える。
+    """
+    using = router.db_for_write(Book)
+    through = Book.authors.through
+    author_ids = {getattr(author, 'pk', author) for author in authors}
+    book_ids = list(queryset.using(using).values_list('pk', flat=True))
+    current = set(
+        through.objects.using(using)
+        .filter(book_id__in=queryset.values('pk'))
+        .values_list('book_id', 'author_id')
+    )
+    if any(author_id not in author_ids for book_id, author_id in current):
+        through.objects.using(using) \
+            .filter(book_id__in=queryset.values('pk')) \
+            .exclude(author_id__in=author_ids) \
+            .delete()
+    through.objects.using(using).bulk_create([
+        through(book_id=book_id, author_id=author_id)
+        for book_id in book_ids
+        for author_id in author_ids
+        if (book_id, author_id) not in current
+    ])
+    # 変更前後の著者の本の件数と最新の出版日を更新する
+    counters.schedule(author_ids={author_id for book_id, author_id in current} | author_ids)
+    return book_ids
@@ -0,0 +1,107 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Author, Book, Publisher
+
+# 一度に更新する出版社・著者の件数（SQLite の変数の上限に収まるようにする）
+REFRESH_CHUNK_SIZE = 500
+
+_state = threading.local()
+
+
+def _book_count_updates(related_field):
+    """本の件数と最新の出版日を求める相関サブクエリ"""
+    books = Book.objects.filter(**{related_field: OuterRef('pk')}).order_by().values(related_field)
+    return {
+        'book_count': Coalesce(
+            Subquery(books.annotate(count=Count('pk')).values('count'),
+                     output_field=IntegerField()), 0),
+        'latest_publish_date': Subquery(
+            books.annotate(latest=Max('publish_date')).values('latest')),
+    }
+
+
+def _refresh(model, related_field, ids):
+    updates = _book_count_updates(related_field)
+    if ids is None:
+        model.objects.update(**updates)
+        return
+    ids = sorted(ids)
+    for i in range(0, len(ids), REFRESH_CHUNK_SIZE):
+        model.objects.filter(pk__in=ids[i:i + REFRESH_CHUNK_SIZE]).update(**updates)
+
+
+def refresh_publishers(publisher_ids=None):
+    """出版社の本の件数と最新の出版日を更新する（None の場合は全ての出版社）"""
+    _refresh(Publisher, 'publisher', publisher_ids)
+
+
+def refresh_authors(author_ids=None):
+    """著者の本の件数と最新の出版日を更新する（None の場合は全ての著者）"""
+    _refresh(Author, 'authors', author_ids)
+
+
+class _Batch:
+    def __init__(self):
+        self.publisher_ids = set()
+        self.author_ids = set()
+        # 関連する出版社・著者を取得済みの本
+        self.book_ids = set()
+
+
+def current_batch():
+    """実行中の batch_refresh() のブロックを返す（ブロックの外では None）"""
+    return getattr(_state, 'batch', None)
+
+
+@contextmanager
+def batch_refresh():
+    """ブロック内で更新対象になった出版社・著者を、ブロックの終了時にまとめて更新する"""
+    if current_batch() is not None:
+        yield current_batch()
+        return
+    batch = _state.batch = _Batch()
+    try:
+        yield batch
+    finally:
+        _state.batch = None
+    refresh_publishers(batch.publisher_ids)
+    refresh_authors(batch.author_ids)
+
+
+def schedule(publisher_ids=(), author_ids=()):
+    """出版社・著者を更新する（batch_refresh() のブロック内ではブロックの終了時に更新する）"""
+    publisher_ids = {pk for pk in publisher_ids if pk is not None}
+    author_ids = set(author_ids)
+    batch = current_batch()
+    if batch is not None:
+        batch.publisher_ids |= publisher_ids
+        batch.author_ids |= author_ids
+        return
+    if publisher_ids:
+        refresh_publishers(publisher_ids)
+    if author_ids:
+        refresh_authors(author_ids)
+
+
+def track_books(book_ids):
+    """本に現在関連している出版社・著者を更新の対象にする
+
+    シグナルを送らない一括の登録・更新・削除の前後で呼び出す。
+    """
+    book_ids = list(book_ids)
+    publisher_ids, author_ids = set(), set()
+    for i in range(0, len(book_ids), REFRESH_CHUNK_SIZE):
+        chunk = book_ids[i:i + REFRESH_CHUNK_SIZE]
+        publisher_ids.update(
+            Book.objects.filter(pk__in=chunk).values_list('publisher_id', flat=True))
+        author_ids.update(
+            Book.authors.through.objects.filter(book_id__in=chunk)
+            .values_list('author_id', flat=True))
+    batch = current_batch()
+    if batch is not None:
+        batch.book_ids.update(book_ids)
+    schedule(publisher_ids, author_ids)
@@ -0,0 +1,55 @@
+import hashlib
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Count
+
+# 日付ごとの件数をキャッシュする秒数
+DATE_COUNTS_TIMEOUT = 300
+GENERATION_KEY = 'shop:date_counts'
+
+
+def get_date_counts(queryset, field_name):
+    """日付ごとの件数を {日付: 件数} で求める（結果はキャッシュする）
+
+    キャッシュは絞り込み条件（クエリ）ごとに保持し、本の登録・更新・削除時に
+    invalidate_date_counts() で無効にする。
+    """
+    try:
+        sql = str(queryset.order_by().query)
+    except EmptyResultSet:
+        return {}
+    generation = cache.get_or_set(GENERATION_KEY, 0, None)
+    key = '{}:{}:{}'.format(
+        GENERATION_KEY, generation, hashlib.md5(sql.encode('utf-8')).hexdigest())
+    counts = cache.get(key)
+    if counts is None:
+        counts = dict(
+            queryset.order_by()
+            .filter(**{field_name + '__isnull': False})
+            .values(field_name)
+            .annotate(count=Count('pk'))
+            .values_list(field_name, 'count')
+        )
+        cache.set(key, counts, DATE_COUNTS_TIMEOUT)
+    return counts
+
+
+def invalidate_date_counts():
+    """日付ごとの件数のキャッシュを無効にする"""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        pass
+
+
+def rollup(counts, kind):
+    """日付ごとの件数を年（kind='year'）または月（kind='month'）ごとに集計する"""
+    totals = {}
+    for day, count in counts.items():
+        if kind == 'year':
+            key = day.replace(month=1, day=1)
+        else:
+            key = day.replace(day=1)
+        totals[key] = totals.get(key, 0) + count
+    return sorted(totals.items())
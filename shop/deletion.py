@@ -0,0 +1,87 @@
+from django.db import models, transaction
+
+from . import counters
+from .models import Book
+
+# 削除確認画面に表示する件数の上限
+SAMPLE_SIZE = 100
+# 一度に削除する件数
+DELETE_CHUNK_SIZE = 1000
+
+
+def get_cascade_relations(model):
+    """削除時に連動して削除される・削除を妨げる関連（逆参照）を求める"""
+    return [
+        field for field in model._meta.get_fields(include_hidden=True)
+        if field.auto_created and not field.concrete
+        and (field.one_to_many or field.one_to_one)
+        and field.on_delete in (models.CASCADE, models.PROTECT)
+    ]
+
+
+def summarize_deletion(queryset, admin_site, request, sample_size=None):
+    """削除される・削除を妨げるレコードを件数で集計する
+
+    ModelAdmin.get_deleted_objects() と同じ形式の値を返すが、関連するレコードは
+    1件ずつ取得せずにモデルごとの COUNT と EXISTS のクエリで求める。
+    表示するレコードは sample_size 件までとする。
+    """
+    sample_size = sample_size or SAMPLE_SIZE
+    model = queryset.model
+    total = queryset.count()
+    deletable_objects = [str(obj) for obj in queryset[:sample_size]]
+    if total > sample_size:
+        deletable_objects.append('他 {} 件'.format(total - sample_size))
+    model_count = {model._meta.verbose_name_plural: total}
+    perms_needed = set()
+    protected = []
+    _summarize_related(queryset, admin_site, request, sample_size,
+                       model_count, perms_needed, protected)
+    return deletable_objects, model_count, perms_needed, protected
+
+
+def _summarize_related(queryset, admin_site, request, sample_size,
+                       model_count, perms_needed, protected):
+    for relation in get_cascade_relations(queryset.model):
+        related_model = relation.related_model
+        related = related_model._base_manager.filter(
+            **{relation.field.name + '__in': queryset.values('pk')})
+        if relation.on_delete is models.PROTECT:
+            if not related.exists():
+                continue
+            count = related.count()
+            protected.extend(str(obj) for obj in related[:sample_size])
+            if count > sample_size:
+                protected.append('他 {} 件の{}'.format(
+                    count - sample_size, related_model._meta.verbose_name))
+            continue
+        count = related.count()
+        if not count:
+            continue
+        opts = related_model._meta
+        if not opts.auto_created:
+            model_count[opts.verbose_name_plural] = \
+                model_count.get(opts.verbose_name_plural, 0) + count
+            model_admin = admin_site._registry.get(related_model)
+            if model_admin is not None and not model_admin.has_delete_permission(request):
+                perms_needed.add(opts.verbose_name)
+        _summarize_related(related, admin_site, request, sample_size,
+                           model_count, perms_needed, protected)
+
+
+def delete_in_chunks(queryset, chunk_size=None, on_chunk=None):
+    """レコードを chunk_size 件ずつ削除する
+
+    on_chunk が指定されていれば、削除したチャンクの ID のリストを渡して同じトランザクション内で呼び出す。
+    """
+    chunk_size = chunk_size or DELETE_CHUNK_SIZE
+    pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+    for i in range(0, len(pks), chunk_size):
+        with transaction.atomic(), counters.batch_refresh():
+            chunk = pks[i:i + chunk_size]
+            if queryset.model._meta.concrete_model is Book:
+                # 出版社・著者の本の件数と最新の出版日は1件ずつではなくまとめて更新する
+                counters.track_books(chunk)
+            queryset.model._base_manager.filter(pk__in=chunk).delete()
+            if on_chunk is not None:
+                on_chunk(chunk)
@@ -1,7 +1,28 @@
 from django import forms
+from django.contrib.admin.widgets import AutocompleteSelectMultiple
+from django.core.paginator import Paginator
+from django.forms.models import BaseInlineFormSet, BaseModelFormSet
+from django.http import QueryDict
 from django.forms.widgets import MultiWidget, TextInput
 from tinymce.widgets import AdminTinyMCE
 
+from addresses.shards import get_manifest_url
+
+from . import stock
+from .models import Author, Book
+
+
+def validate_book_title(title):
+    """本のタイトルの業務ルールを検証する"""
+    if 'Java' in title:
+        raise forms.ValidationError("タイトルには「Java」を含めないでください。")
+
+
+def validate_book_price(title, price):
+    """本のタイトルと価格の組み合わせの業務ルールを検証する"""
+    if title and '薄い本' in title and price and price > 3000:
+        raise forms.ValidationError("薄い本は3,000円を超えてはいけません。")
+
 
 class PostalCodeWidget(MultiWidget):
     """郵便番号用ウィジェット"""
@@ -14,6 +35,14 @@ class PostalCodeWidget(MultiWidget):
         ]
         super().__init__(widgets, attrs)
 
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        # 郵便番号データの静的JSONファイルが出力済みであれば、住所検索で利用する
+        manifest_url = get_manifest_url()
+        if manifest_url:
+            context['widget']['shards_manifest_url'] = manifest_url
+        return context
+
     def decompress(self, value):
         """画面表示用にハイフンで分解する"""
         if value and value.count('-') >= 1:
@@ -81,12 +110,113 @@ class BookAdminForm(forms.ModelForm):
 
     def clean_title(self):
         value = self.cleaned_data['title']
-        if 'Java' in value:
-            raise forms.ValidationError("タイトルには「Java」を含めないでください。")
+        validate_book_title(value)
         return value
 
     def clean(self):
-        title = self.cleaned_data.get('title')
-        price = self.cleaned_data.get('price')
-        if title and '薄い本' in title and price and price > 3000:
-            raise forms.ValidationError("薄い本は3,000円を超えてはいけません。")
+        validate_book_price(self.cleaned_data.get('title'),
+                            self.cleaned_data.get('price'))
+
+
+class ChangedFormsOnlyMixin:
+    """変更のあったフォームのみを検証・保存の対象にするフォームセット用の Mixin"""
+
+    def _construct_form(self, i, **kwargs):
+        # 既存レコードのフォームも未変更であれば検証をスキップさせる
+        kwargs.setdefault('empty_permitted', True)
+        return super()._construct_form(i, **kwargs)
+
+
+class ChangedFormsOnlyModelFormSet(ChangedFormsOnlyMixin, BaseModelFormSet):
+    """変更のあったフォームのみを検証するモデル一覧画面用のフォームセット"""
+
+
+class PaginatedInlineFormSet(ChangedFormsOnlyMixin, BaseInlineFormSet):
+    """関連レコードを1ページ分だけ表示するインラインフォームセット"""
+
+    per_page = 20
+    page_number = 1
+    page_param = 'page'
+    query = None
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            queryset = super().get_queryset()
+            self.paginator = Paginator(queryset, self.per_page)
+            self.page = self.paginator.get_page(self.page_number)
+            self._queryset = self.page.object_list
+        return self._queryset
+
+    def _page_query(self, number):
+        query = self.query.copy() if self.query is not None else QueryDict(mutable=True)
+        query[self.page_param] = number
+        return query.urlencode()
+
+    @property
+    def previous_page_query(self):
+        """前ページに移動するためのクエリ文字列"""
+        if self.page.has_previous():
+            return self._page_query(self.page.previous_page_number())
+
+    @property
+    def next_page_query(self):
+        """次ページに移動するためのクエリ文字列"""
+        if self.page.has_next():
+            return self._page_query(self.page.next_page_number())
+
+
+class BookStockForm(forms.ModelForm):
+    # 表示時の在庫数を hidden で送信させる
+    quantity = forms.IntegerField(label='在庫数', min_value=0, show_hidden_initial=True)
+
+    def get_displayed_quantity(self):
+        """フォームの表示時の在庫数を返す"""
+        value = self.data.get(self.add_initial_prefix('quantity'))
+        try:
+            return self.fields['quantity'].to_python(value)
+        except forms.ValidationError:
+            return None
+
+
+class BookStockInlineFormSet(BaseInlineFormSet):
+    """在庫数を表示時からの差分として保存するインラインフォームセット"""
+
+    def save_existing(self, form, instance, commit=True):
+        if not commit:
+            return super().save_existing(form, instance, commit)
+        displayed = form.get_displayed_quantity()
+        if displayed is None:
+            displayed = form.initial['quantity']
+        stock.set_quantity(instance.book_id, form.cleaned_data['quantity'], displayed)
+        instance.refresh_from_db(fields=['quantity'])
+        return instance
+
+
+class BookImportForm(forms.Form):
+    """本のインポート用フォーム"""
+
+    file = forms.FileField(label='ファイル',
+                           help_text='CSV（ヘッダ行あり）または JSON Lines 形式')
+
+    def clean_file(self):
+        value = self.cleaned_data['file']
+        if not value.name.lower().endswith(('.csv', '.jsonl')):
+            raise forms.ValidationError("拡張子が .csv または .jsonl のファイルを指定してください。")
+        return value
+
+
+class BookAuthorsForm(forms.Form):
+    """著者の一括設定用フォーム"""
+
+    authors = forms.ModelMultipleChoiceField(
+        Author.objects.all(), label='著者', required=False,
+        widget=forms.SelectMultiple(attrs={'size': 10}))
+
+    def __init__(self, *args, admin_site=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if admin_site is not None:
+            # 著者は検索して選択する（選択済みの著者のみをHTMLに出力する）
+            field = self.fields['authors']
+            field.widget = AutocompleteSelectMultiple(
+                Book._meta.get_field('authors').remote_field, admin_site)
+            field.widget.choices = field.choices
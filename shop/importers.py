@@ -0,0 +1,297 @@
+import csv
+import io
+import json
+from datetime import date
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+from django.db.models import Max
+
+from . import counters
+from .date_hierarchy import invalidate_date_counts
+from .forms import validate_book_price, validate_book_title
+from .models import ArchivedBook, Author, Book, Publisher
+from .stock import invalidate_stock_level_counts
+
+# インポート対象のフィールド
+IMPORT_FIELDS = ('title', 'publisher', 'price', 'size', 'description', 'publish_date')
+# CSV の著者名の区切り文字
+AUTHORS_SEPARATOR = '|'
+# 文字列で指定する項目
+STRING_FIELDS = ('title', 'publisher', 'size', 'description', 'publish_date')
+
+
+def read_csv(f):
+    """CSV（ヘッダ行あり）を1行ずつ辞書として読み込む"""
+    for row in csv.DictReader(f):
+        if 'authors' in row:
+            authors = row['authors'] or ''
+            row['authors'] = [name for name in authors.split(AUTHORS_SEPARATOR) if name]
+        yield row
+
+
+def read_jsonl(f):
+    """JSON Lines を1行ずつ辞書として読み込む（読み込めない行は ValidationError を返す）"""
+    for line in f:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield ValidationError("JSON として読み込めません。")
+
+
+def _to_int(value):
+    """整数または整数の文字列を int に変換する（未指定は None）"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(value)
+    return int(value)
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+}
+
+
+class BookImporter:
+    """本のインポート処理
+
+    入力を chunk_size 件ずつ検証し、出版社・著者は名前と ID のマッピングで解決して、
+    bulk_create / bulk_update と中間テーブルへの一括 INSERT で書き込む。
+    """
+
+    chunk_size = 1000
+
+    def __init__(self, chunk_size=None):
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
+        self.publisher_ids = {}
+        self.author_ids = {}
+        self.created = 0
+        self.updated = 0
+        # (行番号, エラーメッセージ) のリスト
+        self.errors = []
+        self.using = router.db_for_write(Book)
+
+    def import_file(self, f, file_format):
+        """ファイルオブジェクト（テキストまたはバイナリ）からインポートする"""
+        if isinstance(f.read(0), bytes):
+            f = io.TextIOWrapper(f, encoding='utf-8-sig')
+        # CSV の行番号はヘッダ行を1行目として数える
+        start = 2 if file_format == 'csv' else 1
+        return self.import_rows(READERS[file_format](f), start=start)
+
+    def import_rows(self, rows, start=1):
+        """辞書のイテラブルからインポートする（start は最初の行の行番号）"""
+        numbered_rows = enumerate(rows, start=start)
+        while True:
+            chunk = list(islice(numbered_rows, self.chunk_size))
+            if not chunk:
+                break
+            self.import_chunk(chunk)
+        return self
+
+    def import_chunk(self, chunk):
+        start = len(self.errors)
+        books, authors = self.clean_chunk(chunk)
+        books, authors = self.exclude_archived(books, authors)
+        # チャンク内のエラーは行番号順に並べる
+        self.errors[start:] = sorted(self.errors[start:], key=lambda error: error[0])
+        if not books:
+            return
+        with transaction.atomic(using=self.using), counters.batch_refresh():
+            self.resolve_publishers(books)
+            self.resolve_authors(authors)
+            existing_ids = set(
+                Book.objects.using(self.using)
+                .filter(pk__in=[book.pk for book in books if book.pk is not None])
+                .values_list('pk', flat=True)
+            )
+            # 変更前後の出版社・著者の本の件数と最新の出版日を更新する
+            counters.track_books(existing_ids)
+            new_books = [book for book in books if book.pk not in existing_ids]
+            old_books = [book for book in books if book.pk in existing_ids]
+            self.create_books(new_books)
+            self.update_books(old_books)
+            self.set_authors(books, authors, existing_ids)
+            counters.track_books([book.pk for book in books])
+        invalidate_date_counts()
+        invalidate_stock_level_counts()
+        self.created += len(new_books)
+        self.updated += len(old_books)
+
+    def clean_chunk(self, chunk):
+        """チャンク内の各行を検証して Book オブジェクトと著者名のリストに変換する"""
+        books, authors = [], []
+        for line, row in chunk:
+            try:
+                book = self.clean_row(row)
+            except ValidationError as e:
+                self.errors.extend((line, message) for message in e.messages)
+                continue
+            book._line = line
+            books.append(book)
+            # 著者の項目がない行は、既存の本の著者を変更しない
+            authors.append((row['authors'] or []) if 'authors' in row else None)
+        return self.validate_books(books, authors)
+
+    def validate_books(self, books, authors):
+        """ID の重複と、既存の本は保存済みの値とあわせたタイトル・価格を検証する"""
+        stored = {
+            pk: (title, price) for pk, title, price in
+            Book.objects.using(self.using)
+            .filter(pk__in=[book.pk for book in books if book.pk is not None])
+            .values_list('pk', 'title', 'price')
+        }
+        lines = {}
+        rows = []
+        for book, names in zip(books, authors):
+            try:
+                if book.pk is not None:
+                    if book.pk in lines:
+                        raise ValidationError(
+                            "IDが {} 行目と重複しています。".format(lines[book.pk]))
+                    lines[book.pk] = book._line
+                stored_title, stored_price = stored.get(book.pk, (None, None))
+                title = book.title if 'title' in book._update_fields else stored_title
+                price = book.price if 'price' in book._update_fields else stored_price
+                if not title:
+                    raise ValidationError("タイトルは必須です。")
+                validate_book_price(title, price)
+            except ValidationError as e:
+                self.errors.extend((book._line, message) for message in e.messages)
+                continue
+            rows.append((book, names))
+        return [book for book, names in rows], [names for book, names in rows]
+
+    def exclude_archived(self, books, authors):
+        """アーカイブ済みの本と ID が重複する行をエラーにする（復元できなくなるため）"""
+        archived_ids = set(
+            ArchivedBook.objects.using(self.using)
+            .filter(pk__in=[book.pk for book in books if book.pk is not None])
+            .values_list('pk', flat=True)
+        )
+        if not archived_ids:
+            return books, authors
+        rows = []
+        for book, names in zip(books, authors):
+            if book.pk in archived_ids:
+                self.errors.append((book._line, "IDがアーカイブ済みの本と重複しています。"))
+            else:
+                rows.append((book, names))
+        return [book for book, names in rows], [names for book, names in rows]
+
+    def clean_row(self, row):
+        if isinstance(row, ValidationError):
+            raise row
+        if not isinstance(row, dict):
+            raise ValidationError("各行はオブジェクトで指定してください。")
+        for field in STRING_FIELDS:
+            if not isinstance(row.get(field), (str, type(None))):
+                raise ValidationError("{} は文字列で指定してください。".format(field))
+        names = row.get('authors')
+        if not isinstance(names, (list, type(None))) or \
+                not all(isinstance(name, str) for name in names or []):
+            raise ValidationError("authors は文字列のリストで指定してください。")
+        title = row.get('title') or ''
+        # タイトルが省略された既存の本は、保存済みのタイトルで検証する（validate_books）
+        if not title and ('title' in row or row.get('id') in (None, '')):
+            raise ValidationError("タイトルは必須です。")
+        if len(title) > Book._meta.get_field('title').max_length:
+            raise ValidationError("タイトルが長すぎます。")
+        validate_book_title(title)
+        try:
+            pk = _to_int(row.get('id'))
+            price = _to_int(row.get('price'))
+        except ValueError:
+            raise ValidationError("ID・価格は整数で指定してください。")
+        if price is not None and price < 0:
+            raise ValidationError("価格は0以上で指定してください。")
+        size = row.get('size') or None
+        if size is not None and size not in dict(Book.SIZE_CHOICES):
+            raise ValidationError("サイズが正しくありません。")
+        try:
+            publish_date = date.fromisoformat(row['publish_date']) \
+                if row.get('publish_date') else None
+        except ValueError:
+            raise ValidationError("出版日は YYYY-MM-DD 形式で指定してください。")
+        book = Book(
+            pk=pk,
+            title=title,
+            price=price,
+            size=size,
+            description=row.get('description') or None,
+            publish_date=publish_date,
+        )
+        # 出版社名は ID が解決されるまで一時的に保持しておく
+        book._publisher_name = row.get('publisher') or None
+        # 既存の本は行に含まれる項目のみを更新する
+        book._update_fields = tuple(field for field in IMPORT_FIELDS if field in row)
+        return book
+
+    def resolve_publishers(self, books):
+        """出版社名を ID に解決する（存在しない出版社はまとめて作成する）"""
+        names = {book._publisher_name for book in books if book._publisher_name}
+        self._resolve_names(Publisher, names, self.publisher_ids)
+        for book in books:
+            book.publisher_id = self.publisher_ids.get(book._publisher_name)
+
+    def resolve_authors(self, authors):
+        """著者名を ID に解決する（存在しない著者はまとめて作成する）"""
+        names = {name for names in authors for name in names or []}
+        self._resolve_names(Author, names, self.author_ids)
+
+    def _resolve_names(self, model, names, ids):
+        missing_names = names - ids.keys()
+        if not missing_names:
+            return
+        manager = model.objects.using(self.using)
+        self._load_ids(manager.filter(name__in=missing_names), ids)
+        missing_names -= ids.keys()
+        if missing_names:
+            manager.bulk_create([model(name=name) for name in missing_names])
+            self._load_ids(manager.filter(name__in=missing_names), ids)
+
+    def _load_ids(self, queryset, ids):
+        # 同名のレコードが複数ある場合は ID が最も小さいものを使う
+        for pk, name in queryset.order_by('pk').values_list('pk', 'name'):
+            ids.setdefault(name, pk)
+
+    def create_books(self, books):
+        connection = connections[self.using]
+        if not connection.features.can_return_ids_from_bulk_insert:
+            # bulk_create で ID が返却されないバックエンドでは、中間テーブルへの
+            # INSERT のために ID を事前に採番しておく（アーカイブ済みの本の ID は使わない）
+            max_ids = [
+                model.objects.using(self.using).aggregate(max_id=Max('pk'))['max_id'] or 0
+                for model in (Book, ArchivedBook)
+            ]
+            next_id = max(max_ids + [book.pk for book in books if book.pk]) + 1
+            for book in books:
+                if book.pk is None:
+                    book.pk = next_id
+                    next_id += 1
+        Book.objects.using(self.using).bulk_create(books)
+
+    def update_books(self, books):
+        """行に含まれる項目ごとにまとめて更新する"""
+        groups = {}
+        for book in books:
+            groups.setdefault(book._update_fields, []).append(book)
+        for fields, objs in groups.items():
+            if fields:
+                Book.objects.using(self.using).bulk_update(objs, fields)
+
+    def set_authors(self, books, authors, existing_ids):
+        through = Book.authors.through
+        rows = [(book, names) for book, names in zip(books, authors) if names is not None]
+        through.objects.using(self.using).filter(
+            book_id__in=[book.pk for book, names in rows if book.pk in existing_ids]).delete()
+        through.objects.using(self.using).bulk_create([
+            through(book_id=book.pk, author_id=author_id)
+            for book, names in rows
+            for author_id in dict.fromkeys(self.author_ids[name] for name in names)
+        ])
@@ -0,0 +1,35 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from time import time
+
+from shop.archive import ARCHIVE_CHUNK_SIZE, archive_published_before
+
+
+class Command(BaseCommand):
+    """古い本のアーカイブ
+
+    出版日が指定日より前の本を、著者・在庫数とともにアーカイブのテーブルに移動する。
+    移動した本は管理サイトの「本（アーカイブ）」から参照・復元できる。
+    """
+
+    help = "Move books published before the given date into the archive table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('before', help="Cutoff publish date (YYYY-MM-DD).")
+        parser.add_argument(
+            '--chunk-size', type=int, default=ARCHIVE_CHUNK_SIZE,
+            help="Number of books moved in one transaction.")
+
+    def handle(self, *args, **options):
+        _start = time()
+
+        try:
+            cutoff = date.fromisoformat(options['before'])
+        except ValueError:
+            raise CommandError(f'Invalid date: {options["before"]}')
+
+        count = archive_published_before(cutoff, options['chunk_size'])
+
+        self.stdout.write(
+            f'{count} books published before {cutoff} archived in {time() - _start:.1f} secs.')
@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from shop.models import Book, BookStock
+from shop.stock import InsufficientStock, decrement
+
+
+class Command(BaseCommand):
+    """在庫数の同時更新のベンチマーク
+
+    ベンチマーク用の本を作成し、複数のスレッドから同時に在庫数を減らして、
+    処理件数と更新が失われていないこと（在庫数が負にならないこと）を確認する。
+    """
+
+    help = "Benchmark concurrent stock decrements on a temporary book."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help="Number of concurrent threads (default: 8).")
+        parser.add_argument(
+            '--orders', type=int, default=1000,
+            help="Number of decrements per thread (default: 1000).")
+        parser.add_argument(
+            '--quantity', type=int, default=None,
+            help="Initial quantity (default: threads * orders, i.e. no shortage).")
+
+    def handle(self, *args, **options):
+        threads, orders = options['threads'], options['orders']
+        quantity = options['quantity']
+        if quantity is None:
+            quantity = threads * orders
+        book = Book.objects.create(title='Stock benchmark')
+        BookStock.objects.create(book=book, quantity=quantity)
+
+        def order(count):
+            succeeded = 0
+            try:
+                for _ in range(count):
+                    try:
+                        decrement(book.pk)
+                        succeeded += 1
+                    except InsufficientStock:
+                        pass
+            finally:
+                connection.close()
+            return succeeded
+
+        _start = time()
+        try:
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                succeeded = sum(executor.map(order, [orders] * threads))
+            elapsed = time() - _start
+            remaining = BookStock.objects.get(book=book).quantity
+        finally:
+            book.delete()
+
+        if remaining != quantity - succeeded or remaining < 0:
+            raise CommandError(
+                f'Lost updates: {quantity} - {succeeded} != {remaining}')
+        print(f'{succeeded} of {threads * orders} decrements '
+              f'({threads * orders / elapsed:.0f} ops/sec) in {elapsed:.1f} secs.')
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from time import time
+
+from shop.models import Book
+from shop.thumbnails import generate_thumbnails_parallel
+
+
+class Command(BaseCommand):
+    """本の画像のサムネイル一括作成
+
+    既存の画像や、管理サイト以外で登録された画像のサムネイルを作成する。
+    """
+
+    help = "Generate thumbnails for all existing book images in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help="Number of worker processes (default: number of CPUs).")
+
+    def handle(self, *args, **options):
+        _start = time()
+
+        names = (
+            Book.objects.exclude(image='').exclude(image__isnull=True)
+            .values_list('image', flat=True).distinct().iterator()
+        )
+        count = 0
+        for name, digest, error in generate_thumbnails_parallel(names, options['workers']):
+            if error:
+                self.stderr.write(f'{name}: {error}')
+            else:
+                # 一覧画面でサムネイルを参照できるように、画像のハッシュ値を記録する
+                Book.objects.filter(image=name).exclude(image_digest=digest) \
+                    .update(image_digest=digest)
+                count += 1
+
+        print(f'Thumbnails for {count} images generated in {time() - _start:.1f} secs.')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from time import time
+
+from shop.counters import refresh_authors, refresh_publishers
+
+
+class Command(BaseCommand):
+    """出版社・著者の本の件数と最新の出版日の再集計
+
+    シグナルを送らない方法（queryset.update() や SQL など）で本を更新した場合に実行する。
+    """
+
+    help = "Recompute book counts and latest publish dates of all publishers and authors."
+
+    def handle(self, *args, **options):
+        _start = time()
+
+        refresh_publishers()
+        refresh_authors()
+
+        print(f'Book counters reconciled in {time() - _start:.1f} secs.')
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.28 on 2026-10-19 17:45
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def reconcile_book_counters(apps, schema_editor):
+    """既存の出版社・著者の本の件数と最新の出版日を集計する"""
+    Book = apps.get_model('shop', 'Book')
+    for model_name, related_field in (('Publisher', 'publisher'), ('Author', 'authors')):
+        books = Book.objects.filter(**{related_field: OuterRef('pk')}) \
+            .order_by().values(related_field)
+        apps.get_model('shop', model_name).objects.update(
+            book_count=Coalesce(
+                Subquery(books.annotate(count=Count('pk')).values('count'),
+                         output_field=models.IntegerField()), 0),
+            latest_publish_date=Subquery(
+                books.annotate(latest=Max('publish_date')).values('latest')),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0002_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='book_count',
+            field=models.IntegerField(db_index=True, default=0, editable=False, verbose_name='本の件数'),
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='latest_publish_date',
+            field=models.DateField(blank=True, db_index=True, editable=False, null=True, verbose_name='最新の出版日'),
+        ),
+        migrations.AddField(
+            model_name='publisher',
+            name='book_count',
+            field=models.IntegerField(db_index=True, default=0, editable=False, verbose_name='本の件数'),
+        ),
+        migrations.AddField(
+            model_name='publisher',
+            name='latest_publish_date',
+            field=models.DateField(blank=True, db_index=True, editable=False, null=True, verbose_name='最新の出版日'),
+        ),
+        migrations.RunPython(reconcile_book_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-19 17:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0003_book_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bookstock',
+            name='quantity',
+            field=models.IntegerField(db_index=True, default=0, verbose_name='在庫数'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.28 on 2026-10-19 17:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('shop', '0004_stock_quantity_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBook',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255, verbose_name='タイトル')),
+                ('image', models.ImageField(blank=True, max_length=255, null=True, upload_to='', verbose_name='画像')),
+                ('price', models.PositiveIntegerField(blank=True, null=True, verbose_name='価格')),
+                ('size', models.CharField(blank=True, choices=[('a4', 'A4 - 210 x 297 mm'), ('b5', 'B5 - 182 x 257 mm')], max_length=2, null=True, verbose_name='サイズ')),
+                ('description', models.TextField(blank=True, null=True, verbose_name='概要')),
+                ('publish_date', models.DateField(blank=True, db_index=True, null=True, verbose_name='出版日')),
+                ('created_at', models.DateTimeField(verbose_name='登録日時')),
+                ('quantity', models.IntegerField(blank=True, null=True, verbose_name='在庫数')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='アーカイブ日時')),
+                ('authors', models.ManyToManyField(blank=True, related_name='archived_books', to='shop.Author', verbose_name='著者')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='登録ユーザー')),
+                ('publisher', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='shop.Publisher', verbose_name='出版社')),
+            ],
+            options={
+                'verbose_name': '本（アーカイブ）',
+                'verbose_name_plural': '本（アーカイブ）',
+                'db_table': 'archived_book',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-19 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0005_archived_book'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedbook',
+            name='image_digest',
+            field=models.CharField(blank=True, max_length=32, verbose_name='画像のハッシュ値'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='image_digest',
+            field=models.CharField(blank=True, editable=False, max_length=32, verbose_name='画像のハッシュ値'),
+        ),
+    ]
@@ -68,7 +68,7 @@ class Publisher(models.Model):
         ('沖縄県', '沖縄県'),
     )
 
-    name = models.CharField('出版社名', max_length=255)
+    name = models.CharField('出版社名', max_length=255, db_index=True)
     postal_code = models.CharField('郵便番号', max_length=8, null=True, blank=True,
                                    validators=[postal_code_validator])
     prefecture = models.CharField('都道府県', max_length=255,
@@ -80,6 +80,10 @@ class Publisher(models.Model):
     phone_number = models.CharField('電話番号', max_length=15,
                                     null=True, blank=True,
                                     validators=[phone_number_validator])
+    # 本の件数と最新の出版日（shop.counters で更新する）
+    book_count = models.IntegerField('本の件数', default=0, db_index=True, editable=False)
+    latest_publish_date = models.DateField('最新の出版日', null=True, blank=True,
+                                           db_index=True, editable=False)
 
     def __str__(self):
         return self.name
@@ -92,7 +96,11 @@ class Author(models.Model):
         db_table = 'author'
         verbose_name = verbose_name_plural = '著者'
 
-    name = models.CharField('著者名', max_length=255)
+    name = models.CharField('著者名', max_length=255, db_index=True)
+    # 本の件数と最新の出版日（shop.counters で更新する）
+    book_count = models.IntegerField('本の件数', default=0, db_index=True, editable=False)
+    latest_publish_date = models.DateField('最新の出版日', null=True, blank=True,
+                                           db_index=True, editable=False)
 
     def __str__(self):
         return self.name
@@ -114,6 +122,9 @@ class Book(models.Model):
 
     title = models.CharField('タイトル', max_length=255)
     image = models.ImageField('画像', max_length=255, null=True, blank=True)
+    # 画像の内容のハッシュ値（サムネイルの作成時に shop.thumbnails でセットする）
+    image_digest = models.CharField('画像のハッシュ値', max_length=32, blank=True,
+                                    editable=False)
     publisher = models.ForeignKey(Publisher, verbose_name='出版社',
                                   on_delete=models.PROTECT, null=True, blank=True)
     authors = models.ManyToManyField(Author, verbose_name='著者', blank=True)
@@ -159,7 +170,39 @@ class BookStock(models.Model):
         verbose_name = verbose_name_plural = '在庫'
 
     book = models.OneToOneField(Book, verbose_name='本', on_delete=models.CASCADE)
-    quantity = models.IntegerField('在庫数', default=0)
+    quantity = models.IntegerField('在庫数', default=0, db_index=True)
 
     def __str__(self):
         return self.book.title
+
+
+class ArchivedBook(models.Model):
+    """アーカイブ済みの本モデル（shop.archive で本から移動する）"""
+
+    class Meta:
+        db_table = 'archived_book'
+        verbose_name = verbose_name_plural = '本（アーカイブ）'
+
+    # 復元時に同じIDで戻せるように、元の本のIDをそのまま使う
+    id = models.IntegerField('ID', primary_key=True)
+    title = models.CharField('タイトル', max_length=255)
+    image = models.ImageField('画像', max_length=255, null=True, blank=True)
+    image_digest = models.CharField('画像のハッシュ値', max_length=32, blank=True)
+    publisher = models.ForeignKey(Publisher, verbose_name='出版社',
+                                  on_delete=models.PROTECT, null=True, blank=True)
+    authors = models.ManyToManyField(Author, verbose_name='著者', blank=True,
+                                     related_name='archived_books')
+    price = models.PositiveIntegerField('価格', null=True, blank=True)
+    size = models.CharField('サイズ', max_length=2, choices=Book.SIZE_CHOICES,
+                            null=True, blank=True)
+    description = models.TextField('概要', null=True, blank=True)
+    publish_date = models.DateField('出版日', null=True, blank=True, db_index=True)
+    created_by = models.ForeignKey(User, verbose_name='登録ユーザー',
+                                   on_delete=models.SET_NULL, related_name='+',
+                                   null=True, blank=True)
+    created_at = models.DateTimeField('登録日時')
+    quantity = models.IntegerField('在庫数', null=True, blank=True)
+    archived_at = models.DateTimeField('アーカイブ日時', auto_now_add=True)
+
+    def __str__(self):
+        return self.title
@@ -0,0 +1,84 @@
+import re
+from datetime import date
+
+from django.db.models import Q
+from django.utils.text import smart_split, unescape_string_literal
+
+from .models import Book
+
+# 価格の範囲（「1000-2000」「>=1000」「<2000」など）
+PRICE_RANGE_PATTERN = re.compile(r'^(\d+)-(\d+)$')
+PRICE_COMPARISON_PATTERN = re.compile(r'^(>=|<=|>|<)(\d+)$')
+PRICE_LOOKUPS = {'>=': 'gte', '<=': 'lte', '>': 'gt', '<': 'lt'}
+# 日付（「2020-01-01」「2020/1/1」「2020-01」など）
+DATE_PATTERN = re.compile(r'^(\d{4})[-/](\d{1,2})(?:[-/](\d{1,2}))?$')
+# 価格の列に格納できる値の上限（超える場合は価格の条件にしない）
+PRICE_MAX = 2 ** 31 - 1
+
+
+def split_terms(search_term):
+    """検索キーワードを空白で分割する（引用符で囲まれた部分は分割しない）"""
+    terms = []
+    for term in smart_split(search_term):
+        if term.startswith(('"', "'")) and term[0] == term[-1]:
+            term = unescape_string_literal(term)
+        if term:
+            terms.append(term)
+    return terms
+
+
+def author_query(name):
+    """著者名で絞り込む条件（中間テーブルのサブクエリで絞り込むので重複しない）"""
+    through = Book.authors.through
+    return Q(pk__in=through.objects.filter(author__name__icontains=name).values('book_id'))
+
+
+def text_query(term):
+    """テキストの列（タイトル・出版社名・著者名）を対象にする条件"""
+    return Q(title__icontains=term) | Q(publisher__name__icontains=term) | author_query(term)
+
+
+def parse_term(term):
+    """検索キーワードの種類に応じた条件を求める
+
+    ・「publisher:」「author:」で始まる場合は出版社名・著者名
+    ・日付（「2020-01-01」「2020-01」など）の場合は出版日
+    ・数字のみの場合は価格（またはテキストの列）
+    ・価格の範囲（「1000-2000」「>=1000」など）の場合は価格
+    ・価格の列に格納できない大きな数値はテキストの列
+    ・それ以外はテキストの列
+    """
+    prefix, _, value = term.partition(':')
+    if value and prefix == 'publisher':
+        return Q(publisher__name__icontains=value)
+    if value and prefix == 'author':
+        return author_query(value)
+    match = DATE_PATTERN.match(term)
+    if match:
+        # 「2020-01」は価格の範囲ではなく年月として扱う
+        year, month, day = match.groups()
+        try:
+            if day is not None:
+                return Q(publish_date=date(int(year), int(month), int(day)))
+            date(int(year), int(month), 1)
+        except ValueError:
+            return text_query(term)
+        return Q(publish_date__year=int(year), publish_date__month=int(month))
+    if term.isdigit():
+        if int(term) > PRICE_MAX:
+            return text_query(term)
+        return Q(price=int(term)) | text_query(term)
+    match = PRICE_RANGE_PATTERN.match(term)
+    if match and max(int(match.group(1)), int(match.group(2))) <= PRICE_MAX:
+        return Q(price__gte=int(match.group(1)), price__lte=int(match.group(2)))
+    match = PRICE_COMPARISON_PATTERN.match(term)
+    if match and int(match.group(2)) <= PRICE_MAX:
+        return Q(**{'price__' + PRICE_LOOKUPS[match.group(1)]: int(match.group(2))})
+    return text_query(term)
+
+
+def search_books(queryset, search_term):
+    """本を検索キーワードで絞り込む（キーワードごとの条件を AND で結合する）"""
+    for term in split_terms(search_term):
+        queryset = queryset.filter(parse_term(term))
+    return queryset
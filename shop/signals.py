@@ -0,0 +1,80 @@
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save,
+)
+
+from . import counters
+from .date_hierarchy import invalidate_date_counts
+from .models import Book, BookStock, PublishedBook, UnpublishedBook
+from .stock import invalidate_stock_level_counts
+
+# シグナルはプロキシモデルを sender として送られるので、プロキシモデルも対象にする
+BOOK_MODELS = (Book, PublishedBook, UnpublishedBook)
+
+
+def invalidate_book_caches(sender, **kwargs):
+    """本の登録・更新・削除時にキャッシュを無効にする"""
+    invalidate_date_counts()
+    invalidate_stock_level_counts()
+
+
+def invalidate_stock_caches(sender, **kwargs):
+    """在庫の登録・更新時にキャッシュを無効にする（queryset.update() では送られない）"""
+    invalidate_stock_level_counts()
+
+
+def remember_book_relations(sender, instance, **kwargs):
+    """本の更新前の出版社と出版日を保持しておく"""
+    instance._counter_original = None
+    if instance.pk is not None:
+        instance._counter_original = Book._base_manager.filter(pk=instance.pk) \
+            .values_list('publisher_id', 'publish_date').first()
+
+
+def refresh_book_counters(sender, instance, created, **kwargs):
+    """本の登録・更新時に出版社・著者の本の件数と最新の出版日を更新する"""
+    publisher_ids, author_ids = {instance.publisher_id}, ()
+    original = getattr(instance, '_counter_original', None)
+    if original is not None:
+        original_publisher_id, original_publish_date = original
+        publisher_ids.add(original_publisher_id)
+        if original_publish_date != instance.publish_date:
+            author_ids = instance.authors.values_list('pk', flat=True)
+    counters.schedule(publisher_ids, author_ids)
+
+
+def remember_book_authors(sender, instance, **kwargs):
+    """本の削除前に著者を保持しておく（中間テーブルのレコードは先に削除されるため）"""
+    batch = counters.current_batch()
+    if batch is not None and instance.pk in batch.book_ids:
+        return
+    instance._counter_author_ids = list(instance.authors.values_list('pk', flat=True))
+
+
+def refresh_deleted_book_counters(sender, instance, **kwargs):
+    """本の削除時に出版社・著者の本の件数と最新の出版日を更新する"""
+    counters.schedule({instance.publisher_id}, getattr(instance, '_counter_author_ids', ()))
+
+
+def refresh_author_counters(sender, instance, action, reverse, pk_set, **kwargs):
+    """本の著者の変更時に著者の本の件数と最新の出版日を更新する"""
+    if action == 'pre_clear' and not reverse:
+        instance._counter_author_ids = list(instance.authors.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if reverse:
+            author_ids = [instance.pk]
+        elif action == 'post_clear':
+            author_ids = getattr(instance, '_counter_author_ids', ())
+        else:
+            author_ids = pk_set
+        counters.schedule(author_ids=author_ids)
+
+
+for model in BOOK_MODELS:
+    post_save.connect(invalidate_book_caches, sender=model)
+    post_delete.connect(invalidate_book_caches, sender=model)
+    pre_save.connect(remember_book_relations, sender=model)
+    post_save.connect(refresh_book_counters, sender=model)
+    pre_delete.connect(remember_book_authors, sender=model)
+    post_delete.connect(refresh_deleted_book_counters, sender=model)
+m2m_changed.connect(refresh_author_counters, sender=Book.authors.through)
+post_save.connect(invalidate_stock_caches, sender=BookStock)
@@ -0,0 +1,229 @@
+import hashlib
+import threading
+from collections import Counter
+from functools import reduce
+from operator import or_
+from time import monotonic
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from django.db.models.functions import Greatest
+
+from .models import BookStock
+
+# 一度に更新する本の件数（SQLite の変数の上限に収まるようにする）
+ADJUST_CHUNK_SIZE = 200
+# 在庫僅少とする在庫数の上限（この値未満）
+LOW_STOCK_THRESHOLD = 5
+# 在庫状況ごとの件数をキャッシュする秒数
+STOCK_LEVEL_COUNTS_TIMEOUT = 60
+STOCK_LEVEL_COUNTS_KEY = 'shop:stock_level_counts'
+
+# 在庫状況（在庫あり・在庫僅少・在庫切れ）
+STOCK_IN, STOCK_LOW, STOCK_OUT = 'in', 'low', 'out'
+STOCK_LEVELS = (STOCK_IN, STOCK_LOW, STOCK_OUT)
+
+
+class InsufficientStock(Exception):
+    """在庫数が足りない場合の例外"""
+
+    def __init__(self, book_ids):
+        self.book_ids = sorted(book_ids)
+        super().__init__('在庫数が足りません。（本のID: {}）'.format(
+            ', '.join(map(str, self.book_ids))))
+
+
+def _ensure_stocks(book_ids):
+    """在庫のレコードが存在しない本に在庫数0のレコードを登録する"""
+    BookStock.objects.bulk_create(
+        [BookStock(book_id=book_id, quantity=0) for book_id in book_ids],
+        ignore_conflicts=True,
+    )
+
+
+def adjust(book_id, delta):
+    """本の在庫数を delta だけ増減する
+
+    在庫数が負にならない場合のみ更新する条件付きの UPDATE 1回で更新するので、
+    同時に注文があっても更新が失われたり行ロックを長く保持したりしない。
+    """
+    if not delta:
+        # 在庫のレコードがない本も在庫数0として扱う
+        return
+    if delta > 0:
+        _ensure_stocks([book_id])
+    updated = BookStock.objects \
+        .filter(book_id=book_id, quantity__gte=-min(delta, 0)) \
+        .update(quantity=F('quantity') + delta)
+    if not updated:
+        raise InsufficientStock([book_id])
+
+
+def increment(book_id, amount=1):
+    """本の在庫数を増やす"""
+    adjust(book_id, amount)
+
+
+def decrement(book_id, amount=1):
+    """本の在庫数を減らす（在庫数が足りない場合は InsufficientStock を送出する）"""
+    adjust(book_id, -amount)
+
+
+def adjust_many(deltas, chunk_size=None):
+    """複数の本の在庫数を {本のID: 増減数} のとおりにまとめて増減する
+
+    CASE 式を使った条件付きの UPDATE で一度に更新する。
+    いずれかの本の在庫数が足りない場合は全ての更新を取り消して InsufficientStock を送出する。
+    """
+    chunk_size = chunk_size or ADJUST_CHUNK_SIZE
+    deltas = {book_id: delta for book_id, delta in deltas.items() if delta}
+    book_ids = sorted(deltas)
+    shortage = None
+    with transaction.atomic():
+        _ensure_stocks(book_ids)
+        for i in range(0, len(book_ids), chunk_size):
+            chunk = book_ids[i:i + chunk_size]
+            updated = BookStock.objects.filter(reduce(or_, [
+                Q(book_id=book_id, quantity__gte=-min(deltas[book_id], 0))
+                for book_id in chunk
+            ])).update(quantity=Case(
+                *[When(book_id=book_id, then=F('quantity') + deltas[book_id])
+                  for book_id in chunk],
+                default=F('quantity'),
+            ))
+            if updated != len(chunk):
+                shortage = [book_id for book_id in chunk if deltas[book_id] < 0]
+                transaction.set_rollback(True)
+                break
+    if shortage is None:
+        invalidate_stock_level_counts()
+        return
+    # 取り消した後の在庫数で、足りなかった本を求める（在庫のレコードがない本は在庫数0とする）
+    sufficient = BookStock.objects.filter(reduce(or_, [
+        Q(book_id=book_id, quantity__gte=-deltas[book_id]) for book_id in shortage
+    ])).values_list('book_id', flat=True)
+    raise InsufficientStock(set(shortage).difference(sufficient))
+
+
+def set_quantity(book_id, quantity, initial):
+    """管理サイトで変更された在庫数を、表示時からの差分として反映する
+
+    表示から保存までの間の注文による増減を上書きしないようにする（在庫数は0未満にしない）。
+    """
+    BookStock.objects.filter(book_id=book_id) \
+        .update(quantity=Greatest(F('quantity') + (quantity - initial), 0))
+    invalidate_stock_level_counts()
+
+
+class StockBuffer:
+    """在庫数の増減をメモリ上で集約してまとめて反映するバッファ
+
+    注文が集中する本の増減を max_delay 秒ごと、または max_items 件ごとに
+    adjust_many() でまとめて反映する。経過時間は追加時のほか、リクエストの終了時
+    （request_finished シグナル）にも確認する。反映前にプロセスが終了した増減は失われる。
+    """
+
+    def __init__(self, max_delay=1.0, max_items=1000):
+        self.max_delay = max_delay
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._deltas = Counter()
+        self._count = 0
+        self._started = None
+        # バッファが不要になったら接続も解除されるように弱参照で接続する
+        request_finished.connect(self.flush_if_due)
+
+    def _is_due(self):
+        return self._started is not None and (
+            self._count >= self.max_items or monotonic() - self._started >= self.max_delay)
+
+    def add(self, book_id, delta):
+        """増減をバッファに追加する（反映のタイミングになった場合は反映する）"""
+        with self._lock:
+            if self._started is None:
+                self._started = monotonic()
+            self._deltas[book_id] += delta
+            self._count += 1
+            due = self._is_due()
+        if due:
+            return self.flush()
+        return {}
+
+    def flush_if_due(self, **kwargs):
+        """反映のタイミングになっていれば反映して、反映できなかった増減を返す"""
+        with self._lock:
+            due = self._is_due()
+        if due:
+            return self.flush()
+        return {}
+
+    def flush(self):
+        """バッファの増減を反映して、在庫数が足りずに反映できなかった増減を返す"""
+        with self._lock:
+            deltas, self._deltas = self._deltas, Counter()
+            self._count, self._started = 0, None
+        try:
+            adjust_many(deltas)
+        except InsufficientStock:
+            # まとめて反映できない場合は本ごとに反映する
+            rejected = {}
+            for book_id, delta in deltas.items():
+                try:
+                    adjust(book_id, delta)
+                except InsufficientStock:
+                    rejected[book_id] = delta
+            return rejected
+        return {}
+
+
+def _stocked_book_ids(level):
+    """在庫あり・在庫僅少の本のIDのサブクエリ（stock.quantity のインデックスで範囲検索する）"""
+    threshold = LOW_STOCK_THRESHOLD
+    if level == STOCK_IN:
+        stocks = BookStock.objects.filter(quantity__gte=threshold)
+    else:
+        stocks = BookStock.objects.filter(quantity__gt=0, quantity__lt=threshold)
+    return stocks.values('book_id')
+
+
+def filter_stock_level(queryset, level):
+    """本を在庫状況で絞り込む（在庫のレコードがない本は在庫切れとする）"""
+    if level == STOCK_OUT:
+        return queryset.exclude(pk__in=BookStock.objects.filter(quantity__gt=0).values('book_id'))
+    return queryset.filter(pk__in=_stocked_book_ids(level))
+
+
+def get_stock_level_counts(queryset):
+    """本の在庫状況ごとの件数を {在庫状況: 件数} で求める
+
+    結果は絞り込み条件（クエリ）ごとにキャッシュし、本・在庫の登録・削除時や一括の増減時に
+    invalidate_stock_level_counts() で無効にする。1件ずつの注文による増減では無効にしないので、
+    最大 STOCK_LEVEL_COUNTS_TIMEOUT 秒遅れて反映される。
+    """
+    try:
+        sql = str(queryset.order_by().query)
+    except EmptyResultSet:
+        return dict.fromkeys(STOCK_LEVELS, 0)
+    generation = cache.get_or_set(STOCK_LEVEL_COUNTS_KEY, 0, None)
+    key = '{}:{}:{}'.format(
+        STOCK_LEVEL_COUNTS_KEY, generation, hashlib.md5(sql.encode('utf-8')).hexdigest())
+    counts = cache.get(key)
+    if counts is None:
+        counts = {
+            level: queryset.order_by().filter(pk__in=_stocked_book_ids(level)).count()
+            for level in (STOCK_IN, STOCK_LOW)
+        }
+        counts[STOCK_OUT] = queryset.order_by().count() - counts[STOCK_IN] - counts[STOCK_LOW]
+        cache.set(key, counts, STOCK_LEVEL_COUNTS_TIMEOUT)
+    return counts
+
+
+def invalidate_stock_level_counts():
+    """在庫状況ごとの件数のキャッシュを無効にする"""
+    try:
+        cache.incr(STOCK_LEVEL_COUNTS_KEY)
+    except ValueError:
+        pass
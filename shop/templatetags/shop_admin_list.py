@@ -0,0 +1,107 @@
+import datetime
+
+from django import template
+from django.contrib.admin.templatetags.base import InclusionAdminNode
+from django.utils import formats
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+from ..date_hierarchy import get_date_counts, rollup
+
+register = template.Library()
+
+
+def cached_date_hierarchy(cl):
+    """日付ごとの件数のキャッシュから日付階層を表示する
+
+    django.contrib.admin の date_hierarchy と同じ内容を、年・月・日ごとの件数付きで表示する。
+    """
+    field_name = cl.date_hierarchy
+    year_field = '%s__year' % field_name
+    month_field = '%s__month' % field_name
+    day_field = '%s__day' % field_name
+    field_generic = '%s__' % field_name
+    year_lookup = cl.params.get(year_field)
+    month_lookup = cl.params.get(month_field)
+    day_lookup = cl.params.get(day_field)
+    counts = get_date_counts(cl.queryset, field_name)
+
+    def link(filters):
+        return cl.get_query_string(filters, [field_generic])
+
+    def title(text, count):
+        return '{} ({})'.format(text, count)
+
+    if not (year_lookup or month_lookup or day_lookup) and counts:
+        # 開始する階層を選択
+        first, last = min(counts), max(counts)
+        if first.year == last.year:
+            year_lookup = first.year
+            if first.month == last.month:
+                month_lookup = first.month
+
+    if year_lookup and month_lookup and day_lookup:
+        day = datetime.date(int(year_lookup), int(month_lookup), int(day_lookup))
+        return {
+            'show': True,
+            'back': {
+                'link': link({year_field: year_lookup, month_field: month_lookup}),
+                'title': capfirst(formats.date_format(day, 'YEAR_MONTH_FORMAT'))
+            },
+            'choices': [{
+                'title': title(capfirst(formats.date_format(day, 'MONTH_DAY_FORMAT')),
+                               counts.get(day, 0)),
+            }]
+        }
+    elif year_lookup and month_lookup:
+        days = sorted(
+            (day, count) for day, count in counts.items()
+            if day.year == int(year_lookup) and day.month == int(month_lookup)
+        )
+        return {
+            'show': True,
+            'back': {
+                'link': link({year_field: year_lookup}),
+                'title': str(year_lookup)
+            },
+            'choices': [{
+                'link': link({year_field: year_lookup, month_field: month_lookup,
+                              day_field: day.day}),
+                'title': title(capfirst(formats.date_format(day, 'MONTH_DAY_FORMAT')), count)
+            } for day, count in days]
+        }
+    elif year_lookup:
+        months = [
+            (month, count) for month, count in rollup(counts, 'month')
+            if month.year == int(year_lookup)
+        ]
+        return {
+            'show': True,
+            'back': {
+                'link': link({}),
+                'title': _('All dates')
+            },
+            'choices': [{
+                'link': link({year_field: year_lookup, month_field: month.month}),
+                'title': title(capfirst(formats.date_format(month, 'YEAR_MONTH_FORMAT')), count)
+            } for month, count in months]
+        }
+    else:
+        return {
+            'show': True,
+            'back': None,
+            'choices': [{
+                'link': link({year_field: str(year.year)}),
+                'title': title(str(year.year), count),
+            } for year, count in rollup(counts, 'year')]
+        }
+
+
+@register.tag(name='cached_date_hierarchy')
+def cached_date_hierarchy_tag(parser, token):
+    return InclusionAdminNode(
+        parser, token,
+        func=cached_date_hierarchy,
+        template_name='date_hierarchy.html',
+        takes_context=False,
+    )
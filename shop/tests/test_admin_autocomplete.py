@@ -0,0 +1,86 @@
+from django.contrib.admin import site
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..admin import AuthorAdmin, get_prefix_upper_bound
+from ..models import Author, Book, Publisher
+
+User = get_user_model()
+
+
+class TestAdminAutocomplete(TestCase):
+    """管理サイトの出版社・著者のオートコンプリートのユニットテスト（システム管理者の場合）"""
+
+    PASSWORD = 'pass12345'
+
+    def setUp(self):
+        cache.clear()
+        # テストユーザー（システム管理者）を作成
+        self.user = User.objects.create_superuser(
+            'admin', 'admin@example.com', self.PASSWORD)
+        # テストデータを作成
+        for name in ('山田太郎', '山本花子', '田中一郎'):
+            Author.objects.create(name=name)
+        self.publisher = Publisher.objects.create(name='自費出版社')
+        Publisher.objects.create(name='技術評論社')
+        self.client.login(username=self.user.username, password=self.PASSWORD)
+
+    def search(self, url_name, term):
+        response = self.client.get(reverse(url_name), {'term': term})
+        self.assertEqual(response.status_code, 200)
+        return [result['text'] for result in response.json()['results']]
+
+    def test_prefix_search(self):
+        """名前の前方一致で検索されること"""
+
+        self.assertEqual(self.search('admin:shop_author_autocomplete', '山'),
+                         ['山本花子', '山田太郎'])
+        self.assertEqual(self.search('admin:shop_author_autocomplete', '郎'), [])
+        self.assertEqual(self.search('admin:shop_publisher_autocomplete', '技術'),
+                         ['技術評論社'])
+        # BMP 外の文字で始まる名前も前方一致で検索されること
+        Author.objects.create(name='川\U0001F600')
+        Author.objects.create(name='\U0010ffff著者')
+        self.assertEqual(self.search('admin:shop_author_autocomplete', '川'),
+                         ['川\U0001F600'])
+        self.assertEqual(self.search('admin:shop_author_autocomplete', '\U0010ffff'),
+                         ['\U0010ffff著者'])
+
+    def test_prefix_upper_bound(self):
+        """前方一致の範囲検索の上限"""
+
+        self.assertEqual(get_prefix_upper_bound('山'), '屲')
+        self.assertEqual(get_prefix_upper_bound('ab\U0010ffff'), 'ac')
+        self.assertEqual(get_prefix_upper_bound('a\ud7ff'), 'a\ue000')
+        self.assertIsNone(get_prefix_upper_bound(''))
+        self.assertIsNone(get_prefix_upper_bound('\U0010ffff'))
+
+    def test_cache(self):
+        """検索結果がキャッシュされ、管理サイトで追加すると無効になること"""
+
+        self.assertEqual(self.search('admin:shop_author_autocomplete', '田'), ['田中一郎'])
+        Author.objects.create(name='田村次郎')
+        self.assertEqual(self.search('admin:shop_author_autocomplete', '田'), ['田中一郎'])
+
+        response = self.client.post(reverse('admin:shop_author_add'), {'name': '田辺三郎'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.search('admin:shop_author_autocomplete', '田'),
+                         ['田中一郎', '田村次郎', '田辺三郎'])
+
+        # キャッシュのキーには検索キーワードをそのまま使わないこと（memcached で使えない文字を含むため）
+        key = AuthorAdmin(Author, site)._autocomplete_cache_key('田 中\n' * 100, '1')
+        self.assertRegex(key, r'^autocomplete:shop\.author:\d+:[0-9a-f]{32}$')
+
+    def test_book_change_page(self):
+        """本の変更画面に選択済みの出版社・著者のみが出力されること"""
+
+        book = Book.objects.create(title='Book 1', publisher=self.publisher)
+        book.authors.add(Author.objects.get(name='山田太郎'))
+        response = self.client.get(reverse('admin:shop_book_change', args=[book.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '自費出版社')
+        self.assertContains(response, '山田太郎')
+        self.assertNotContains(response, '技術評論社')
+        self.assertNotContains(response, '田中一郎')
@@ -3,6 +3,7 @@ import io
 from datetime import date, datetime
 from unittest.mock import patch
 
+import lxml.html
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Permission
 from django.test import TestCase
@@ -92,7 +93,7 @@ class TestAdminBookChangeList(TestCase):
         # 絞り込み（フィルタ）が表示されていることを確認
         self.assertEqual(
             page.filter_headers,
-            ['サイズ で絞り込む', '価格 で絞り込む']
+            ['サイズ で絞り込む', '価格 で絞り込む', '在庫状況 で絞り込む']
         )
         self.assertEqual(
             page.filter_choices_texts[0],
@@ -102,6 +103,10 @@ class TestAdminBookChangeList(TestCase):
             page.filter_choices_texts[1],
             ['全て', '1,000円未満', '1,000円以上 2,000円未満', '2,000円以上']
         )
+        self.assertEqual(
+            page.filter_choices_texts[2],
+            ['全て', '在庫あり (0)', '在庫僅少（5冊未満） (0)', '在庫切れ (0)']
+        )
         # 追加ボタンが表示されていることを確認
         self.assertIsNotNone(page.add_button)
 
@@ -156,25 +161,25 @@ class TestAdminBookChangeList(TestCase):
         self.assertEqual(
             page.action_list_texts,
             ['---------', '選択された 本 の削除', 'CSVダウンロード',
-             '出版日を今日に更新']
+             '出版日を今日に更新', '著者を一括設定']
         )
         # 検索結果テーブル
         self.assertEqual(
             page.result_list_header_texts,
-            ['ID', 'タイトル', '価格', 'サイズ', '出版日']
+            ['ID', 'タイトル', '価格', 'サイズ', '出版日', '在庫数']
         )
         self.assertEqual(len(page.result_list_rows_texts), 3)
         self.assertEqual(
             page.result_list_rows_texts[0],
-            ['Django Book 1', '1,000 円', 'A4 - 210 x 297 mm', '2020年1月1日']
+            ['Django Book 1', '1,000 円', 'A4 - 210 x 297 mm', '2020年1月1日', '-']
         )
         self.assertEqual(
             page.result_list_rows_texts[1],
-            ['Django Book 2', '2,000 円', 'B5 - 182 x 257 mm', '2020年2月1日']
+            ['Django Book 2', '2,000 円', 'B5 - 182 x 257 mm', '2020年2月1日', '-']
         )
         self.assertEqual(
             page.result_list_rows_texts[2],
-            ['Book 3', '-', '-', '-']
+            ['Book 3', '-', '-', '-', '-']
         )
         # 合計件数
         self.assertEqual(page.result_count_text, '全 3 件')
@@ -431,6 +436,79 @@ class TestAdminBookChangeList(TestCase):
         book = Book.objects.get(pk=self.book.pk)
         self.assertEqual(book.publish_date, date(2020, 10, 1))
 
+    def test_action_set_authors(self):
+        """モデル一覧画面で「著者を一括設定」アクションを実行"""
+
+        # テストデータを作成
+        self.create_books()
+        author2 = Author.objects.create(name='akiyoko2')
+        # 管理サイトにログイン
+        self.admin_login()
+        # アクション一覧の「著者を一括設定」を実行するためのリクエストを実行
+        response = self.client.post(
+            self.TARGET_URL,
+            {
+                'action': 'set_authors',
+                '_selected_action': [self.book.pk, self.book2.pk],
+            },
+        )
+        # レスポンスを検証
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'admin/shop/book/set_authors.html')
+
+        # 著者を選択して確定するためのリクエストを実行
+        response = self.client.post(
+            self.TARGET_URL,
+            {
+                'action': 'set_authors',
+                '_selected_action': [self.book.pk, self.book2.pk],
+                'post': 'yes',
+                'authors': [author2.pk],
+            },
+            follow=True,
+        )
+        # レスポンスを検証
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'admin/change_list.html')
+        # レコードが更新されていることを確認
+        self.assertEqual(list(self.book.authors.all()), [author2])
+        self.assertEqual(list(self.book2.authors.all()), [author2])
+        self.assertEqual(list(self.book3.authors.all()), [])
+
+    def test_action_set_authors_select_across(self):
+        """モデル一覧画面で全件を選択して「著者を一括設定」アクションを実行"""
+
+        # テストデータを作成
+        self.create_books()
+        author2 = Author.objects.create(name='akiyoko2')
+        # 管理サイトにログイン
+        self.admin_login()
+        # 「全件を選択」して「著者を一括設定」を実行するためのリクエストを実行
+        response = self.client.post(
+            self.TARGET_URL,
+            {
+                'action': 'set_authors',
+                'select_across': '1',
+                'index': '0',
+                '_selected_action': [self.book.pk],
+            },
+        )
+        self.assertTemplateUsed(response, 'admin/shop/book/set_authors.html')
+
+        # 確認画面のフォームの hidden 項目をそのまま送信
+        form = lxml.html.fromstring(response.content).xpath('//form')[0]
+        data = {}
+        for element in form.xpath('.//input[@type="hidden"]'):
+            data.setdefault(element.name, []).append(element.value)
+        data['authors'] = [author2.pk]
+        response = self.client.post(self.TARGET_URL, data, follow=True)
+        # レスポンスを検証
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'admin/change_list.html')
+        # 全件の著者が更新されていることを確認
+        for book in self.books:
+            self.assertEqual(list(book.authors.all()), [author2])
+
     def test_action_download_as_csv(self):
         """モデル一覧画面で「CSVダウンロード」アクションを実行"""
 
@@ -0,0 +1,68 @@
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Book
+
+User = get_user_model()
+
+
+class TestAdminBookDateHierarchy(TestCase):
+    """管理サイトの Book モデル一覧画面の日付階層のユニットテスト（システム管理者の場合）"""
+
+    TARGET_URL = reverse('admin:shop_book_changelist')
+    PASSWORD = 'pass12345'
+
+    def setUp(self):
+        cache.clear()
+        # テストユーザー（システム管理者）を作成
+        self.user = User.objects.create_superuser(
+            'admin', 'admin@example.com', self.PASSWORD)
+        # テストデータを作成
+        for publish_date in (date(2019, 12, 1), date(2020, 1, 1), date(2020, 1, 1),
+                             date(2020, 2, 3), None):
+            Book.objects.create(title='Book', publish_date=publish_date)
+        self.client.login(username=self.user.username, password=self.PASSWORD)
+
+    def test_drilldown(self):
+        """年・月・日ごとの件数が表示されること"""
+
+        response = self.client.get(self.TARGET_URL)
+        self.assertContains(response, '2019 (1)')
+        self.assertContains(response, '2020 (3)')
+
+        response = self.client.get(self.TARGET_URL, {'publish_date__year': 2020})
+        self.assertContains(response, '2020年1月 (2)')
+        self.assertContains(response, '2020年2月 (1)')
+        self.assertNotContains(response, '2019年12月')
+
+        response = self.client.get(
+            self.TARGET_URL, {'publish_date__year': 2020, 'publish_date__month': 1})
+        self.assertContains(response, '1月1日 (2)')
+
+        # 絞り込み条件が反映されることを確認
+        response = self.client.get(self.TARGET_URL, {'q': 'Nothing'})
+        self.assertNotContains(response, '2020 (3)')
+
+    def test_cache(self):
+        """件数がキャッシュされ、本の登録時に無効になること"""
+
+        self.client.get(self.TARGET_URL)
+        # シグナルを送らずに登録した場合はキャッシュされた件数のままであることを確認
+        Book.objects.bulk_create([Book(title='Book', publish_date=date(2020, 1, 1))])
+        response = self.client.get(self.TARGET_URL)
+        self.assertContains(response, '2020 (3)')
+
+        Book.objects.create(title='Book', publish_date=date(2020, 1, 1))
+        response = self.client.get(self.TARGET_URL)
+        self.assertContains(response, '2020 (5)')
+
+    def test_proxy_models(self):
+        """発売中・未発売の本の一覧画面にも日付階層が表示されること"""
+
+        response = self.client.get(reverse('admin:shop_publishedbook_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '2019 (1)')
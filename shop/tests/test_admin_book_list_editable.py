@@ -0,0 +1,106 @@
+from datetime import date
+from unittest.mock import patch
+
+from django import forms
+from django.contrib.admin.models import CHANGE, LogEntry
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from ..admin import BookAdmin
+from ..models import Book
+
+User = get_user_model()
+
+
+@patch.object(BookAdmin, 'list_editable', ('price', 'publish_date'))
+class TestAdminBookListEditable(TestCase):
+    """管理サイトの Book モデル一覧画面の一括編集のユニットテスト（システム管理者の場合）"""
+
+    TARGET_URL = reverse('admin:shop_book_changelist')
+    PASSWORD = 'pass12345'
+
+    def setUp(self):
+        # テストユーザー（システム管理者）を作成
+        self.user = User.objects.create_superuser(
+            'admin', 'admin@example.com', self.PASSWORD)
+        # テストデータを作成
+        self.books = [
+            Book.objects.create(title='Book {}'.format(i + 1), price=1000,
+                                publish_date=date(2020, 1, 1))
+            for i in range(3)
+        ]
+        self.client.login(username=self.user.username, password=self.PASSWORD)
+
+    def post_data(self, **changes):
+        """一覧画面に表示されたフォームをそのまま送信するためのデータ"""
+        books = Book.objects.order_by('-id')
+        data = {
+            'form-TOTAL_FORMS': len(books),
+            'form-INITIAL_FORMS': len(books),
+            'form-MIN_NUM_FORMS': 0,
+            'form-MAX_NUM_FORMS': 1000,
+            '_save': '保存',
+        }
+        for i, book in enumerate(books):
+            data['form-{}-id'.format(i)] = book.pk
+            data['form-{}-price'.format(i)] = book.price
+            data['form-{}-publish_date'.format(i)] = book.publish_date.isoformat()
+        data.update(changes)
+        return data
+
+    def test_bulk_save(self):
+        """変更した行のみが save() を呼ばずにまとめて保存されること"""
+
+        data = self.post_data(**{
+            'form-0-price': '2000',
+            'form-1-publish_date': '2020-02-01',
+        })
+        with patch.object(Book, 'save', side_effect=AssertionError):
+            response = self.client.post(self.TARGET_URL, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(Book.objects.order_by('id').values_list('price', 'publish_date')),
+            [(1000, date(2020, 1, 1)), (1000, date(2020, 2, 1)), (2000, date(2020, 1, 1))]
+        )
+        # 変更履歴が変更した行の分だけ登録されていることを確認
+        self.assertEqual(
+            sorted(LogEntry.objects.filter(action_flag=CHANGE)
+                   .values_list('object_repr', flat=True)),
+            ['Book 2', 'Book 3']
+        )
+
+    def test_non_model_field(self):
+        """フォームのモデル以外のフィールドが変更されても、モデルのフィールドのみ保存されること"""
+
+        class ChangeListForm(forms.ModelForm):
+            note = forms.CharField(required=False)
+
+            class Meta:
+                model = Book
+                fields = ('price', 'publish_date')
+
+        data = self.post_data(**{
+            'form-0-price': '2000',
+            'form-0-note': 'メモ',
+            'form-1-note': 'メモ',
+        })
+        with patch.object(BookAdmin, 'get_changelist_form', return_value=ChangeListForm):
+            response = self.client.post(self.TARGET_URL, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(Book.objects.order_by('id').values_list('price', flat=True)),
+            [1000, 1000, 2000]
+        )
+
+    def test_invalid(self):
+        """入力エラーがあれば何も保存されないこと"""
+
+        data = self.post_data(**{
+            'form-0-price': '2000',
+            'form-1-price': 'abc',
+        })
+        response = self.client.post(self.TARGET_URL, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Book.objects.exclude(price=1000).exists())
+        self.assertFalse(LogEntry.objects.exists())
@@ -0,0 +1,97 @@
+from unittest.mock import patch
+
+from django.contrib.admin.models import DELETION, LogEntry
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Author, Book, BookStock, Publisher
+
+User = get_user_model()
+
+
+class TestAdminDelete(TestCase):
+    """管理サイトの本・出版社の削除のユニットテスト（システム管理者の場合）"""
+
+    PASSWORD = 'pass12345'
+
+    def setUp(self):
+        # テストユーザー（システム管理者）を作成
+        self.user = User.objects.create_superuser(
+            'admin', 'admin@example.com', self.PASSWORD)
+        # テストデータを作成
+        self.publisher = Publisher.objects.create(name='自費出版社')
+        self.author = Author.objects.create(name='akiyoko')
+        self.books = [
+            Book.objects.create(title='Book {}'.format(i + 1), publisher=self.publisher)
+            for i in range(5)
+        ]
+        for book in self.books:
+            book.authors.add(self.author)
+            BookStock.objects.create(book=book, quantity=1)
+        self.client.login(username=self.user.username, password=self.PASSWORD)
+
+    def delete_selected(self, **data):
+        return self.client.post(reverse('admin:shop_book_changelist'), {
+            'action': 'delete_selected',
+            '_selected_action': [book.pk for book in self.books],
+            **data,
+        })
+
+    def test_confirmation_summary(self):
+        """削除確認画面に件数と一部のレコードのみが表示されること"""
+
+        with patch('shop.deletion.SAMPLE_SIZE', 2):
+            response = self.delete_selected()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(dict(response.context_data['model_count']), {'本': 5, '在庫': 5})
+        self.assertEqual(response.context_data['deletable_objects'],
+                         [['Book 1', 'Book 2', '他 3 件']])
+        self.assertFalse(response.context_data['protected'])
+
+    def test_delete_selected(self):
+        """選択した本が関連するレコードとともに削除され、変更履歴が登録されること"""
+
+        with patch('shop.deletion.DELETE_CHUNK_SIZE', 2):
+            response = self.delete_selected(post='yes')
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Book.objects.exists())
+        self.assertFalse(BookStock.objects.exists())
+        self.assertFalse(Book.authors.through.objects.exists())
+        self.assertEqual(
+            sorted(LogEntry.objects.filter(action_flag=DELETION)
+                   .values_list('object_repr', flat=True)),
+            ['Book {}'.format(i + 1) for i in range(5)]
+        )
+
+    def test_delete_selected_partially_failed(self):
+        """途中のチャンクで失敗した場合、削除済みの本の変更履歴のみが登録されていること"""
+
+        with patch('shop.deletion.DELETE_CHUNK_SIZE', 2), \
+                patch('shop.counters.track_books', side_effect=[None, RuntimeError]):
+            with self.assertRaises(RuntimeError):
+                self.delete_selected(post='yes')
+        self.assertEqual(list(Book.objects.order_by('id').values_list('title', flat=True)),
+                         ['Book 3', 'Book 4', 'Book 5'])
+        self.assertEqual(
+            sorted(LogEntry.objects.filter(action_flag=DELETION)
+                   .values_list('object_repr', flat=True)),
+            ['Book 1', 'Book 2']
+        )
+
+    def test_protected(self):
+        """本を持つ出版社は削除できず、本の一部と件数が表示されること"""
+
+        with patch('shop.deletion.SAMPLE_SIZE', 2):
+            response = self.client.get(
+                reverse('admin:shop_publisher_delete', args=[self.publisher.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context_data['protected'],
+                         ['Book 1', 'Book 2', '他 3 件の本'])
+
+        # 本がなくなれば削除できることを確認
+        Book.objects.all().delete()
+        response = self.client.post(
+            reverse('admin:shop_publisher_delete', args=[self.publisher.pk]), {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Publisher.objects.exists())
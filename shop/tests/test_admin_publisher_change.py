@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Book, Publisher
+
+User = get_user_model()
+
+
+class TestAdminPublisherChange(TestCase):
+    """管理サイトの Publisher モデル変更画面のユニットテスト（システム管理者の場合）"""
+
+    PASSWORD = 'pass12345'
+
+    def setUp(self):
+        # テストユーザー（システム管理者）を作成
+        self.user = User.objects.create_superuser(
+            'admin', 'admin@example.com', self.PASSWORD)
+        # テストデータを作成
+        self.publisher = Publisher.objects.create(name='自費出版社')
+        self.books = [
+            Book.objects.create(title='Book {}'.format(i + 1), price=1000,
+                                publisher=self.publisher)
+            for i in range(45)
+        ]
+        self.target_url = reverse('admin:shop_publisher_change',
+                                  args=[self.publisher.pk])
+
+    def admin_login(self):
+        """管理サイトにログインする"""
+        self.client.login(username=self.user.username, password=self.PASSWORD)
+
+    def post_data(self, formset, **changes):
+        """画面に表示されたインラインのフォームをそのまま送信するためのデータ"""
+        data = {
+            'name': self.publisher.name,
+            'book_set-TOTAL_FORMS': formset.total_form_count(),
+            'book_set-INITIAL_FORMS': formset.initial_form_count(),
+            'book_set-MIN_NUM_FORMS': 0,
+            'book_set-MAX_NUM_FORMS': 1000,
+        }
+        for i, form in enumerate(formset.initial_forms):
+            prefix = 'book_set-{}-'.format(i)
+            data[prefix + 'id'] = form.instance.pk
+            data[prefix + 'publisher'] = self.publisher.pk
+            data[prefix + 'title'] = form.instance.title
+            data[prefix + 'price'] = form.instance.price
+        data.update(changes)
+        return data
+
+    def test_inline_is_paginated(self):
+        """インラインに1ページ分の本のみが表示されること"""
+
+        # 管理サイトにログイン
+        self.admin_login()
+        # モデル変更画面に遷移するためのリクエストを実行
+        response = self.client.get(self.target_url)
+        # レスポンスを検証
+        self.assertEqual(response.status_code, 200)
+        formset = response.context_data['inline_admin_formsets'][0].formset
+        self.assertEqual(formset.initial_form_count(), 20)
+        self.assertEqual(formset.paginator.count, 45)
+
+        # 最終ページに遷移するためのリクエストを実行
+        response = self.client.get(self.target_url + '?book_page=3')
+        # レスポンスを検証
+        self.assertEqual(response.status_code, 200)
+        formset = response.context_data['inline_admin_formsets'][0].formset
+        self.assertEqual(
+            [form.instance.pk for form in formset.initial_forms],
+            [book.pk for book in self.books[40:]]
+        )
+
+    def test_save_changed_rows_only(self):
+        """表示中のページで変更した本のみが保存されること"""
+
+        # 管理サイトにログイン
+        self.admin_login()
+        # 2ページ目を表示
+        response = self.client.get(self.target_url + '?book_page=2')
+        formset = response.context_data['inline_admin_formsets'][0].formset
+        # 2ページ目の先頭の本のタイトルを変更して保存するためのリクエストを実行
+        response = self.client.post(
+            self.target_url + '?book_page=2',
+            self.post_data(formset, **{'book_set-0-title': 'Changed'}),
+        )
+        # レスポンスを検証
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Book.objects.get(pk=self.books[20].pk).title, 'Changed')
+        self.assertEqual(Book.objects.filter(publisher=self.publisher).count(), 45)
@@ -0,0 +1,136 @@
+import io
+import json
+from datetime import date, datetime
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..archive import archive_published_before, restore_books
+from ..importers import BookImporter
+from ..models import ArchivedBook, Author, Book, BookStock, Publisher
+
+User = get_user_model()
+
+
+class TestBookArchive(TestCase):
+    """本のアーカイブ・復元のユニットテスト"""
+
+    def setUp(self):
+        # テストデータを作成
+        self.publisher = Publisher.objects.create(name='自費出版社')
+        self.author = Author.objects.create(name='akiyoko')
+        self.created_at = datetime(2000, 1, 1, tzinfo=timezone.utc)
+        self.books = []
+        for i, publish_date in enumerate([date(1990, 1, 1), date(1999, 1, 1), date(2020, 1, 1)]):
+            book = Book.objects.create(
+                title='Book {}'.format(i + 1), publisher=self.publisher,
+                price=1000, publish_date=publish_date)
+            book.authors.add(self.author)
+            self.books.append(book)
+        Book.objects.update(created_at=self.created_at)
+        BookStock.objects.create(book=self.books[0], quantity=3)
+
+    def test_archive_and_restore(self):
+        """出版日が指定日より前の本を移動して、同じIDで戻せること"""
+
+        # 1. アーカイブに移動
+        with patch('shop.archive.ARCHIVE_CHUNK_SIZE', 1):
+            self.assertEqual(archive_published_before(date(2000, 1, 1)), 2)
+        self.assertEqual(list(Book.objects.values_list('title', flat=True)), ['Book 3'])
+        archived_book = ArchivedBook.objects.get(pk=self.books[0].pk)
+        self.assertEqual(archived_book.title, 'Book 1')
+        self.assertEqual(archived_book.publisher, self.publisher)
+        self.assertEqual(archived_book.quantity, 3)
+        self.assertEqual(list(archived_book.authors.all()), [self.author])
+        self.assertFalse(BookStock.objects.exists())
+        # 出版社・著者の本の件数からは除かれる
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.book_count, 1)
+
+        # 2. 本に戻す
+        self.assertEqual(restore_books(ArchivedBook.objects.all()), (2, []))
+        self.assertFalse(ArchivedBook.objects.exists())
+        book = Book.objects.get(pk=self.books[0].pk)
+        self.assertEqual(book.publish_date, date(1990, 1, 1))
+        self.assertEqual(book.created_at, self.created_at)
+        self.assertEqual(list(book.authors.all()), [self.author])
+        self.assertEqual(book.bookstock.quantity, 3)
+        self.assertFalse(BookStock.objects.filter(book=self.books[1]).exists())
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.book_count, 3)
+
+    def test_import_does_not_reuse_archived_ids(self):
+        """インポートでアーカイブ済みの本のIDが使われず、IDの重複は戻さずに返されること"""
+
+        # 1. 全ての本をアーカイブに移動してからインポート
+        archive_published_before(date(2030, 1, 1))
+        rows = [{'title': 'New Book'}, {'id': self.books[0].pk, 'title': 'Old Book'}]
+        f = io.StringIO(''.join(json.dumps(row) + '\n' for row in rows))
+        importer = BookImporter().import_file(f, 'jsonl')
+        self.assertEqual(importer.created, 1)
+        self.assertEqual(importer.errors, [(2, 'IDがアーカイブ済みの本と重複しています。')])
+        self.assertGreater(Book.objects.get().pk, self.books[2].pk)
+
+        # 2. 同じIDの本が存在する場合は、その本だけアーカイブに残る
+        Book.objects.create(pk=self.books[1].pk, title='Other Book')
+        self.assertEqual(restore_books(ArchivedBook.objects.all()), (2, [self.books[1].pk]))
+        self.assertEqual(
+            list(ArchivedBook.objects.values_list('title', flat=True)), ['Book 2'])
+        self.assertEqual(Book.objects.get(pk=self.books[1].pk).title, 'Other Book')
+
+    def test_command(self):
+        """コマンドで本をアーカイブに移動できること"""
+
+        stdout = io.StringIO()
+        call_command('archive_books', '1999-01-01', stdout=stdout)
+        self.assertEqual(list(ArchivedBook.objects.values_list('title', flat=True)), ['Book 1'])
+        self.assertTrue(stdout.getvalue().startswith('1 books published before 1999-01-01 archived'))
+
+
+class TestAdminArchivedBook(TestCase):
+    """管理サイトのアーカイブ済みの本のユニットテスト（システム管理者の場合）"""
+
+    PASSWORD = 'pass12345'
+
+    def setUp(self):
+        # テストユーザー（システム管理者）を作成
+        self.user = User.objects.create_superuser(
+            'admin', 'admin@example.com', self.PASSWORD)
+        self.book = Book.objects.create(title='Django Book', publish_date=date(1990, 1, 1))
+        archive_published_before(date(2000, 1, 1))
+        self.client.login(username=self.user.username, password=self.PASSWORD)
+
+    def test_changelist_and_restore(self):
+        """一覧画面に表示され、アクションで本に戻せること"""
+
+        url = reverse('admin:shop_archivedbook_changelist')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Django Book')
+        self.assertNotContains(response, reverse('admin:shop_archivedbook_add'))
+
+        response = self.client.post(url, {
+            'action': 'restore',
+            '_selected_action': [self.book.pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(ArchivedBook.objects.exists())
+        self.assertTrue(Book.objects.filter(pk=self.book.pk).exists())
+
+    def test_restore_conflict(self):
+        """同じIDの本が存在する場合、エラーにならずにメッセージが表示されること"""
+
+        Book.objects.create(pk=self.book.pk, title='Other Book')
+        url = reverse('admin:shop_archivedbook_changelist')
+        response = self.client.post(url, {
+            'action': 'restore',
+            '_selected_action': [self.book.pk],
+        }, follow=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(
+            response, '同じIDの本が存在するため 1 件を戻せませんでした。（ID: {}）'.format(self.book.pk))
+        self.assertTrue(ArchivedBook.objects.filter(pk=self.book.pk).exists())
@@ -0,0 +1,153 @@
+import io
+from datetime import date
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..bulk import bulk_set_authors
+from ..deletion import delete_in_chunks
+from ..importers import BookImporter
+from ..models import Author, Book, Publisher
+
+User = get_user_model()
+
+
+class TestBookCounters(TestCase):
+    """出版社・著者の本の件数と最新の出版日の更新のユニットテスト"""
+
+    def setUp(self):
+        # テストデータを作成
+        self.publisher1 = Publisher.objects.create(name='自費出版社')
+        self.publisher2 = Publisher.objects.create(name='技術評論社')
+        self.author1 = Author.objects.create(name='akiyoko')
+        self.author2 = Author.objects.create(name='akiyoko2')
+
+    def assertCounters(self, obj, book_count, latest_publish_date):
+        obj.refresh_from_db()
+        self.assertEqual(obj.book_count, book_count)
+        self.assertEqual(obj.latest_publish_date, latest_publish_date)
+
+    def test_save_and_delete(self):
+        """本の登録・更新・削除で出版社・著者の件数が更新されること"""
+
+        # 1. 本を登録
+        book = Book.objects.create(
+            title='Django Book', publisher=self.publisher1, publish_date=date(2020, 1, 1))
+        book.authors.add(self.author1)
+        self.assertCounters(self.publisher1, 1, date(2020, 1, 1))
+        self.assertCounters(self.author1, 1, date(2020, 1, 1))
+
+        # 2. 出版社と出版日を変更
+        book.publisher = self.publisher2
+        book.publish_date = date(2021, 1, 1)
+        book.save()
+        self.assertCounters(self.publisher1, 0, None)
+        self.assertCounters(self.publisher2, 1, date(2021, 1, 1))
+        self.assertCounters(self.author1, 1, date(2021, 1, 1))
+
+        # 3. 著者を変更
+        book.authors.set([self.author2])
+        self.assertCounters(self.author1, 0, None)
+        self.assertCounters(self.author2, 1, date(2021, 1, 1))
+        self.author2.book_set.clear()
+        self.assertCounters(self.author2, 0, None)
+        book.authors.add(self.author1, self.author2)
+        book.authors.clear()
+        self.assertCounters(self.author1, 0, None)
+        self.assertCounters(self.author2, 0, None)
+
+        # 4. 本を削除
+        book.authors.add(self.author1)
+        book.delete()
+        self.assertCounters(self.publisher2, 0, None)
+        self.assertCounters(self.author1, 0, None)
+
+    def test_bulk_operations(self):
+        """一括の登録・著者の設定・削除で出版社・著者の件数が更新されること"""
+
+        # 1. 本をインポート
+        BookImporter().import_file(io.StringIO(
+            'id,title,publisher,authors,price,size,description,publish_date\n'
+            ',Django Book 1,自費出版社,akiyoko,1000,,,2020-01-01\n'
+            ',Django Book 2,自費出版社,akiyoko|akiyoko2,1000,,,2020-02-01\n'
+        ), 'csv')
+        self.assertCounters(self.publisher1, 2, date(2020, 2, 1))
+        self.assertCounters(self.author1, 2, date(2020, 2, 1))
+        self.assertCounters(self.author2, 1, date(2020, 2, 1))
+
+        # 2. 著者を一括で設定
+        bulk_set_authors(Book.objects.all(), [self.author2])
+        self.assertCounters(self.author1, 0, None)
+        self.assertCounters(self.author2, 2, date(2020, 2, 1))
+
+        # 3. 本を一括で削除
+        delete_in_chunks(Book.objects.filter(title='Django Book 2'), chunk_size=1)
+        self.assertCounters(self.publisher1, 1, date(2020, 1, 1))
+        self.assertCounters(self.author2, 1, date(2020, 1, 1))
+
+    def test_reconcile_command(self):
+        """シグナルを送らない更新の後に、コマンドで再集計できること"""
+
+        Book.objects.create(title='Django Book', publisher=self.publisher1)
+        Publisher.objects.update(book_count=0)
+        with patch('sys.stdout', new_callable=io.StringIO):
+            call_command('reconcile_book_counters')
+        self.assertCounters(self.publisher1, 1, None)
+        self.assertCounters(self.publisher2, 0, None)
+
+
+class TestAdminBookCounters(TestCase):
+    """管理サイトの出版社・著者の本の件数のユニットテスト"""
+
+    PASSWORD = 'pass12345'
+
+    def setUp(self):
+        # テストユーザー（システム管理者）を作成
+        self.user = User.objects.create_superuser(
+            'admin', 'admin@example.com', self.PASSWORD)
+        self.publisher = Publisher.objects.create(name='自費出版社')
+        self.author = Author.objects.create(name='akiyoko')
+        self.books = [
+            Book.objects.create(title='Book {}'.format(i + 1), publisher=self.publisher)
+            for i in range(2)
+        ]
+        for book in self.books:
+            book.authors.add(self.author)
+        self.client.login(username=self.user.username, password=self.PASSWORD)
+
+    def test_publish_today(self):
+        """出版日を今日に更新するアクションで最新の出版日が更新されること"""
+
+        response = self.client.post(reverse('admin:shop_book_changelist'), {
+            'action': 'publish_today',
+            '_selected_action': [book.pk for book in self.books],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.publisher.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(self.publisher.latest_publish_date, date.today())
+        self.assertEqual(self.author.latest_publish_date, date.today())
+
+    def test_publish_today_unpublished(self):
+        """本（未発売）の一覧画面のアクションでも最新の出版日が更新されること"""
+
+        response = self.client.post(reverse('admin:shop_unpublishedbook_changelist'), {
+            'action': 'publish_today',
+            '_selected_action': [book.pk for book in self.books],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Book.objects.filter(publish_date=date.today()).count(), 2)
+        self.publisher.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(self.publisher.latest_publish_date, date.today())
+        self.assertEqual(self.author.latest_publish_date, date.today())
+
+    def test_changelist(self):
+        """著者の一覧画面に本の件数が表示されること"""
+
+        response = self.client.get(reverse('admin:shop_author_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '<td class="field-book_count">2</td>', html=True)
@@ -0,0 +1,186 @@
+import io
+import json
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+
+from ..importers import BookImporter
+from ..models import Author, Book, Publisher
+
+User = get_user_model()
+
+
+class TestBookImporter(TestCase):
+    """本のインポート処理のユニットテスト"""
+
+    CSV = (
+        'id,title,publisher,authors,price,size,description,publish_date\n'
+        ',Django Book 1,自費出版社,akiyoko|akiyoko2,1000,a4,,2020-01-01\n'
+        ',Java Book,自費出版社,,1000,,,\n'
+        ',薄い本,,,3001,,,\n'
+        ',Django Book 2,自費出版社,akiyoko,abc,,,\n'
+        ',Django Book 3,,akiyoko,,b5,,\n'
+    )
+
+    def test_import_csv(self):
+        """CSVファイルのインポート"""
+
+        importer = BookImporter(chunk_size=2).import_file(io.StringIO(self.CSV), 'csv')
+        # 登録件数とエラー内容を検証
+        self.assertEqual(importer.created, 2)
+        self.assertEqual(importer.updated, 0)
+        self.assertEqual(
+            importer.errors,
+            [(3, 'タイトルには「Java」を含めないでください。'),
+             (4, '薄い本は3,000円を超えてはいけません。'),
+             (5, 'ID・価格は整数で指定してください。')]
+        )
+        # レコードが登録されていることを確認
+        book = Book.objects.get(title='Django Book 1')
+        self.assertEqual(book.publisher.name, '自費出版社')
+        self.assertEqual(book.price, 1000)
+        self.assertEqual(book.publish_date, date(2020, 1, 1))
+        self.assertEqual(
+            sorted(book.authors.values_list('name', flat=True)),
+            ['akiyoko', 'akiyoko2']
+        )
+        book3 = Book.objects.get(title='Django Book 3')
+        self.assertEqual(list(book3.authors.values_list('name', flat=True)), ['akiyoko'])
+        self.assertEqual(Publisher.objects.count(), 1)
+        self.assertEqual(Author.objects.count(), 2)
+
+    def test_import_jsonl_updates_existing_books(self):
+        """JSON Lines ファイルのインポート（既存レコードの更新）"""
+
+        book = Book.objects.create(title='Book 1')
+        book.authors.set([Author.objects.create(name='akiyoko')])
+        rows = [
+            {'id': book.pk, 'title': 'Book 1 改訂版', 'authors': ['akiyoko2']},
+            {'title': 'Book 2', 'price': 500},
+        ]
+        f = io.StringIO(''.join(json.dumps(row) + '\n' for row in rows))
+        importer = BookImporter().import_file(f, 'jsonl')
+        # 登録・更新件数を検証
+        self.assertEqual(importer.created, 1)
+        self.assertEqual(importer.updated, 1)
+        self.assertEqual(importer.errors, [])
+        # レコードが更新されていることを確認
+        book.refresh_from_db()
+        self.assertEqual(book.title, 'Book 1 改訂版')
+        self.assertEqual(list(book.authors.values_list('name', flat=True)), ['akiyoko2'])
+        self.assertEqual(Book.objects.get(title='Book 2').price, 500)
+
+    def test_import_jsonl_partial_rows(self):
+        """JSON Lines ファイルのインポート（項目が省略された行・不正な行）"""
+
+        book = Book.objects.create(title='Book 1', price=1000, description='説明')
+        book.authors.set([Author.objects.create(name='akiyoko')])
+        lines = [
+            json.dumps({'id': book.pk, 'title': 'Book 1 改訂版', 'price': 1200}),
+            '{"title": ',
+            json.dumps(['Book 2']),
+            json.dumps({'title': 2}),
+            json.dumps({'title': 'Book 3', 'authors': 'akiyoko'}),
+            json.dumps({'title': 'Book 4', 'price': 1.5}),
+        ]
+        f = io.StringIO(''.join(line + '\n' for line in lines))
+        importer = BookImporter().import_file(f, 'jsonl')
+        # 更新件数とエラー内容を検証
+        self.assertEqual(importer.created, 0)
+        self.assertEqual(importer.updated, 1)
+        self.assertEqual(
+            importer.errors,
+            [(2, 'JSON として読み込めません。'),
+             (3, '各行はオブジェクトで指定してください。'),
+             (4, 'title は文字列で指定してください。'),
+             (5, 'authors は文字列のリストで指定してください。'),
+             (6, 'ID・価格は整数で指定してください。')]
+        )
+        # 行に含まれない項目・著者は変更されないことを確認
+        book.refresh_from_db()
+        self.assertEqual(book.title, 'Book 1 改訂版')
+        self.assertEqual(book.price, 1200)
+        self.assertEqual(book.description, '説明')
+        self.assertEqual(list(book.authors.values_list('name', flat=True)), ['akiyoko'])
+
+
+    def test_import_jsonl_merged_values(self):
+        """JSON Lines ファイルのインポート（保存済みの値とあわせた検証・ID の重複）"""
+
+        book1 = Book.objects.create(title='薄い本', price=1000)
+        book2 = Book.objects.create(title='Book 2', price=5000)
+        book3 = Book.objects.create(title='Book 3')
+        rows = [
+            {'id': book1.pk, 'price': 3001},
+            {'id': book2.pk, 'title': '薄い本 2'},
+            {'id': book3.pk, 'description': '説明'},
+            {'id': 100, 'title': 'Book 100'},
+            {'id': 100, 'title': 'Book 100 改訂版'},
+            {'id': 101, 'price': 500},
+        ]
+        f = io.StringIO(''.join(json.dumps(row) + '\n' for row in rows))
+        importer = BookImporter().import_file(f, 'jsonl')
+        # 登録・更新件数とエラー内容を検証
+        self.assertEqual(importer.created, 1)
+        self.assertEqual(importer.updated, 1)
+        self.assertEqual(
+            importer.errors,
+            [(1, '薄い本は3,000円を超えてはいけません。'),
+             (2, '薄い本は3,000円を超えてはいけません。'),
+             (5, 'IDが 4 行目と重複しています。'),
+             (6, 'タイトルは必須です。')]
+        )
+        # 1. 保存済みのタイトル・価格とあわせて検証されること
+        book1.refresh_from_db()
+        self.assertEqual(book1.price, 1000)
+        # 2. タイトルが省略された既存の本も更新できること
+        book3.refresh_from_db()
+        self.assertEqual((book3.title, book3.description), ('Book 3', '説明'))
+        # 3. ID が重複する行は最初の行のみ登録されること
+        self.assertEqual(Book.objects.get(pk=100).title, 'Book 100')
+
+
+class TestAdminBookImport(TestCase):
+    """管理サイトの本のインポート画面のユニットテスト"""
+
+    TARGET_URL = reverse('admin:shop_book_import')
+    PASSWORD = 'pass12345'
+
+    def setUp(self):
+        # テストユーザー（システム管理者）を作成
+        self.user = User.objects.create_superuser(
+            'admin', 'admin@example.com', self.PASSWORD)
+
+    def test_upload(self):
+        """インポート画面でファイルをアップロード"""
+
+        # 管理サイトにログイン
+        self.client.login(username=self.user.username, password=self.PASSWORD)
+        # ファイルをアップロードするためのリクエストを実行
+        response = self.client.post(self.TARGET_URL, {
+            'file': SimpleUploadedFile(
+                'books.csv', TestBookImporter.CSV.encode(), content_type='text/csv'),
+        })
+        # レスポンスを検証
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'admin/shop/book/import.html')
+        self.assertEqual(len(response.context_data['errors']), 3)
+        self.assertEqual(Book.objects.count(), 2)
+
+    def test_upload_invalid_encoding(self):
+        """読み込めないファイルはフォームのエラーとして表示すること"""
+
+        # 管理サイトにログイン
+        self.client.login(username=self.user.username, password=self.PASSWORD)
+        # UTF-8 ではないファイルをアップロード
+        response = self.client.post(self.TARGET_URL, {
+            'file': SimpleUploadedFile(
+                'books.csv', TestBookImporter.CSV.encode('cp932'), content_type='text/csv'),
+        })
+        # レスポンスを検証
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context_data['form'].has_error('file'))
+        self.assertFalse(Book.objects.exists())
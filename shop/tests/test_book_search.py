@@ -0,0 +1,77 @@
+from datetime import date
+
+from django.test import TestCase
+
+from ..models import Author, Book, Publisher
+from ..search import search_books, split_terms
+
+
+class TestBookSearch(TestCase):
+    """本の簡易検索のユニットテスト"""
+
+    def setUp(self):
+        publisher = Publisher.objects.create(name='技術評論社')
+        author = Author.objects.create(name='akiyoko')
+        author2 = Author.objects.create(name='Django Girls')
+        self.book1 = Book.objects.create(title='Django Book 1', price=1000,
+                                         publish_date=date(2020, 1, 1), publisher=publisher)
+        self.book2 = Book.objects.create(title='Python 3 Book', price=2500,
+                                         publish_date=date(2020, 2, 1))
+        self.book3 = Book.objects.create(title='Book 3', price=3)
+        self.book1.authors.set([author, author2])
+        self.book2.authors.set([author])
+
+    def search(self, search_term):
+        return sorted(book.title for book in search_books(Book.objects.all(), search_term))
+
+    def test_split_terms(self):
+        """引用符で囲まれた部分は分割されないこと"""
+
+        self.assertEqual(split_terms('Django "Python 3" author:aki'),
+                         ['Django', 'Python 3', 'author:aki'])
+
+    def test_text(self):
+        """テキストの列を対象に検索し、複数の著者に一致しても重複しないこと"""
+
+        self.assertEqual(self.search('django'), ['Django Book 1'])
+        self.assertEqual(self.search('技術'), ['Django Book 1'])
+        self.assertEqual(self.search('aki'), ['Django Book 1', 'Python 3 Book'])
+        self.assertEqual(self.search('"Python 3"'), ['Python 3 Book'])
+
+    def test_prefix(self):
+        """「publisher:」「author:」で対象を指定して検索"""
+
+        self.assertEqual(self.search('publisher:技術'), ['Django Book 1'])
+        self.assertEqual(self.search('author:django'), ['Django Book 1'])
+        self.assertEqual(self.search('author:aki Python'), ['Python 3 Book'])
+
+    def test_price(self):
+        """数字は価格（またはテキストの列）で、範囲は価格のみで検索"""
+
+        self.assertEqual(self.search('3'), ['Book 3', 'Python 3 Book'])
+        self.assertEqual(self.search('1000'), ['Django Book 1'])
+        self.assertEqual(self.search('1000-3000'), ['Django Book 1', 'Python 3 Book'])
+        self.assertEqual(self.search('>=2500'), ['Python 3 Book'])
+        self.assertEqual(self.search('<1000'), ['Book 3'])
+        # 価格の列に格納できない数値はテキストの列で検索
+        self.assertEqual(self.search('9' * 20), [])
+        self.assertEqual(self.search('0-' + '9' * 20), [])
+        self.assertEqual(self.search('9' * 20 + '-1'), [])
+        self.assertEqual(self.search('>' + '9' * 20), [])
+
+    def test_date(self):
+        """日付は出版日で検索"""
+
+        self.assertEqual(self.search('2020-01-01'), ['Django Book 1'])
+        self.assertEqual(self.search('2020/2'), ['Python 3 Book'])
+        # 「2020-01」は価格の範囲ではなく年月
+        self.assertEqual(self.search('2020-01'), ['Django Book 1'])
+        self.assertEqual(self.search('2020-13'), [])
+
+    def test_query(self):
+        """インデックスを使えない価格の文字列検索や DISTINCT が使われないこと"""
+
+        sql = str(search_books(Book.objects.all(), 'Django').query).upper()
+        self.assertNotIn('DISTINCT', sql)
+        self.assertNotIn('CAST', sql)
+        self.assertNotIn('PRICE', sql.partition('WHERE')[2])
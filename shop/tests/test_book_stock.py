@@ -0,0 +1,168 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Book, BookStock
+from ..stock import (
+    InsufficientStock, StockBuffer, adjust_many, decrement, increment,
+)
+
+User = get_user_model()
+
+
+class TestBookStock(TestCase):
+    """在庫数の増減のユニットテスト"""
+
+    def setUp(self):
+        # テストデータを作成
+        self.books = [Book.objects.create(title='Book {}'.format(i + 1)) for i in range(3)]
+        BookStock.objects.create(book=self.books[0], quantity=2)
+        BookStock.objects.create(book=self.books[1], quantity=1)
+
+    def quantities(self):
+        return dict(BookStock.objects.values_list('book__title', 'quantity'))
+
+    def test_increment_and_decrement(self):
+        """在庫数を増減でき、在庫数が足りない場合は更新されないこと"""
+
+        # 1. 在庫のレコードがない本の在庫数を増やす
+        increment(self.books[2].pk, 3)
+        # 2. 在庫数を減らす
+        with self.assertNumQueries(1):
+            decrement(self.books[0].pk, 2)
+        # 3. 在庫数が足りない場合
+        with self.assertRaises(InsufficientStock) as cm:
+            decrement(self.books[1].pk, 2)
+        self.assertEqual(cm.exception.book_ids, [self.books[1].pk])
+        self.assertEqual(self.quantities(), {'Book 1': 0, 'Book 2': 1, 'Book 3': 3})
+        # 4. 在庫のレコードがない本の増減数が0の場合
+        book = Book.objects.create(title='Book 4')
+        increment(book.pk, 0)
+        self.assertFalse(BookStock.objects.filter(book=book).exists())
+
+    def test_adjust_many(self):
+        """複数の本の在庫数をまとめて増減でき、足りない場合は全て取り消されること"""
+
+        # 1. まとめて増減
+        with patch('shop.stock.ADJUST_CHUNK_SIZE', 2):
+            adjust_many({self.books[0].pk: -1, self.books[1].pk: -1, self.books[2].pk: 5})
+        self.assertEqual(self.quantities(), {'Book 1': 1, 'Book 2': 0, 'Book 3': 5})
+
+        # 2. 在庫数が足りない本がある場合
+        with self.assertRaises(InsufficientStock) as cm:
+            adjust_many({self.books[0].pk: -1, self.books[1].pk: -1, self.books[2].pk: 1})
+        self.assertEqual(cm.exception.book_ids, [self.books[1].pk])
+        self.assertEqual(self.quantities(), {'Book 1': 1, 'Book 2': 0, 'Book 3': 5})
+
+        # 3. 在庫のレコードがない本は在庫数0として足りない本に含める
+        book = Book.objects.create(title='Book 4')
+        with self.assertRaises(InsufficientStock) as cm:
+            adjust_many({self.books[0].pk: -1, book.pk: -1})
+        self.assertEqual(cm.exception.book_ids, [book.pk])
+        self.assertEqual(self.quantities(), {'Book 1': 1, 'Book 2': 0, 'Book 3': 5})
+
+    def test_stock_buffer(self):
+        """バッファで集約した増減がまとめて反映されること"""
+
+        buffer = StockBuffer(max_delay=60, max_items=3)
+        # 1. 件数が max_items に達するまでは反映されない
+        self.assertEqual(buffer.add(self.books[0].pk, -1), {})
+        self.assertEqual(buffer.add(self.books[1].pk, -1), {})
+        self.assertEqual(self.quantities(), {'Book 1': 2, 'Book 2': 1})
+        # 2. 反映できなかった増減が返される
+        self.assertEqual(buffer.add(self.books[1].pk, -1), {self.books[1].pk: -2})
+        self.assertEqual(self.quantities(), {'Book 1': 1, 'Book 2': 1})
+
+    def test_stock_buffer_flush_on_request_finished(self):
+        """max_delay 秒を過ぎた増減は、リクエストの終了時に反映されること"""
+
+        buffer = StockBuffer(max_delay=60, max_items=100)
+        with patch('shop.stock.monotonic', return_value=1000):
+            buffer.add(self.books[0].pk, -1)
+        # 1. max_delay 秒以内であれば反映されない
+        with patch('shop.stock.monotonic', return_value=1059):
+            self.client.get(reverse('admin:login'))
+        self.assertEqual(self.quantities(), {'Book 1': 2, 'Book 2': 1})
+        # 2. max_delay 秒を過ぎていれば反映される
+        with patch('shop.stock.monotonic', return_value=1060):
+            self.client.get(reverse('admin:login'))
+        self.assertEqual(self.quantities(), {'Book 1': 1, 'Book 2': 1})
+
+
+class TestAdminBookStock(TestCase):
+    """管理サイトの本の在庫のインラインのユニットテスト（システム管理者の場合）"""
+
+    PASSWORD = 'pass12345'
+
+    def setUp(self):
+        # テストユーザー（システム管理者）を作成
+        self.user = User.objects.create_superuser(
+            'admin', 'admin@example.com', self.PASSWORD)
+        self.book = Book.objects.create(title='Django Book', price=1000)
+        self.stock = BookStock.objects.create(book=self.book, quantity=10)
+        self.client.login(username=self.user.username, password=self.PASSWORD)
+
+    def test_save_quantity_as_delta(self):
+        """変更画面の在庫数が表示時からの差分として保存されること"""
+
+        url = reverse('admin:shop_book_change', args=[self.book.pk])
+        response = self.client.get(url)
+        self.assertContains(response, 'name="bookstock-0-quantity"')
+
+        # 1. 表示後に注文で在庫数が減った場合
+        decrement(self.book.pk, 3)
+        # 2. 在庫数を 10 から 15 に変更
+        response = self.client.post(url, {
+            'title': 'Django Book',
+            'price': 1000,
+            'size': '',
+            'bookstock-TOTAL_FORMS': 1,
+            'bookstock-INITIAL_FORMS': 1,
+            'bookstock-MIN_NUM_FORMS': 0,
+            'bookstock-MAX_NUM_FORMS': 1,
+            'bookstock-0-id': self.stock.pk,
+            'bookstock-0-book': self.book.pk,
+            'bookstock-0-quantity': 15,
+            'initial-bookstock-0-quantity': 10,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.quantity, 12)
+
+    def test_filter_by_stock_level(self):
+        """一覧画面で在庫状況で絞り込み・在庫数で並び替えできること"""
+
+        # テストデータを作成（在庫あり・在庫僅少・在庫切れ・在庫のレコードなし）
+        low = Book.objects.create(title='Low Book')
+        BookStock.objects.create(book=low, quantity=1)
+        out = Book.objects.create(title='Out Book')
+        BookStock.objects.create(book=out, quantity=0)
+        missing = Book.objects.create(title='Missing Book')
+        url = reverse('admin:shop_book_changelist')
+
+        # 1. 在庫状況ごとの件数
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '在庫あり (1)')
+        self.assertContains(response, '在庫僅少（5冊未満） (1)')
+        self.assertContains(response, '在庫切れ (2)')
+
+        # 2. 在庫状況で絞り込み
+        for level, books in (('in', [self.book]), ('low', [low]), ('out', [out, missing])):
+            response = self.client.get(url + '?stock_level=' + level)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                [obj.pk for obj in response.context_data['cl'].result_list],
+                [book.pk for book in books]
+            )
+        response = self.client.get(url + '?stock_level=unknown')
+        self.assertEqual(response.status_code, 302)
+
+        # 3. 在庫数の降順で並び替え（在庫数の列は 6 番目）
+        response = self.client.get(url + '?o=-6')
+        self.assertEqual(
+            [obj.pk for obj in response.context_data['cl'].result_list][:3],
+            [self.book.pk, low.pk, out.pk]
+        )
@@ -0,0 +1,110 @@
+import io
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..admin import BookAdmin
+from ..models import Book
+from ..thumbnails import (
+    IMAGE_ERRORS, _generate_thumbnails_safely, generate_thumbnails, get_thumbnail_name,
+    get_thumbnail_url,
+)
+
+
+class TestThumbnails(TestCase):
+    """本の画像のサムネイルのユニットテスト"""
+
+    def setUp(self):
+        # メディアファイルの保存先を一時ディレクトリにする
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (1000, 1500), 'white').save(buffer, 'PNG')
+        self.book = Book(title='Book 1')
+        self.book.image.save('cover.png', ContentFile(buffer.getvalue()))
+
+    def test_generate_thumbnails(self):
+        """サムネイルが作成され、そのURLが返されること"""
+
+        digest = generate_thumbnails(self.book.image.name, self.book.image.storage)
+        url = get_thumbnail_url(self.book.image, digest)
+        name = get_thumbnail_name('cover.png', digest, 'small')
+        self.assertEqual(url, '/media/' + name)
+        # サムネイルのサイズを検証
+        with self.book.image.storage.open(name) as f:
+            self.assertEqual(Image.open(f).size, (100, 150))
+
+    def test_thumbnail_name_depends_on_content(self):
+        """同じファイル名でも元画像の内容が変わればサムネイルのファイル名が変わること"""
+
+        storage = self.book.image.storage
+        digest = generate_thumbnails('cover.png', storage)
+        # 1. 元画像を同じファイル名で差し替え
+        storage.delete('cover.png')
+        buffer = io.BytesIO()
+        Image.new('RGB', (1000, 1500), 'black').save(buffer, 'PNG')
+        storage.save('cover.png', ContentFile(buffer.getvalue()))
+        new_digest = generate_thumbnails('cover.png', storage)
+        self.assertNotEqual(new_digest, digest)
+        self.assertNotEqual(get_thumbnail_name('cover.png', new_digest, 'small'),
+                            get_thumbnail_name('cover.png', digest, 'small'))
+
+    def test_invalid_image(self):
+        """画像として読み込めないファイルは、例外を返して元画像のURLを使うこと"""
+
+        self.book.image.storage.save('broken.png', ContentFile(b'not an image'))
+        with self.assertRaises(IMAGE_ERRORS):
+            generate_thumbnails('broken.png', self.book.image.storage)
+        name, digest, error = _generate_thumbnails_safely('broken.png')
+        self.assertIsNone(digest)
+        self.assertTrue(error)
+
+    def test_format_image(self):
+        """モデル一覧画面の画像がサムネイルを参照し、その際にサムネイルを作成しないこと"""
+
+        admin = BookAdmin(Book, None)
+        # 1. サムネイルが未作成の場合は元画像
+        with patch('shop.thumbnails.generate_thumbnails') as mock:
+            html = admin.format_image(self.book)
+        self.assertIn('/media/cover.png', html)
+        self.assertIn('width="100"', html)
+        mock.assert_not_called()
+        # 2. サムネイルの作成後
+        self.book.image_digest = generate_thumbnails(
+            self.book.image.name, self.book.image.storage)
+        self.assertIn(get_thumbnail_name('cover.png', self.book.image_digest, 'small'),
+                      admin.format_image(self.book))
+
+    def test_save_model(self):
+        """管理サイトで画像をアップロードした際にサムネイルが作成されること"""
+
+        user = get_user_model().objects.create_superuser(
+            'admin', 'admin@example.com', 'pass12345')
+        self.client.force_login(user)
+        buffer = io.BytesIO()
+        Image.new('RGB', (600, 900), 'white').save(buffer, 'PNG')
+        response = self.client.post(reverse('admin:shop_book_add'), {
+            'title': 'Book 2',
+            'size': '',
+            'image': SimpleUploadedFile('cover2.png', buffer.getvalue(), 'image/png'),
+            'bookstock-TOTAL_FORMS': 0,
+            'bookstock-INITIAL_FORMS': 0,
+            'bookstock-MIN_NUM_FORMS': 0,
+            'bookstock-MAX_NUM_FORMS': 1,
+        })
+        self.assertEqual(response.status_code, 302)
+        book = Book.objects.get(title='Book 2')
+        self.assertEqual(len(book.image_digest), 32)
+        self.assertTrue(book.image.storage.exists(
+            get_thumbnail_name(book.image.name, book.image_digest, 'medium')))
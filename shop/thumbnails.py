@@ -0,0 +1,89 @@
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+# サムネイルのサイズ（幅, 高さ）の上限
+THUMBNAIL_SIZES = {
+    'small': (100, 150),
+    'medium': (300, 450),
+}
+
+
+# 元画像が読み込めない場合の例外
+IMAGE_ERRORS = (OSError, Image.UnidentifiedImageError, Image.DecompressionBombError)
+
+
+def get_thumbnail_name(name, digest, size):
+    """元画像のファイル名と内容のハッシュ値からサムネイルのファイル名を求める
+
+    元画像の内容のハッシュ値とサイズから求めたハッシュ値をファイル名に含めて、
+    サムネイルを元画像と同じディレクトリに保存する（元画像が差し替えられた場合は別名になる）。
+    """
+    width, height = THUMBNAIL_SIZES[size]
+    digest = hashlib.md5('{}:{}x{}'.format(digest, width, height).encode()).hexdigest()
+    root, _ = os.path.splitext(name)
+    return '{}.{}.{}x{}.jpg'.format(root, digest[:12], width, height)
+
+
+def generate_thumbnails(name, storage=None):
+    """元画像から全サイズのサムネイルを作成して、元画像の内容のハッシュ値を返す
+
+    作成済みのサイズはスキップする。
+    """
+    storage = storage or default_storage
+    with storage.open(name) as f:
+        content = f.read()
+    digest = hashlib.md5(content).hexdigest()
+    missing = {
+        size: thumbnail_name for size, thumbnail_name in (
+            (size, get_thumbnail_name(name, digest, size)) for size in THUMBNAIL_SIZES)
+        if not storage.exists(thumbnail_name)
+    }
+    if not missing:
+        return digest
+
+    image = Image.open(io.BytesIO(content))
+    image.load()
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    for size, thumbnail_name in missing.items():
+        thumbnail = image.copy()
+        thumbnail.thumbnail(THUMBNAIL_SIZES[size], Image.LANCZOS)
+        buffer = io.BytesIO()
+        thumbnail.save(buffer, 'JPEG', quality=85, optimize=True)
+        storage.save(thumbnail_name, ContentFile(buffer.getvalue()))
+    return digest
+
+
+def generate_thumbnails_parallel(names, max_workers=None):
+    """複数の元画像のサムネイルをプロセスプールで並列に作成する
+
+    (元画像のファイル名, ハッシュ値, エラーメッセージ) を順に返す。
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for result in executor.map(_generate_thumbnails_safely, names, chunksize=16):
+            yield result
+
+
+def _generate_thumbnails_safely(name):
+    try:
+        digest = generate_thumbnails(name)
+    except IMAGE_ERRORS as e:
+        return name, None, str(e)
+    return name, digest, None
+
+
+def get_thumbnail_url(image, digest, size='small'):
+    """サムネイルのURLを返す
+
+    サムネイルは画像の保存時（または generate_thumbnails コマンド）に作成しておき、
+    ここではストレージにアクセスしない。未作成（ハッシュ値が空）の場合は元画像のURLを返す。
+    """
+    if not digest:
+        return image.url
+    return image.storage.url(get_thumbnail_name(image.name, digest, size))
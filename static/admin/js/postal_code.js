@@ -1,59 +1,193 @@
 (function($) {
     "use strict";
-    $(document).ready(function() {
-        $("#postal_code_search").on("click", function() {
-            var postalCode = $("#id_postal_code_0").val() + $("#id_postal_code_1").val();
-            $.ajax({
-              type: "get",
-              url: "/address_search/",
-              dataType: "json",
-              data: {
-                postalCode: postalCode
-              }
-            })
-            .done(function(data) {
-                // 郵便番号コードに対応する住所が0件の場合
-                if (data.length === 0) {
-                    var dialogElement = $("<div>該当する住所が存在しません。</div>");
-                    $(dialogElement).dialog({
-                        title: '住所選択',
-                        modal: true
-                    });
+
+    // 郵便番号ごとの検索結果のキャッシュ
+    var cache = {};
+    // 郵便番号の上3桁ごとのシャード（静的JSONファイル）の読み込み結果
+    var shards = {};
+    // 都道府県ごとの市区町村の一覧
+    var cities = {};
+    // 実行中の検索リクエスト
+    var pending = null;
+    // 最後に実行した検索の番号
+    var latest = 0;
+    var manifest = null;
+
+    // シャードの一覧（上3桁とファイルURLの対応表）を読み込む
+    function loadManifest(manifestUrl) {
+        if (!manifest) {
+            manifest = $.ajax({url: manifestUrl, dataType: "json"});
+        }
+        return manifest;
+    }
+
+    // 郵便番号の上3桁に対応するシャードを読み込む
+    function loadShard(manifestUrl, prefix) {
+        if (!shards[prefix]) {
+            shards[prefix] = loadManifest(manifestUrl).then(function(files) {
+                if (!files[prefix]) {
+                    return {};
+                }
+                return $.ajax({url: files[prefix], dataType: "json"});
+            });
+        }
+        return shards[prefix];
+    }
+
+    // 郵便番号に対応する住所を検索する（結果はキャッシュする）
+    // 後から実行された検索があれば、前の検索の結果は返さない（シャード・サーバーのいずれの場合も）
+    function search(postalCode, manifestUrl) {
+        var token = ++latest;
+        if (cache[postalCode]) {
+            return $.Deferred().resolve(cache[postalCode]).promise();
+        }
+        // 実行中のサーバーへの問い合わせは中断する
+        if (pending) {
+            pending.abort();
+            pending = null;
+        }
+        var deferred = $.Deferred();
+        var resolve = function(data) {
+            cache[postalCode] = data;
+            if (token === latest) {
+                deferred.resolve(data);
+            }
+        };
+        var fallback = function() {
+            if (token !== latest) {
+                return;
+            }
+            pending = $.ajax({
+                type: "get",
+                url: "/address_search/",
+                dataType: "json",
+                data: {
+                    postalCode: postalCode
                 }
-                // 郵便番号コードに対応する住所が1件の場合
-                else if (data.length === 1) {
-                    $("#id_prefecture").val(data[0].prefecture);
-                    $("#id_address_1").val(data[0].city + data[0].section);
-                    $("#id_address_2").val("");
+            });
+            pending.done(resolve).fail(function() {
+                if (token === latest) {
+                    deferred.reject();
                 }
-                // 郵便番号コードに対応する住所が複数件の場合
-                else {
-                    var dialogElement = $("<div>");
-                    $.each(data, function(i) {
-                        var address = this.prefecture + this.city + this.section;
-                        var inputElement = $("<label>").append($("<input>").attr({
-                            type: "radio",
-                            name: "address",
-                            value: i,
-                            checked: i === 0
-                        })).append(" " + address + "<br>");
-                        dialogElement.append(inputElement);
-                    });
-                    $(dialogElement).dialog({
-                        title: '住所選択',
-                        modal: true,
-                        buttons: {
-                            'OK': function () {
-                                var i = $('input[name="address"]:checked').val();
-                                $("#id_prefecture").val(data[i].prefecture);
-                                $("#id_address_1").val(data[i].city + data[i].section);
-                                $("#id_address_2").val("");
-                                $(this).dialog('close');
-                            }
-                        }
-                    });
+            });
+        };
+        if (manifestUrl) {
+            loadShard(manifestUrl, postalCode.substring(0, 3)).then(function(shard) {
+                // シャードにない郵便番号は、出力後に追加された可能性があるのでサーバーに問い合わせる
+                if (!shard[postalCode]) {
+                    fallback();
+                    return;
+                }
+                resolve(shard[postalCode]);
+            }, fallback);
+        } else {
+            fallback();
+        }
+        return deferred.promise();
+    }
+
+    function fillAddress(address) {
+        $("#id_prefecture").val(address.prefecture).trigger("change");
+        $("#id_address_1").val(address.city + address.section);
+        $("#id_address_2").val("");
+    }
+
+    // 検索結果を住所検索ボタンの下に表示する
+    function showResult(button, data) {
+        var container = $("#postal_code_result");
+        if (container.length === 0) {
+            container = $("<div>").attr("id", "postal_code_result").addClass("help");
+            button.after(container);
+        }
+        container.empty();
+        // 郵便番号コードに対応する住所が0件の場合
+        if (data.length === 0) {
+            container.text("該当する住所が存在しません。");
+        }
+        // 郵便番号コードに対応する住所が1件の場合
+        else if (data.length === 1) {
+            fillAddress(data[0]);
+        }
+        // 郵便番号コードに対応する住所が複数件の場合
+        else {
+            $.each(data, function(i, address) {
+                $("<a>").attr("href", "#").text(
+                    address.prefecture + address.city + address.section
+                ).on("click", function(event) {
+                    event.preventDefault();
+                    fillAddress(data[i]);
+                    container.empty();
+                }).appendTo($("<div>").appendTo(container));
+            });
+        }
+    }
+
+    // 都道府県に対応する市区町村を住所1の入力候補にする
+    function loadCities(prefecture) {
+        var datalist = $("#city_list");
+        if (datalist.length === 0) {
+            datalist = $("<datalist>").attr("id", "city_list");
+            $("#id_address_1").attr("list", "city_list").after(datalist);
+        }
+        datalist.empty();
+        if (!prefecture) {
+            return;
+        }
+        if (!cities[prefecture]) {
+            cities[prefecture] = $.ajax({
+                type: "get",
+                url: "/address_search/cities/",
+                dataType: "json",
+                data: {
+                    prefecture: prefecture
                 }
             });
+        }
+        cities[prefecture].done(function(data) {
+            // 結果が返ってくるまでに都道府県が変更された場合は何もしない
+            if ($("#id_prefecture").val() !== prefecture) {
+                return;
+            }
+            $.each(data, function(i, city) {
+                $("<option>").val(city.name).appendTo(datalist);
+            });
+        }).fail(function() {
+            // 失敗した場合は次回に再取得する
+            delete cities[prefecture];
+        });
+    }
+
+    $(document).ready(function() {
+        var button = $("#postal_code_search");
+        var manifestUrl = button.data("shards-manifest");
+        var timer = null;
+
+        function currentPostalCode() {
+            return $("#id_postal_code_0").val() + $("#id_postal_code_1").val();
+        }
+
+        button.on("click", function() {
+            search(currentPostalCode(), manifestUrl).done(function(data) {
+                showResult(button, data);
+            });
+        });
+
+        // 入力中に先読みしておき、住所検索ボタンのクリック時にすぐに表示できるようにする
+        $("#id_postal_code_0, #id_postal_code_1").on("input", function() {
+            clearTimeout(timer);
+            timer = setTimeout(function() {
+                var postalCode = currentPostalCode();
+                if (/^\d{7}$/.test(postalCode)) {
+                    search(postalCode, manifestUrl);
+                } else if (manifestUrl && /^\d{3}/.test(postalCode)) {
+                    loadShard(manifestUrl, postalCode.substring(0, 3));
+                }
+            }, 300);
+        });
+
+        $("#id_prefecture").on("change", function() {
+            loadCities($(this).val());
         });
+        loadCities($("#id_prefecture").val());
     });
 }(django.jQuery || jQuery));